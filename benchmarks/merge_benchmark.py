@@ -0,0 +1,101 @@
+"""Compares speasy.products.variable.merge with the previous implementation on typical cache hits, many contiguous
+fragments of one hour, with and without overlaps.
+
+Usage::
+
+    python benchmarks/merge_benchmark.py [--fragments 500] [--columns 3] [--repeat 5]
+"""
+import argparse
+import timeit
+from typing import List, Optional
+
+import numpy as np
+
+from speasy.core import epoch_to_datetime64
+from speasy.products.variable import (DataContainer, SpeasyVariable,
+                                      VariableAxis, VariableTimeAxis, merge)
+
+
+def legacy_merge(variables: List[SpeasyVariable]) -> Optional[SpeasyVariable]:
+    """merge implementation before the searchsorted based rewrite, kept as reference"""
+    if len(variables) == 0:
+        return None
+    sorted_var_list = [v for v in variables if (
+        v is not None) and (len(v.time) > 0)]
+    sorted_var_list.sort(key=lambda v: v.time[0])
+
+    for prev, current in zip(sorted_var_list[:-1], sorted_var_list[1:]):
+        if prev.time[-1] >= current.time[-1]:
+            sorted_var_list.remove(current)
+
+    for current, nxt in zip(sorted_var_list[:-1], sorted_var_list[1:]):
+        if nxt.time[0] == current.time[0] and nxt.time[-1] >= current.time[-1]:
+            sorted_var_list.remove(current)
+
+    if len(sorted_var_list) == 0:
+        for v in variables:
+            if v is not None:
+                return SpeasyVariable.reserve_like(v, length=0)
+        return None
+
+    overlaps = [
+        np.where(current.time >= nxt.time[0])[0][0]
+        if current.time[-1] >= nxt.time[0]
+        else -1
+        for current, nxt in zip(sorted_var_list[:-1], sorted_var_list[1:])
+    ]
+
+    dest_len = int(
+        np.sum(
+            [
+                overlap if overlap != -1 else len(r.time)
+                for overlap, r in zip(overlaps, sorted_var_list[:-1])
+            ]
+        )
+    )
+    dest_len += len(sorted_var_list[-1].time)
+
+    result = SpeasyVariable.reserve_like(sorted_var_list[0], dest_len)
+
+    pos = 0
+
+    for r, overlap in zip(sorted_var_list, overlaps + [-1]):
+        frag_len = len(r.time) if overlap == -1 else overlap
+        result[pos: (pos + frag_len)] = r[0:frag_len]
+        pos += frag_len
+    return result
+
+
+def make_fragment(start: float, stop: float, step: float, columns: int, spectrogram: bool) -> SpeasyVariable:
+    time = np.arange(start, stop, step)
+    values = np.random.random((len(time), columns))
+    axes = [VariableTimeAxis(values=epoch_to_datetime64(time))]
+    if spectrogram:
+        axes.append(VariableAxis(name='energy', values=np.random.random((len(time), columns)), is_time_dependent=True))
+    return SpeasyVariable(axes=axes, values=DataContainer(values), columns=[f"c{i}" for i in range(columns)])
+
+
+def make_fragments(count: int, columns: int, overlap: float, spectrogram: bool) -> List[SpeasyVariable]:
+    hour = 3600.
+    return [make_fragment(i * hour, (i + 1 + overlap) * hour, 4., columns, spectrogram) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fragments", type=int, default=500)
+    parser.add_argument("--columns", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for name, overlap, spectrogram in (("contiguous", 0., False), ("overlapping", .1, False),
+                                       ("contiguous spectrogram", 0., True)):
+        fragments = make_fragments(args.fragments, args.columns, overlap, spectrogram)
+        assert merge(fragments) == legacy_merge(fragments)
+        legacy = min(timeit.repeat(lambda: legacy_merge(fragments), number=1, repeat=args.repeat))
+        current = min(timeit.repeat(lambda: merge(fragments), number=1, repeat=args.repeat))
+        print(f"{name:>24}: {args.fragments} fragments, legacy {legacy * 1e3:8.2f} ms, "
+              f"current {current * 1e3:8.2f} ms, speedup x{legacy / current:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,13 +9,15 @@
 __author__ = """Alexis Jeandet"""
 __email__ = 'alexis.jeandet@member.fsf.org'
 __version__ = '1.0.2'
-__all__ = ['amda', 'cda', 'ssc', 'csa', 'get_data', 'SpeasyVariable', 'Catalog', 'Event', 'Dataset', 'TimeTable']
+__all__ = ['amda', 'cda', 'ssc', 'csa', 'get_data', 'get_data_async', 'prefetch', 'SpeasyVariable', 'Catalog', 'Event', 'Dataset', 'TimeTable']
 __docformat__ = "numpy"
 
 from speasy.core.inventory.indexes import SpeasyIndex
 from .products import SpeasyVariable, Catalog, Event, Dataset, TimeTable, MaybeAnyProduct
 from typing import List
 from .core.requests_scheduling.request_dispatch import get_data, list_providers, amda, cda, csa, ssc
+from .core.requests_scheduling.async_dispatch import get_data_async
+from .core.requests_scheduling.prefetch import prefetch
 
 
 # @TODO implement me, this function should be able to look inside all servers
@@ -117,6 +117,26 @@ class ConfigSection:
         return s
 
 
+def _per_provider_int(value: str) -> dict:
+    """Parses a "provider:value,provider:value" string into a dict of ints
+    """
+    values = {}
+    for item in filter(None, map(str.strip, value.split(','))):
+        provider, count = item.split(':', 1)
+        values[provider.strip()] = int(count)
+    return values
+
+
+def _per_key_size(value: str) -> dict:
+    """Parses a "key:size,key:size" string into a dict of sizes in bytes, sizes can use scientific notation
+    """
+    values = {}
+    for item in filter(None, map(str.strip, value.split(','))):
+        key, size = item.rsplit(':', 1)
+        values[key.strip()] = int(float(size))
+    return values
+
+
 def remove_entry(entry: ConfigEntry):
     """Deletes entry from config file and its section if it was the last entry
 
@@ -150,16 +170,71 @@ Speasy proxy is an intermediary server which helps by caching requests among sev
                                "type_ctor": lambda x: {'true': True, 'false': False}.get(x.lower(), False)},
                       url={"default": "http://sciqlop.lpp.polytechnique.fr/cache",
                            "description": """Speasy proxy server URL, you can use http://sciqlop.lpp.polytechnique.fr/cache.
-Speasy proxy is an intermediary server which helps by caching requests among several users."""}
+Speasy proxy is an intermediary server which helps by caching requests among several users."""},
+                      batch_window={"default": 0.05,
+                                    "description": """Time in seconds during which concurrent proxy requests are collected before being sent together in a single batch request, only used by proxy servers supporting batches.""",
+                                    "type_ctor": float},
+                      max_batch_size={"default": 32,
+                                      "description": """Maximum number of products requested in a single proxy batch request.""",
+                                      "type_ctor": int},
+                      failure_threshold={"default": 3,
+                                         "description": """Number of consecutive proxy failures after which the proxy is bypassed, connection failures bypass it right away.""",
+                                         "type_ctor": int},
+                      recovery_timeout={"default": 60.,
+                                        "description": """Time in seconds during which a failing proxy is bypassed before being tried again.""",
+                                        "type_ctor": float}
                       )
 
 cache = ConfigSection("CACHE",
                       size={"default": 20e9, "description": """Sets the maximum cache capacity.""",
                             "type_ctor": lambda x: int(float(x))},
                       path={"default": str(appdirs.user_cache_dir("speasy", "LPP")),
-                            "description": """Sets Speasy cache path."""}
+                            "description": """Sets Speasy cache path."""},
+                      memory_size={"default": 0,
+                                   "description": """Maximum size in bytes of the in-memory tier kept in front of the disk cache for recently used data fragments, 0 disables it.""",
+                                   "type_ctor": lambda x: int(float(x))},
+                      fragment_target_size={"default": 32e6,
+                                            "description": """Target size in bytes of cache fragments for providers adapting fragments duration to products data rate, 0 disables adaptation.""",
+                                            "type_ctor": lambda x: int(float(x))},
+                      eviction_policy={"default": "oldest-version-first",
+                                       "description": """Order in which entries are evicted once the cache or a quota is full, either lru, lfu or oldest-version-first. lru and lfu require recording each read in the cache database."""},
+                      quotas={"default": "",
+                              "description": """Maximum size in bytes of cache entries per provider (e.g. cda:5e9,amda:2e9) or per provider and product (e.g. cda/AC_H0_MFI:1e9), enforced periodically in background.""",
+                              "type_ctor": _per_key_size},
+                      quotas_check_interval={"default": 300.,
+                                             "description": """Seconds between two cache quotas enforcements, see quotas.""",
+                                             "type_ctor": float},
+                      stale_while_revalidate={"default": False,
+                                              "description": """When True, cache entries older than their provider retention are returned immediately and refreshed in background instead of being checked before returning.""",
+                                              "type_ctor": lambda x: {'true': True, 'false': False}.get(x.lower(), False)},
+                      max_background_revalidations={"default": 2,
+                                                    "description": """Maximum number of cache entries groups refreshed in background at the same time, see stale_while_revalidate.""",
+                                                    "type_ctor": int},
+                      stats_dump_path={"default": "",
+                                       "description": """When set, cache statistics snapshots are periodically appended as JSON lines to this file."""},
+                      stats_dump_interval={"default": 60.,
+                                           "description": """Seconds between two cache statistics snapshots, see stats_dump_path.""",
+                                           "type_ctor": float},
+                      downcast_to_float32={"default": False,
+                                           "description": """Converts float64 values and axes of time series to float32 both in cache and in returned variables, halves memory usage at the cost of precision.""",
+                                           "type_ctor": lambda x: {'true': True, 'false': False}.get(x.lower(), False)}
                       )
 
+http = ConfigSection("HTTP",
+                     pool_connections={"default": 10,
+                                       "description": "Number of per-host connection pools kept alive.",
+                                       "type_ctor": int},
+                     pool_maxsize={"default": 16,
+                                   "description": "Maximum number of kept alive connections per host.",
+                                   "type_ctor": int},
+                     connect_timeout={"default": 10.,
+                                      "description": "HTTP connection timeout in seconds.",
+                                      "type_ctor": float},
+                     read_timeout={"default": 120.,
+                                   "description": "HTTP read timeout in seconds, maximum time between two received bytes.",
+                                   "type_ctor": float}
+                     )
+
 index = ConfigSection("INDEX",
                       path={
                           "default": f'{appdirs.user_data_dir("speasy", "LPP")}/index'}
@@ -181,7 +256,27 @@ amda = ConfigSection("AMDA",
                      max_chunk_size_days={
                          "default": 10,
                          "description": "Maximum request duration in days, any request over a longer period will be split into smaller ones.",
-                         "type_ctor": int}
+                         "type_ctor": int},
+                     max_parallel_chunks={
+                         "default": 4,
+                         "description": "Maximum number of chunks downloaded in parallel when a request is split into several chunks of max_chunk_size_days.",
+                         "type_ctor": int},
+                     token_validity={
+                         "default": 300,
+                         "description": "Duration in seconds during which an AMDA authentication token is reused before getting a new one.",
+                         "type_ctor": int},
+                     job_poll_initial_delay={
+                         "default": 1.,
+                         "description": "Delay in seconds before checking for the first time the status of an AMDA job still in progress, this delay doubles after each check.",
+                         "type_ctor": float},
+                     job_poll_max_delay={
+                         "default": 30.,
+                         "description": "Maximum delay in seconds between two status checks of an AMDA job still in progress.",
+                         "type_ctor": float},
+                     job_timeout={
+                         "default": 3600.,
+                         "description": "Maximum duration in seconds speasy waits for an AMDA job to complete before giving up.",
+                         "type_ctor": float}
                      )
 
 inventories = ConfigSection("INVENTORIES",
@@ -190,3 +285,21 @@ inventories = ConfigSection("INVENTORIES",
                                 "description": "Maximum times in days speasy will keep inventories in cache before fetching newer version.",
                                 "type_ctor": int}
                             )
+
+concurrency = ConfigSection("CONCURRENCY",
+                            enabled={"default": False,
+                                     "description": """Enables concurrent execution of get_data requests spanning several products and/or time ranges.""",
+                                     "type_ctor": lambda x: {'true': True, 'false': False}.get(x.lower(), False)},
+                            max_workers={"default": 8,
+                                         "description": "Maximum number of threads used to run concurrent requests.",
+                                         "type_ctor": int},
+                            max_requests_per_provider={"default": "amda:2,cda:4,csa:2,ssc:2",
+                                                       "description": """Maximum number of requests in flight to each provider for the whole process, whatever the number of concurrent get_data calls, fragment downloads or chunks, formatted as provider:count pairs separated by commas.""",
+                                                       "type_ctor": _per_provider_int},
+                            max_fragment_downloads={"default": 4,
+                                                    "description": """Maximum number of missing or outdated cache fragment groups downloaded in parallel for a single request.""",
+                                                    "type_ctor": int},
+                            split_requests_max_in_flight={"default": "amda:1,cda:4,csa:2,ssc:2",
+                                                          "description": """Maximum number of sub-requests in flight per provider when a long request is split into smaller ones, formatted as provider:count pairs separated by commas. Providers not listed run sub-requests sequentially.""",
+                                                          "type_ctor": _per_provider_int}
+                            )
@@ -0,0 +1,55 @@
+"""
+Helpers to expose Speasy blocking calls as asyncio coroutines. Blocking calls run on a shared thread pool so they
+share caches, proxy and request splitting logic with the synchronous API.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from functools import partial
+from threading import Event, Lock
+from typing import Any, Callable
+
+from speasy.config import concurrency as concurrency_cfg
+from . import http
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=concurrency_cfg.max_workers(),
+                                           thread_name_prefix="speasy_async")
+        return _executor
+
+
+async def run_in_thread(func: Callable, *args, **kwargs) -> Any:
+    """Runs given blocking function on Speasy worker threads and awaits its result. Cancelling the awaiting task
+    also cancels the blocking call at its next HTTP request (see :func:`speasy.core.http.cancellable`).
+
+    Parameters
+    ----------
+    func: Callable
+        blocking function
+    args:
+        func positional arguments
+    kwargs:
+        func keyword arguments
+
+    Returns
+    -------
+    Any
+        func result
+    """
+    loop = asyncio.get_running_loop()
+    cancel = Event()
+    with http.cancellable(cancel):
+        context = copy_context()
+    try:
+        return await loop.run_in_executor(_get_executor(), partial(context.run, func, *args, **kwargs))
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
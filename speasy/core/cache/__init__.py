@@ -1,7 +1,11 @@
 from .cache import Cache, CacheItem
+from ._memory_cache import MemoryCache
+from ._stats import CacheStatistics, cache_stats
+from ._quotas import CacheEntryInfo, EvictionPolicy, Maintenance, register_eviction_policy
 from ._function_cache import CacheCall
 from ._providers_caches import CACHE_ALLOWED_KWARGS, Cacheable, UnversionedProviderCache
 from ._instance import _cache
+from speasy.config import cache as cache_cfg
 
 
 def cache_len():
@@ -16,6 +20,25 @@ def stats():
     return _cache.stats()
 
 
+def stats_snapshot():
+    """Returns provider cache statistics, see :meth:`CacheStatistics.snapshot`"""
+    return cache_stats.snapshot()
+
+
+def reset_stats():
+    cache_stats.reset()
+
+
+def start_stats_dump(path: str, interval: float = 60., reset: bool = False):
+    """Periodically appends provider cache statistics to given file, see :meth:`CacheStatistics.start_periodic_dump`
+    """
+    cache_stats.start_periodic_dump(path, interval, reset=reset)
+
+
+def stop_stats_dump():
+    cache_stats.stop_periodic_dump()
+
+
 def entries():
     return _cache.keys()
 
@@ -26,3 +49,27 @@ def add_item(key, item, expires=None):
 
 def get_item(key, default_value=None):
     return _cache.get(key, default_value)
+
+
+def enforce_quotas(max_evictions: int = 1000) -> int:
+    """Evicts entries exceeding quotas set in CACHE/quotas config entry, see :meth:`Cache.enforce_quotas`"""
+    return _cache.enforce_quotas(cache_cfg.quotas(), max_evictions=max_evictions)
+
+
+_quotas_maintenance = Maintenance(enforce_quotas, name="speasy-cache-quotas")
+
+
+def start_quotas_maintenance(interval: float = 300.):
+    """Enforces quotas set in CACHE/quotas config entry every interval seconds from a background thread"""
+    _quotas_maintenance.start(interval)
+
+
+def stop_quotas_maintenance():
+    _quotas_maintenance.stop()
+
+
+if cache_cfg.stats_dump_path():
+    start_stats_dump(cache_cfg.stats_dump_path(), cache_cfg.stats_dump_interval())
+
+if cache_cfg.quotas():
+    start_quotas_maintenance(cache_cfg.quotas_check_interval())
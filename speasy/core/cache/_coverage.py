@@ -0,0 +1,124 @@
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from ._quotas import glob_escape
+
+_EMPTY = np.empty((0, 2), dtype=np.float64)
+
+
+def _union(intervals: np.ndarray, start: float, stop: float) -> np.ndarray:
+    left = np.searchsorted(intervals[:, 1], start, side='left')
+    right = np.searchsorted(intervals[:, 0], stop, side='right')
+    if left < right:
+        start = min(start, intervals[left, 0])
+        stop = max(stop, intervals[right - 1, 1])
+    return np.concatenate([intervals[:left], [[start, stop]], intervals[right:]])
+
+
+def _difference(intervals: np.ndarray, start: float, stop: float) -> np.ndarray:
+    left = np.searchsorted(intervals[:, 1], start, side='right')
+    right = np.searchsorted(intervals[:, 0], stop, side='left')
+    pieces = []
+    if left < right:
+        if intervals[left, 0] < start:
+            pieces.append([intervals[left, 0], start])
+        if intervals[right - 1, 1] > stop:
+            pieces.append([stop, intervals[right - 1, 1]])
+    return np.concatenate([intervals[:left], np.array(pieces, dtype=np.float64).reshape(-1, 2), intervals[right:]])
+
+
+class CoverageIndex:
+    """Time ranges covered by provider cache entries, stored next to the entries as sorted and merged
+    ``[start, stop)`` epoch intervals per key stem, the entry key without its fragment start time. Fragments outside
+    of the coverage are known to be missing without looking them up. Coverage is only a hint: entries evicted by the
+    cache size limit are still covered until a lookup misses them and removes them. Stems without coverage, such as
+    those written by previous versions, are seeded from the keys of their existing entries the first time they are
+    looked up.
+
+    Parameters
+    ----------
+    cache: Cache
+        indexed cache
+    """
+
+    def __init__(self, cache: "Cache"):
+        self._cache = cache
+
+    @staticmethod
+    def _key(stem: str) -> str:
+        return f"coverage/{stem}"
+
+    def intervals(self, stem: str, fragment_hours: int = None) -> Optional[np.ndarray]:
+        """Covered intervals as a (n, 2) array of epoch seconds, None when there is no coverage recorded for this
+        stem or when it was recorded with another fragment duration."""
+        record = self._cache._data.get(self._key(stem), None)
+        if record is None or (fragment_hours is not None and record["fragment_hours"] != fragment_hours):
+            return None
+        return record["intervals"]
+
+    def covered(self, stem: str, fragments: List[datetime], fragment_hours: int) -> np.ndarray:
+        """Tells for each fragment if it is fully covered, coverage is seeded first when none is recorded."""
+        intervals = self.intervals(stem, fragment_hours)
+        if intervals is None:
+            intervals = self.seed(stem, fragment_hours)
+        starts = np.array([fragment.timestamp() for fragment in fragments], dtype=np.float64)
+        if len(intervals) == 0:
+            return np.zeros(len(starts), dtype=bool)
+        index = np.searchsorted(intervals[:, 0], starts, side='right') - 1
+        return (index >= 0) & (intervals[np.maximum(index, 0), 1] >= starts + fragment_hours * 3600.)
+
+    def _update(self, stem: str, fragment_hours: int, update: Callable[[np.ndarray], np.ndarray]):
+        # concurrent fragment downloads update the same record, the read and the write must not interleave
+        with self._cache.transact(self._key(stem)):
+            intervals = self.intervals(stem, fragment_hours)
+            self._cache._data[self._key(stem)] = {
+                "fragment_hours": fragment_hours,
+                "intervals": update(_EMPTY if intervals is None else intervals)
+            }
+
+    def seed(self, stem: str, fragment_hours: int) -> np.ndarray:
+        """Records the coverage of existing entries under given stem, keys are streamed and values are not read"""
+        starts = []
+        for info in self._cache.iter_entries_info([f"{glob_escape(stem)}*"]):
+            try:
+                starts.append(datetime.fromisoformat(info.key[len(stem):]))
+            except ValueError:
+                continue
+        self.add(stem, fragment_hours, starts)
+        return self.intervals(stem, fragment_hours)
+
+    def add(self, stem: str, fragment_hours: int, fragments: List[datetime]):
+        def update(intervals):
+            for fragment in fragments:
+                intervals = _union(intervals, fragment.timestamp(), fragment.timestamp() + fragment_hours * 3600.)
+            return intervals
+
+        self._update(stem, fragment_hours, update)
+
+    def remove(self, stem: str, fragment_hours: int, fragments: List[datetime]):
+        if self.intervals(stem, fragment_hours) is None:
+            return
+
+        def update(intervals):
+            for fragment in fragments:
+                intervals = _difference(intervals, fragment.timestamp(),
+                                        fragment.timestamp() + fragment_hours * 3600.)
+            return intervals
+
+        self._update(stem, fragment_hours, update)
+
+    def discard_key(self, key: str):
+        """Removes the fragment stored under given entry key from coverage, keys that are not provider cache entries
+        are ignored."""
+        stem, _, start = key.rpartition('/')
+        record = self._cache._data.get(self._key(f"{stem}/"), None) if stem else None
+        if record is None:
+            return
+        try:
+            fragment = datetime.fromisoformat(start)
+        except ValueError:
+            return
+        self.remove(f"{stem}/", record["fragment_hours"], [fragment])
+
@@ -0,0 +1,118 @@
+import copy
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Tuple
+
+import numpy as np
+
+from speasy.core import columnar
+from ._stats import cache_stats
+
+
+def _arrays_nbytes(obj) -> int:
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if type(obj) is dict:
+        return sum(_arrays_nbytes(value) for value in obj.values())
+    if type(obj) in (list, tuple):
+        return sum(_arrays_nbytes(value) for value in obj)
+    return 0
+
+
+def item_nbytes(item: "CacheItem") -> int:
+    """Memory footprint of a provider cache item, the size of the arrays it holds"""
+    return _arrays_nbytes(item.data)
+
+
+class MemoryCache:
+    """In-process LRU tier holding decoded provider cache items, bounded in bytes.
+
+    Parameters
+    ----------
+    max_bytes: Callable[[], int]
+        returns the maximum total size of stored items, 0 disables this tier
+    """
+
+    def __init__(self, max_bytes: Callable[[], int]):
+        self._max_bytes = max_bytes
+        self._lock = Lock()
+        self._items: "OrderedDict[str, Tuple[CacheItem, int]]" = OrderedDict()
+        self._nbytes = 0
+        self._hit = 0
+        self._miss = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_bytes() > 0
+
+    def get(self, key: str, accept: Callable[["CacheItem"], bool] = None) -> "CacheItem" or None:
+        """Returns stored item, items rejected by ``accept`` are dropped and count as a miss"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            item, _ = self._items.get(key, (None, 0))
+            if item is not None and accept is not None and not accept(item):
+                self._drop(key)
+                item = None
+            if item is None:
+                self._miss += 1
+                return None
+            self._items.move_to_end(key)
+            self._hit += 1
+            return item
+
+    def put(self, key: str, item: "CacheItem"):
+        """Stores given item, arrays memory mapped from a disk entry are copied so stored items never keep cache files
+        open or mapped"""
+        max_bytes = self._max_bytes()
+        if max_bytes <= 0:
+            return
+        size = item_nbytes(item)
+        if size > max_bytes:
+            self.pop(key)
+            return
+        item = copy.copy(item)
+        item.data = columnar.detach(item.data)
+        with self._lock:
+            self._drop(key)
+            self._items[key] = (item, size)
+            self._nbytes += size
+            evicted = 0
+            while self._nbytes > max_bytes:
+                self._drop(next(iter(self._items)))
+                evicted += 1
+            self._evictions += evicted
+        cache_stats.record_evictions("memory", evicted)
+
+    def pop(self, key: str):
+        with self._lock:
+            self._drop(key)
+
+    def _drop(self, key: str):
+        _, size = self._items.pop(key, (None, 0))
+        self._nbytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._nbytes = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def stats(self):
+        return {
+            "hit": self._hit,
+            "misses": self._miss,
+            "evictions": self._evictions,
+            "entries": len(self._items),
+            "nbytes": self._nbytes
+        }
@@ -1,19 +1,37 @@
 from speasy import SpeasyVariable
-from .cache import CacheItem
-from typing import List, Tuple
+from .cache import CacheItem, decode_item, encode_item
+from typing import Callable, List, Tuple
 from speasy.core.datetime_range import DateTimeRange
 from speasy.core import progress_bar
+from speasy.core.requests_scheduling.concurrency import BackgroundWorker, bounded_map
+from speasy.config import cache as cache_cfg, concurrency as concurrency_cfg
 from speasy.products.variable import merge as merge_variables, to_dictionary, from_dictionary
+from speasy.products.lazy_variable import LazyVariable
 from speasy.core.inventory.indexes import ParameterIndex
+from speasy.core.index import index
 from datetime import datetime, timedelta
 from functools import wraps
+from threading import Lock
 import logging
 import math
+import numpy as np
 from ._instance import _cache
+from ._memory_cache import item_nbytes
+from ._stats import cache_stats
+from ._quotas import version_tag
 
 log = logging.getLogger(__name__)
 
-CACHE_ALLOWED_KWARGS = ['disable_cache']
+CACHE_ALLOWED_KWARGS = ['disable_cache', 'lazy']
+
+# serializes product fragment duration updates
+_fragment_hours_lock = Lock()
+
+# provider caches by prefix, lets offline tools know fragment durations and how entries are versioned
+provider_caches = {}
+
+background_revalidations = BackgroundWorker(max_workers=cache_cfg.max_background_revalidations,
+                                            name="speasy_cache_revalidation")
 
 
 def lower_hour_bound(dt: datetime, factor: int):
@@ -26,6 +44,12 @@ def upper_hour_bound(dt: datetime, factor: int):
 
 
 def round_for_cache(dt_range: DateTimeRange, fragment_hours: int):
+    if fragment_hours > 24:
+        # multi-day fragments can't be aligned on days, they are aligned on epoch instead
+        epoch = datetime(1970, 1, 1, tzinfo=dt_range.start_time.tzinfo)
+        step = timedelta(hours=fragment_hours)
+        return DateTimeRange(epoch + ((dt_range.start_time - epoch) // step) * step,
+                             epoch + -((epoch - dt_range.stop_time) // step) * step)
     start_time = dt_range.start_time.replace(hour=lower_hour_bound(dt_range.start_time, fragment_hours), minute=0,
                                              second=0, microsecond=0)
     stop_time = dt_range.stop_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(
@@ -53,10 +77,37 @@ def group_contiguous_fragments(fragments, duration):
     return group_fragments_if(fragments, lambda previous, current: (previous + duration * 1.01) > current)
 
 
+FRAGMENT_HOURS_CANDIDATES = (1, 2, 3, 4, 6, 8, 12, 24, 48, 96, 192, 384, 768)
+
+
+def fragment_hours_for_size(bytes_per_hour: float, target_size: float) -> int:
+    """Largest fragment duration in :data:`FRAGMENT_HOURS_CANDIDATES` which keeps fragments below target_size bytes.
+    Durations up to a day divide a day and longer ones are multiples of a day so both can be aligned by
+    :func:`round_for_cache`.
+    """
+    candidates = [hours for hours in FRAGMENT_HOURS_CANDIDATES if hours * bytes_per_hour <= target_size]
+    return candidates[-1] if candidates else FRAGMENT_HOURS_CANDIDATES[0]
+
+
+def fragment_prefix(prefix: str, fragment_hours: int, default_fragment_hours: int) -> str:
+    """Cache entries prefix, entries using provider default fragment duration keep the historical prefix while
+    entries using an adapted duration get it appended, e.g. ``cda@48h``, so both can coexist in the same cache.
+    """
+    if fragment_hours is None or fragment_hours == default_fragment_hours:
+        return prefix
+    return f"{prefix}@{fragment_hours}h"
+
+
 def default_cache_entry_name(prefix: str, product: str, start_time: str, **kwargs):
     return f"{prefix}/{product}/{start_time}"
 
 
+def maybe_downcast(variable: SpeasyVariable or None) -> SpeasyVariable or None:
+    if variable is not None and cache_cfg.downcast_to_float32():
+        return variable.as_float32()
+    return variable
+
+
 def product_name(product: str or ParameterIndex):
     if type(product) is str:
         return product
@@ -69,11 +120,13 @@ def product_name(product: str or ParameterIndex):
 class _Cacheable:
     def __init__(self, prefix, cache_instance=_cache, start_time_arg='start_time', stop_time_arg='stop_time',
                  version=None,
-                 fragment_hours=lambda x: 1, cache_margins=1.2, leak_cache=False, entry_name=default_cache_entry_name):
+                 fragment_hours=lambda x: 1, cache_margins=1.2, leak_cache=False, entry_name=default_cache_entry_name,
+                 adaptive_fragments=False):
         self.start_time_arg = start_time_arg
         self.stop_time_arg = stop_time_arg
         self.version = (lambda x, y: 0) if version is None else version
         self.fragment_hours = fragment_hours
+        self.adaptive_fragments = adaptive_fragments
         self.cache_margins = cache_margins
         self.cache = cache_instance
         self.prefix = prefix
@@ -82,102 +135,265 @@ class _Cacheable:
 
     def add_to_cache(self, variable: SpeasyVariable or None, fragments, product, fragment_duration_hours, version,
                      **kwargs) -> SpeasyVariable or None:
+        variable = maybe_downcast(variable)
         if variable is not None:
-            for fragment in fragments:
-                self.set_cache_entry(fragment, product,
-                                     CacheItem(to_dictionary(
-                                         variable[fragment:(fragment + timedelta(hours=fragment_duration_hours))]),
-                                         version))
+            cache_stats.record_download(self.prefix, product, variable.nbytes)
+            self.learn_fragment_hours(variable, product, len(fragments) * fragment_duration_hours)
+            # fragments of a group are written in one transaction so concurrent readers never see a half written group
+            with self.cache.transact():
+                for fragment in fragments:
+                    self.set_cache_entry(fragment, product,
+                                         CacheItem(to_dictionary(
+                                             variable[fragment:(fragment + timedelta(hours=fragment_duration_hours))]),
+                                             version), fragment_hours=fragment_duration_hours)
+                self.cache.coverage.add(self.entry_stem(product, fragment_duration_hours), fragment_duration_hours,
+                                        fragments)
         return variable
 
-    def set_cache_entry(self, fragment, product: str, entry, **kwargs):
-        key = self.entry_name(self.prefix, product, fragment.isoformat(), **kwargs)
+    def product_fragment_hours(self, product: str) -> int:
+        """Fragment duration for given product, either learned from a previous download when adaptive fragments are
+        enabled or provider default one.
+        """
+        if self.adaptive_fragments and cache_cfg.fragment_target_size() > 0:
+            return index.get("cache-fragment-hours", f"{self.prefix}/{product}", None) or self.fragment_hours(product)
+        return self.fragment_hours(product)
+
+    def learn_fragment_hours(self, variable: SpeasyVariable, product: str, duration_hours: float):
+        """Updates product size per hour estimate with downloaded variable and persists the fragment duration matching
+        it. Durations previously used for this product are remembered so their entries can still be read, see
+        :meth:`rebuild_entries`.
+        """
+        if not self.adaptive_fragments or len(variable) == 0 or duration_hours <= 0:
+            return
+        target_size = cache_cfg.fragment_target_size()
+        if target_size <= 0:
+            return
+        key = f"{self.prefix}/{product}"
+        with _fragment_hours_lock:
+            total_bytes, total_hours = index.get("cache-fragment-size", key, (0, 0.))
+            total_bytes, total_hours = total_bytes + variable.nbytes, total_hours + duration_hours
+            index.set("cache-fragment-size", key, (total_bytes, total_hours))
+            current_hours = self.product_fragment_hours(product)
+            fragment_hours = fragment_hours_for_size(total_bytes / total_hours, target_size)
+            if fragment_hours != current_hours:
+                log.debug(f"Using {fragment_hours}h cache fragments for {self.prefix}/{product}")
+                previous = [hours for hours in self.previous_fragment_hours(product) if
+                            hours not in (fragment_hours, current_hours)]
+                index.set("cache-previous-fragment-hours", key, previous + [current_hours])
+                index.set("cache-fragment-hours", key, fragment_hours)
+
+    def previous_fragment_hours(self, product: str) -> List[int]:
+        """Fragment durations used for given product before the current one, most recent last"""
+        if not self.adaptive_fragments:
+            return []
+        return index.get("cache-previous-fragment-hours", f"{self.prefix}/{product}", [])
+
+    def rebuild_entries(self, fragments: List[datetime], product: str, fragment_hours: int, previous_hours: int,
+                        accept: Callable[[CacheItem], bool] = None, **kwargs) -> List[CacheItem or None]:
+        """Builds entries of given fragments from entries stored with a previously used fragment duration. Fragments
+        are only rebuilt when all the previous entries they overlap are found and accepted, rebuilt entries are
+        stored with the current duration so previous entries are only read once.
+        """
+        duration = timedelta(hours=fragment_hours)
+        step = timedelta(hours=previous_hours)
+        overlaps = []
+        for fragment in fragments:
+            dt_range = round_for_cache(DateTimeRange(fragment, fragment + duration), previous_hours)
+            overlaps.append([dt_range.start_time + i * step for i in range(math.ceil(dt_range.duration / step))])
+        previous_fragments = sorted(set(fragment for overlap in overlaps for fragment in overlap))
+        covered = self.cache.coverage.covered(self.entry_stem(product, previous_hours, **kwargs), previous_fragments,
+                                              previous_hours)
+        previous_fragments = [fragment for fragment, is_covered in zip(previous_fragments, covered) if is_covered]
+        found = {}
+        if previous_fragments:
+            values = self.cache.get_many(
+                [self.entry_key(fragment, product, previous_hours, **kwargs) for fragment in previous_fragments],
+                read=True)
+            for fragment, value in zip(previous_fragments, values):
+                entry = decode_item(value)
+                if entry is not None and (accept is None or accept(entry)):
+                    found[fragment] = entry
+        entries = []
+        with self.cache.transact():
+            for fragment, overlap in zip(fragments, overlaps):
+                if not all(previous in found for previous in overlap):
+                    entries.append(None)
+                    continue
+                variable = merge_variables([from_dictionary(found[previous].data) for previous in overlap])
+                version = min((found[previous].version for previous in overlap if found[previous].version is not None),
+                              default=None)
+                entry = CacheItem(to_dictionary(variable[fragment:fragment + duration]), version)
+                self.set_cache_entry(fragment, product, entry, fragment_hours=fragment_hours, **kwargs)
+                entries.append(entry)
+            rebuilt = [fragment for fragment, entry in zip(fragments, entries) if entry is not None]
+            if rebuilt:
+                self.cache.coverage.add(self.entry_stem(product, fragment_hours, **kwargs), fragment_hours, rebuilt)
+        return entries
+
+    def entry_key(self, fragment: datetime, product: str, fragment_hours: int = None, **kwargs) -> str:
+        prefix = fragment_prefix(self.prefix, fragment_hours, self.fragment_hours(product))
+        return self.entry_name(prefix, product, fragment.isoformat(), **kwargs)
+
+    def entry_stem(self, product: str, fragment_hours: int = None, **kwargs) -> str:
+        """Entry key without fragment start time, identifies product fragments in the coverage index"""
+        prefix = fragment_prefix(self.prefix, fragment_hours, self.fragment_hours(product))
+        return self.entry_name(prefix, product, "", **kwargs)
+
+    def set_cache_entry(self, fragment, product: str, entry, fragment_hours: int = None, **kwargs):
+        key = self.entry_key(fragment, product, fragment_hours, **kwargs)
         log.debug(f"add {key} into cache")
-        self.cache[key] = entry
+        self.cache.set(key, encode_item(entry), tag=version_tag(entry.version))
+        self.cache.memory.put(key, entry)
 
     def get_cache_entry(self, fragment: datetime, product, **kwargs):
-        key = self.entry_name(self.prefix, product, fragment.isoformat(), **kwargs)
-        if key in self.cache:
-            entry = self.cache[key]
-            log.debug(f"Found {key} inside cache")
-            return entry
-        else:
-            log.debug(f"{key} not found inside cache")
-        return None
+        return self.get_cache_entries([fragment], product, **kwargs)[0]
 
-    def get_from_cache(self, fragment, product, version, **kwargs):
-        entry = self.get_cache_entry(fragment, product, **kwargs)
+    @staticmethod
+    def entry_to_variable(entry: CacheItem or None, version) -> SpeasyVariable or None:
         if entry is not None:
             if is_up_to_date(entry, version):
                 return from_dictionary(entry.data)
             log.debug(f"Cache entry is outdated")
         return None
 
+    def get_from_cache(self, fragment, product, version, **kwargs):
+        return self.entry_to_variable(self.get_cache_entry(fragment, product, **kwargs), version)
+
     def fragment_list(self, product, dt_range) -> Tuple[int, List[datetime]]:
-        fragment_hours = self.fragment_hours(product)
+        fragment_hours = self.product_fragment_hours(product)
         cache_dt_range = round_for_cache(dt_range * self.cache_margins, fragment_hours)
         dt = timedelta(hours=fragment_hours)
         fragments = [cache_dt_range.start_time + i * dt for i in range(math.ceil(cache_dt_range.duration / dt))]
         return fragment_hours, fragments
 
-    def get_fragments_from_cache(self, fragments: List[datetime], product: str, version, **kwargs):
-        data_fragments = []
-        with self.cache.transact():
-            for fragment in fragments:
-                data_fragments.append(self.get_from_cache(fragment, product, version, **kwargs))
-        return data_fragments
-
-    def get_cache_entries(self, fragments: List[datetime], product: str, **kwargs):
-        return [self.get_cache_entry(fragment, product, **kwargs) for fragment in fragments]
+    def get_fragments_from_cache(self, fragments: List[datetime], product: str, version, lazy: bool = False,
+                                 **kwargs):
+        return [self.entry_to_variable(entry, version) for entry in
+                self.get_cache_entries(fragments, product, accept=lambda entry: is_up_to_date(entry, version),
+                                       lazy=lazy, **kwargs)]
+
+    def get_cache_entries(self, fragments: List[datetime], product: str,
+                          accept: Callable[[CacheItem], bool] = None, fragment_hours: int = None, lazy: bool = False,
+                          **kwargs):
+        """Looks up fragments in the memory tier first then on disk, memory entries rejected by accept (outdated) are
+        dropped and looked up on disk since another process might have refreshed them. When fragment_hours is given,
+        fragments outside of the product coverage index are known to be missing and are not looked up, missing ones
+        are then rebuilt from entries stored with a previous fragment duration (see :meth:`rebuild_entries`). Only lazy
+        lookups memory map large disk entries, see :func:`decode_item`.
+        """
+        keys = [self.entry_key(fragment, product, fragment_hours, **kwargs) for fragment in fragments]
+        covered = None
+        if fragment_hours is not None:
+            stem = self.entry_stem(product, fragment_hours, **kwargs)
+            covered = self.cache.coverage.covered(stem, fragments, fragment_hours)
+        memory = self.cache.memory
+        entries = [memory.get(key, accept) if covered is None or covered[index] else None for index, key in
+                   enumerate(keys)]
+        memory_hits = sum(entry is not None for entry in entries)
+        nbytes = sum(item_nbytes(entry) for entry in entries if entry is not None)
+        missing = [index for index, entry in enumerate(entries) if entry is None and (covered is None or covered[index])]
+        if covered is not None:
+            self.cache.count_skipped_lookups(len(keys) - int(np.count_nonzero(covered)))
+        hits = 0
+        if missing:
+            for index, value in zip(missing, self.cache.get_many([keys[index] for index in missing], read=True)):
+                entry = decode_item(value, lazy=lazy)
+                entries[index] = entry
+                if entry is not None and (accept is None or accept(entry)):
+                    memory.put(keys[index], entry)
+                    hits += 1
+                    nbytes += item_nbytes(entry)
+            if covered is not None:
+                # entries evicted by diskcache size limit are still covered until looked up
+                evicted = [fragments[index] for index in missing if entries[index] is None]
+                if evicted:
+                    self.cache.coverage.remove(stem, fragment_hours, evicted)
+        if fragment_hours is not None:
+            for previous_hours in reversed(self.previous_fragment_hours(product)):
+                missing = [index for index, entry in enumerate(entries) if entry is None]
+                if not missing:
+                    break
+                rebuilt = self.rebuild_entries([fragments[index] for index in missing], product, fragment_hours,
+                                               previous_hours, accept=accept, **kwargs)
+                for index, entry in zip(missing, rebuilt):
+                    if entry is not None:
+                        entries[index] = entry
+                        hits += 1
+                        nbytes += item_nbytes(entry)
+        cache_stats.record_lookup(self.prefix, product, fragments=len(keys), hits=hits,
+                                  memory_hits=memory_hits, misses=len(keys) - memory_hits - hits,
+                                  nbytes=nbytes)
+        log.debug(f"Found {sum(entry is not None for entry in entries)}/{len(keys)} {product} fragments inside cache")
+        return entries
 
 
 class Cacheable(object):
     def __init__(self, prefix, cache_instance=_cache, start_time_arg='start_time', stop_time_arg='stop_time',
                  version=None,
-                 fragment_hours=lambda x: 1, cache_margins=1.2, leak_cache=False, entry_name=default_cache_entry_name):
+                 fragment_hours=lambda x: 1, cache_margins=1.2, leak_cache=False, entry_name=default_cache_entry_name,
+                 adaptive_fragments=False):
         self._cache = _Cacheable(prefix, cache_instance=cache_instance, start_time_arg=start_time_arg,
                                  stop_time_arg=stop_time_arg,
                                  version=version,
                                  fragment_hours=fragment_hours, cache_margins=cache_margins, leak_cache=leak_cache,
-                                 entry_name=entry_name)
+                                 entry_name=entry_name, adaptive_fragments=adaptive_fragments)
+        self.provider = None
+        provider_caches[prefix] = self
+
+    def current_version(self, product: str):
+        """Current version of given product according to the provider this cache was last used with, None when the
+        cache was not used yet or when the provider can't tell"""
+        if self.provider is None:
+            return None
+        try:
+            return self._cache.version(self.provider, product)
+        except Exception:  # lgtm [py/catch-base-exception]
+            return None
 
     def __call__(self, get_data):
         @wraps(get_data)
         def wrapped(wrapped_self, product, start_time, stop_time, **kwargs):
             product = product_name(product)
+            self.provider = wrapped_self
             version = self._cache.version(wrapped_self, product)
             dt_range = DateTimeRange(start_time, stop_time)
+            lazy = kwargs.pop("lazy", False)
             if kwargs.pop("disable_cache", False):
-                return get_data(wrapped_self, product=product, start_time=dt_range.start_time,
-                                stop_time=dt_range.stop_time, **kwargs)
+                return maybe_downcast(get_data(wrapped_self, product=product, start_time=dt_range.start_time,
+                                               stop_time=dt_range.stop_time, **kwargs))
 
             fragment_hours, fragments = self._cache.fragment_list(product, dt_range)
             fragment_duration = timedelta(hours=fragment_hours)
             data_chunks = self._cache.get_fragments_from_cache(fragments=fragments, product=product, version=version,
-                                                               **kwargs)
+                                                               fragment_hours=fragment_hours, lazy=lazy, **kwargs)
             missing_fragments = group_contiguous_fragments(
                 [fragment for f_data, fragment in zip(data_chunks, fragments) if f_data is None],
                 duration=fragment_duration)
 
-            data_chunks += [
-                self._cache.add_to_cache(
+            def download(fragment_group):
+                return self._cache.add_to_cache(
                     get_data(
                         wrapped_self, product=product, start_time=fragment_group[0],
                         stop_time=fragment_group[-1] + fragment_duration, **kwargs),
                     fragments=fragment_group, product=product, fragment_duration_hours=fragment_hours,
                     version=version, **kwargs)
-                for fragment_group
-                in
-                progress_bar(leave=False, desc="Downloading missing fragments from cache", **kwargs)(missing_fragments)]
+
+            data_chunks += bounded_map(download, missing_fragments,
+                                       max_workers=concurrency_cfg.max_fragment_downloads(),
+                                       progress=progress_bar(leave=False,
+                                                             desc="Downloading missing fragments from cache",
+                                                             **kwargs))
 
             data_chunks = list(filter(lambda d: d is not None, data_chunks))
 
             if len(data_chunks):
+                if lazy:
+                    return LazyVariable(data_chunks, dt_range.start_time, dt_range.stop_time, transform=maybe_downcast)
                 if len(data_chunks) == 1:
-                    return data_chunks[0][dt_range.start_time:dt_range.stop_time].copy()
+                    return maybe_downcast(data_chunks[0][dt_range.start_time:dt_range.stop_time].copy())
                 data_chunks[0] = data_chunks[0][dt_range.start_time:]
                 data_chunks[-1] = data_chunks[-1][:dt_range.stop_time]
-                return merge_variables(data_chunks)[dt_range.start_time:dt_range.stop_time]
+                return maybe_downcast(merge_variables(data_chunks)[dt_range.start_time:dt_range.stop_time])
             return None
 
         if self._cache.leak_cache:
@@ -188,16 +404,19 @@ class Cacheable(object):
 class UnversionedProviderCache(object):
     def __init__(self, prefix, cache_instance=_cache, start_time_arg='start_time', stop_time_arg='stop_time',
                  fragment_hours=lambda x: 1, cache_margins=1.2, leak_cache=False, entry_name=default_cache_entry_name,
-                 cache_retention=None):
+                 cache_retention=None, adaptive_fragments=False):
         self._cache = _Cacheable(prefix, cache_instance=cache_instance, start_time_arg=start_time_arg,
                                  stop_time_arg=stop_time_arg,
                                  version=lambda x, y: datetime.utcnow().isoformat(),
                                  fragment_hours=fragment_hours, cache_margins=cache_margins, leak_cache=leak_cache,
-                                 entry_name=entry_name)
+                                 entry_name=entry_name, adaptive_fragments=adaptive_fragments)
         self.cache_retention = cache_retention or timedelta(days=14)
+        provider_caches[prefix] = self
 
-    def split_fragments(self, fragments, product, fragment_duration, **kwargs):
-        entries = self._cache.get_cache_entries(fragments=fragments, product=product, **kwargs)
+    def split_fragments(self, fragments, product, fragment_duration, lazy=False, **kwargs):
+        entries = self._cache.get_cache_entries(
+            fragments=fragments, product=product, fragment_hours=fragment_duration // timedelta(hours=1),
+            accept=lambda entry: (entry.version + self.cache_retention) > datetime.utcnow(), lazy=lazy, **kwargs)
         missing_fragments = []
         data_chunks = []
         maybe_outdated_fragments = []
@@ -226,48 +445,66 @@ class UnversionedProviderCache(object):
         def wrapped(wrapped_self, product, start_time, stop_time, **kwargs):
             product = product_name(product)
             dt_range = DateTimeRange(start_time, stop_time)
+            lazy = kwargs.pop("lazy", False)
             if kwargs.pop("disable_cache", False):
-                return get_data(wrapped_self, product=product, start_time=dt_range.start_time,
-                                stop_time=dt_range.stop_time, **kwargs)
+                return maybe_downcast(get_data(wrapped_self, product=product, start_time=dt_range.start_time,
+                                               stop_time=dt_range.stop_time, **kwargs))
 
             fragment_hours, fragments = self._cache.fragment_list(product, dt_range)
             fragment_duration = timedelta(hours=fragment_hours)
             data_chunks, maybe_outdated_fragments, missing_fragments = self.split_fragments(fragments, product,
-                                                                                            fragment_duration, **kwargs)
-            data_chunks += \
-                list(filter(lambda d: d is not None, [
-                    self._cache.add_to_cache(
-                        get_data(
-                            wrapped_self, product=product, start_time=fragment_group[0],
-                            stop_time=fragment_group[-1] + fragment_duration, **kwargs),
-                        fragments=fragment_group, product=product, fragment_duration_hours=fragment_hours,
-                        version=datetime.utcnow(), **kwargs)
-                    for fragment_group
-                    in progress_bar(leave=False, desc="Downloading missing fragments from cache", **kwargs)(
-                        missing_fragments)]))
-
-            for group in progress_bar(leave=False, desc="Checking if cache fragments are outdated", **kwargs)(
-                maybe_outdated_fragments):
+                                                                                            fragment_duration,
+                                                                                            lazy=lazy, **kwargs)
+            def download(fragment_group):
+                return self._cache.add_to_cache(
+                    get_data(
+                        wrapped_self, product=product, start_time=fragment_group[0],
+                        stop_time=fragment_group[-1] + fragment_duration, **kwargs),
+                    fragments=fragment_group, product=product, fragment_duration_hours=fragment_hours,
+                    version=datetime.utcnow(), **kwargs)
+
+            def revalidate(group):
                 oldest = max(group, key=lambda item: item[1].version)[1].version
                 data = get_data(wrapped_self, product=product, start_time=group[0][0],
                                 stop_time=group[-1][0] + fragment_duration, if_newer_than=oldest, **kwargs)
                 if data is None:
-                    for fragment, entry in group:
-                        entry.version = datetime.utcnow()
-                        self._cache.set_cache_entry(fragment, product, entry)
-                        data_chunks.append(entry.data)
-                else:
-                    self._cache.add_to_cache(data, [item[0] for item in group], product,
-                                             fragment_duration_hours=fragment_hours,
-                                             version=datetime.now(), **kwargs)
-                    data_chunks.append(data)
+                    with self._cache.cache.transact():
+                        for fragment, entry in group:
+                            entry.version = datetime.utcnow()
+                            self._cache.set_cache_entry(fragment, product, entry, fragment_hours=fragment_hours)
+                    return [from_dictionary(entry.data) for _, entry in group]
+                self._cache.add_to_cache(data, [item[0] for item in group], product,
+                                         fragment_duration_hours=fragment_hours,
+                                         version=datetime.utcnow(), **kwargs)
+                return [data]
+
+            if cache_cfg.stale_while_revalidate():
+                # outdated entries are returned as is and refreshed in background for next requests
+                for group in maybe_outdated_fragments:
+                    data_chunks += [from_dictionary(entry.data) for _, entry in group]
+                    background_revalidations.submit(self._cache.entry_key(group[0][0], product, fragment_hours),
+                                                    revalidate, group)
+                maybe_outdated_fragments = []
+
+            max_workers = concurrency_cfg.max_fragment_downloads()
+            data_chunks += list(filter(lambda d: d is not None, bounded_map(
+                download, missing_fragments, max_workers=max_workers,
+                progress=progress_bar(leave=False, desc="Downloading missing fragments from cache", **kwargs))))
+
+            for chunks in bounded_map(revalidate, maybe_outdated_fragments, max_workers=max_workers,
+                                      progress=progress_bar(leave=False,
+                                                            desc="Checking if cache fragments are outdated",
+                                                            **kwargs)):
+                data_chunks += chunks
 
             if len(data_chunks):
+                if lazy:
+                    return LazyVariable(data_chunks, dt_range.start_time, dt_range.stop_time, transform=maybe_downcast)
                 if len(data_chunks) == 1:
-                    return data_chunks[0][dt_range.start_time:dt_range.stop_time].copy()
+                    return maybe_downcast(data_chunks[0][dt_range.start_time:dt_range.stop_time].copy())
                 data_chunks[0] = data_chunks[0][dt_range.start_time:]
                 data_chunks[-1] = data_chunks[-1][:dt_range.stop_time]
-                return merge_variables(data_chunks)[dt_range.start_time:dt_range.stop_time]
+                return maybe_downcast(merge_variables(data_chunks)[dt_range.start_time:dt_range.stop_time])
             return None
 
         if self._cache.leak_cache:
@@ -0,0 +1,114 @@
+import logging
+import math
+from datetime import datetime
+from threading import Event, Thread
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from speasy.core import make_utc_datetime
+
+log = logging.getLogger(__name__)
+
+
+class CacheEntryInfo(NamedTuple):
+    """Cache entry metadata as recorded by diskcache, tag holds the entry version as a float when known"""
+    key: str
+    size: int
+    store_time: float
+    access_time: float
+    access_count: int
+    tag: Optional[float]
+
+
+class EvictionPolicy(NamedTuple):
+    """Orders entries to evict, entries with the smallest sort key are evicted first.
+
+    Parameters
+    ----------
+    sort_key: Callable[[CacheEntryInfo], Any]
+        eviction order
+    diskcache_policy: str
+        diskcache eviction policy maintaining the metadata needed by sort_key, also used by diskcache when the
+        global size limit is reached. Both 'least-recently-used' and 'least-frequently-used' turn each read into a
+        write.
+    """
+    sort_key: Callable[[CacheEntryInfo], Any]
+    diskcache_policy: str = 'least-recently-stored'
+
+
+eviction_policies: Dict[str, EvictionPolicy] = {
+    "lru": EvictionPolicy(sort_key=lambda entry: entry.access_time, diskcache_policy='least-recently-used'),
+    "lfu": EvictionPolicy(sort_key=lambda entry: (entry.access_count, entry.access_time),
+                          diskcache_policy='least-frequently-used'),
+    "oldest-version-first": EvictionPolicy(
+        sort_key=lambda entry: (entry.tag if entry.tag is not None else -math.inf, entry.store_time)),
+}
+
+
+def register_eviction_policy(name: str, policy: EvictionPolicy):
+    """Makes given policy available through CACHE/eviction_policy config entry"""
+    eviction_policies[name] = policy
+
+
+def get_eviction_policy(name: str) -> EvictionPolicy:
+    if name not in eviction_policies:
+        raise ValueError(f"Unknown cache eviction policy {name}, available policies: {list(eviction_policies)}")
+    return eviction_policies[name]
+
+
+def version_tag(version) -> Optional[float]:
+    """Converts a cache entry version to a float usable as a diskcache tag, dates are converted to timestamps"""
+    if isinstance(version, (int, float)) and not isinstance(version, bool):
+        return float(version)
+    if isinstance(version, (str, datetime)):
+        try:
+            return make_utc_datetime(version).timestamp()
+        except (ValueError, OverflowError):
+            return None
+    return None
+
+
+def glob_escape(text: str) -> str:
+    return ''.join(f'[{c}]' if c in '*?[' else c for c in text)
+
+
+def quota_patterns(name: str) -> List[str]:
+    """Key patterns covered by a quota, either a provider cache prefix such as ``cda`` or a provider prefix and a
+    product such as ``cda/AC_H0_MFI``. Entries using adapted fragment durations (``cda@48h/...``) are included.
+    """
+    if '/' in name:
+        prefix, product = map(glob_escape, name.split('/', 1))
+        return [f"{prefix}/{product}/*", f"{prefix}@*/{product}/*"]
+    prefix = glob_escape(name)
+    return [f"{prefix}/*", f"{prefix}@*"]
+
+
+class Maintenance:
+    """Runs given task every interval seconds from a daemon thread"""
+
+    def __init__(self, task: Callable[[], Any], name: str):
+        self._task = task
+        self._name = name
+        self._thread: Optional[Thread] = None
+        self._stop: Optional[Event] = None
+
+    def start(self, interval: float):
+        self.stop()
+        stop = Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self._task()
+                except Exception as e:  # lgtm [py/catch-base-exception]
+                    log.warning(f"{self._name} failed: {e!r}")
+
+        self._stop = stop
+        self._thread = Thread(target=run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+            self._thread.join()
+            self._stop = None
+            self._thread = None
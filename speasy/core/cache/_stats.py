@@ -0,0 +1,176 @@
+import json
+import logging
+from collections import defaultdict
+from copy import deepcopy
+from datetime import datetime
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Callable, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+
+def _product_counters() -> Dict[str, int]:
+    return {
+        "requests": 0,
+        "fragments": 0,
+        "hits": 0,
+        "memory_hits": 0,
+        "misses": 0,
+        "bytes_from_cache": 0,
+        "bytes_from_network": 0,
+    }
+
+
+def _ratio(numerator: float, denominator: float) -> float:
+    return numerator / denominator if denominator else 0.
+
+
+def _with_ratios(counters: Dict[str, int]) -> Dict[str, float]:
+    counters = dict(counters)
+    lookups = counters["hits"] + counters["memory_hits"] + counters["misses"]
+    counters["hit_ratio"] = _ratio(counters["hits"] + counters["memory_hits"], lookups)
+    counters["fragments_per_request"] = _ratio(counters["fragments"], counters["requests"])
+    return counters
+
+
+def _accumulate(total: Dict[str, int], counters: Dict[str, int]):
+    for name, value in counters.items():
+        total[name] += value
+
+
+class CacheStatistics:
+    """Thread safe provider cache instrumentation: per provider and per product hit ratios, bytes served from cache
+    versus network, fragments per request, time spent (de)serializing entries and eviction counts.
+    Providers are identified by their cache prefix.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._dump_thread: Optional[Thread] = None
+        self._dump_stop: Optional[Event] = None
+        self.reset()
+
+    def reset(self):
+        """Resets all counters"""
+        with self._lock:
+            self._products = defaultdict(lambda: defaultdict(_product_counters))
+            self._serialization = {"encoded": 0, "encode_seconds": 0., "decoded": 0, "decode_seconds": 0.}
+            self._evictions = {"disk": 0, "memory": 0}
+            self._since = datetime.utcnow()
+
+    def record_lookup(self, provider: str, product: str, fragments: int, hits: int, memory_hits: int, misses: int,
+                      nbytes: int):
+        with self._lock:
+            counters = self._products[provider][product]
+            counters["requests"] += 1
+            counters["fragments"] += fragments
+            counters["hits"] += hits
+            counters["memory_hits"] += memory_hits
+            counters["misses"] += misses
+            counters["bytes_from_cache"] += nbytes
+
+    def record_download(self, provider: str, product: str, nbytes: int):
+        with self._lock:
+            self._products[provider][product]["bytes_from_network"] += nbytes
+
+    def record_encode(self, seconds: float):
+        with self._lock:
+            self._serialization["encoded"] += 1
+            self._serialization["encode_seconds"] += seconds
+
+    def record_decode(self, count: int, seconds: float):
+        with self._lock:
+            self._serialization["decoded"] += count
+            self._serialization["decode_seconds"] += seconds
+
+    def record_evictions(self, tier: str, count: int):
+        if count > 0:
+            with self._lock:
+                self._evictions[tier] += count
+
+    def snapshot(self) -> Dict:
+        """Returns a consistent copy of all counters
+
+        Returns
+        -------
+        Dict
+            ``total``, per ``providers`` counters with their per ``products`` details, ``serialization`` timings and
+            ``evictions`` per tier, counting since ``since``
+        """
+        with self._lock:
+            providers = {}
+            total = _product_counters()
+            for provider, products in self._products.items():
+                provider_total = _product_counters()
+                for counters in products.values():
+                    _accumulate(provider_total, counters)
+                _accumulate(total, provider_total)
+                providers[provider] = _with_ratios(provider_total)
+                providers[provider]["products"] = {product: _with_ratios(counters) for product, counters in
+                                                   products.items()}
+            return {
+                "since": self._since.isoformat(),
+                "total": _with_ratios(total),
+                "providers": providers,
+                "serialization": deepcopy(self._serialization),
+                "evictions": deepcopy(self._evictions)
+            }
+
+    def start_periodic_dump(self, path: str, interval: float, reset: bool = False):
+        """Appends a JSON snapshot as one line to given file every interval seconds from a background thread
+
+        Parameters
+        ----------
+        path: str
+            output file
+        interval: float
+            seconds between two snapshots
+        reset: bool
+            resets counters after each snapshot when True
+        """
+        self.stop_periodic_dump()
+        stop = Event()
+
+        def dump():
+            while not stop.wait(interval):
+                self.dump(path, reset=reset)
+
+        self._dump_stop = stop
+        self._dump_thread = Thread(target=dump, name="speasy-cache-stats-dump", daemon=True)
+        self._dump_thread.start()
+
+    def stop_periodic_dump(self):
+        if self._dump_stop is not None:
+            self._dump_stop.set()
+            self._dump_thread.join()
+            self._dump_stop = None
+            self._dump_thread = None
+
+    def dump(self, path: str, reset: bool = False):
+        snapshot = self.snapshot()
+        if reset:
+            self.reset()
+        try:
+            with open(path, 'a') as f:
+                f.write(json.dumps(snapshot) + "\n")
+        except OSError as e:
+            log.warning(f"Failed to dump cache statistics to {path}: {e}")
+
+
+cache_stats = CacheStatistics()
+
+
+class Stopwatch:
+    """Measures elapsed time of a with block and passes it to given callback"""
+    __slots__ = ['_callback', '_start']
+
+    def __init__(self, callback: Callable[[float], None]):
+        self._callback = callback
+
+    def __enter__(self):
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self._callback(perf_counter() - self._start)
@@ -1,11 +1,47 @@
-from typing import Union
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
 
 import diskcache as dc
 from .version import str_to_version, version_to_str, Version
 from speasy.config import cache as cache_cfg
-from contextlib import ExitStack
+from speasy.core import columnar
+from ._memory_cache import MemoryCache
+from ._stats import Stopwatch, cache_stats
+from ._quotas import CacheEntryInfo, get_eviction_policy, quota_patterns
+from ._coverage import CoverageIndex
+from contextlib import ExitStack, closing, nullcontext
+from threading import Lock
+import io
+import logging
+import os
+import sqlite3
+import time
 
-cache_version = str_to_version("2.0")
+log = logging.getLogger(__name__)
+
+cache_version = str_to_version("3.0")
+# entries written by these versions are still readable, opening such a cache does not clear it
+oldest_compatible_version = str_to_version("2.0")
+# smaller file entries are read into memory even by lazy lookups
+mmap_min_size = 1 << 20
+# keys looked up per query by get_many, below SQLite historical limit of 999 bound parameters
+_MAX_QUERY_KEYS = 500
+
+
+class _BufferReader(io.RawIOBase):
+    """Reads a bytes-like object in place, lets diskcache write large serialized entries without copying them"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
 
 
 class CacheItem:
@@ -14,23 +50,58 @@ class CacheItem:
         self.version = version
 
 
+def encode_item(item: CacheItem) -> bytearray:
+    """Serializes a cache item using :mod:`speasy.core.columnar` format, arrays are stored as raw buffers.
+    """
+    with Stopwatch(cache_stats.record_encode):
+        return columnar.dumps({"data": item.data, "version": item.version})
+
+
+def decode_item(value, lazy: bool = False) -> CacheItem or None:
+    """Builds a cache item from a value read with ``read=True``, columnar entries are either bytes or an open file.
+    Files are read into memory and closed, unless lazy is True and they are large enough to be worth memory mapping.
+    Each mapping holds a file descriptor and, on Windows, prevents the entry from being removed. Pickled
+    :class:`CacheItem` written by cache version 2.0 are returned as is.
+    """
+    if value is None:
+        return None
+    with Stopwatch(lambda seconds: cache_stats.record_decode(1, seconds)):
+        if isinstance(value, CacheItem):
+            return value
+        if isinstance(value, bytes):
+            return CacheItem(**columnar.loads(value))
+        with value:
+            if lazy and os.name != 'nt' and os.fstat(value.fileno()).st_size >= mmap_min_size:
+                return CacheItem(**columnar.load(value))
+            return CacheItem(**columnar.read(value))
+
+
 class Cache:
-    __slots__ = ['cache_file', '_data', '_hit', '_miss', 'cache_type']
+    __slots__ = ['cache_file', '_data', '_hit', '_miss', '_evictions', '_lock', 'cache_type', 'memory',
+                 'eviction_policy', 'coverage']
 
-    def __init__(self, cache_path: str = "", cache_type='Cache'):
+    def __init__(self, cache_path: str = "", cache_type='Cache', eviction_policy: str = None):
         cache_path = f"{cache_path}/{cache_type}"
+        self.eviction_policy = get_eviction_policy(eviction_policy or cache_cfg.eviction_policy())
         if cache_type == 'Fanout':
-            self._data = dc.FanoutCache(cache_path, shards=8, size_limit=cache_cfg.size())
+            self._data = dc.FanoutCache(cache_path, shards=8, size_limit=cache_cfg.size(),
+                                        eviction_policy=self.eviction_policy.diskcache_policy)
         elif cache_type == 'Cache':
-            self._data = dc.Cache(cache_path, size_limit=cache_cfg.size())
+            self._data = dc.Cache(cache_path, size_limit=cache_cfg.size(),
+                                  eviction_policy=self.eviction_policy.diskcache_policy)
         else:
             raise ValueError(f"Unimplemented cache type: {cache_type}")
 
         self.cache_type = cache_type
+        self._lock = Lock()
         self._hit = 0
         self._miss = 0
+        self._evictions = 0
+        self.memory = MemoryCache(max_bytes=cache_cfg.memory_size)
+        self.coverage = CoverageIndex(self)
         if self.version < cache_version:
-            self._data.clear()
+            if self.version < oldest_compatible_version:
+                self._data.clear()
             self.version = cache_version
 
     @property
@@ -47,9 +118,20 @@ class Cache:
     def stats(self):
         return {
             "hit": self._hit,
-            "misses": self._miss
+            "misses": self._miss,
+            "evictions": self._evictions,
+            "memory": self.memory.stats()
         }
 
+    def _count_lookups(self, hits: int, misses: int):
+        with self._lock:
+            self._hit += hits
+            self._miss += misses
+
+    def count_skipped_lookups(self, count: int):
+        """Counts entries known to be missing without looking them up, such as fragments outside of coverage"""
+        self._count_lookups(hits=0, misses=count)
+
     def __len__(self):
         return len(self._data)
 
@@ -60,30 +142,206 @@ class Cache:
         return list(self._data)
 
     def __contains__(self, item):
-        if item in self._data:
-            self._hit += 1
-            return True
-        self._miss += 1
-        return False
+        return item in self._data
 
     def __getitem__(self, key):
-        if key in self._data:
-            self._hit += 1
-        else:
-            self._miss += 1
-        return self._data[key]
+        try:
+            value = self._data[key]
+        except KeyError:
+            self._count_lookups(hits=0, misses=1)
+            raise
+        self._count_lookups(hits=1, misses=0)
+        return value
+
+    def _write(self, key, value, write):
+        # diskcache culls a few entries while writing once a shard size limit is reached, without telling how many.
+        # Entries are only counted around writes which can trigger a cull.
+        shard = self._shard(key)
+        if shard.volume() + (len(value) if type(value) in (bytes, bytearray) else 0) < shard.size_limit:
+            write()
+            return
+        # expired entries are not evictions
+        shard.expire(retry=True)
+        count = len(shard) + (0 if key in shard else 1)
+        write()
+        evicted = max(0, count - len(shard))
+        if evicted:
+            with self._lock:
+                self._evictions += evicted
+            cache_stats.record_evictions("disk", evicted)
 
     def __setitem__(self, key, value):
-        self._data[key] = value
+        self._write(key, value, lambda: self._data.__setitem__(key, value))
+
+    def get_many(self, keys: Iterable[str], read=False) -> list:
+        """Fetches several entries at once, keys are grouped by shard and each shard is queried once (by chunks of
+        :data:`_MAX_QUERY_KEYS` keys). Missing keys give None.
 
-    def set(self, key, value, expire=None):
-        self._data.set(key, value, expire=expire)
+        Parameters
+        ----------
+        keys: Iterable[str]
+            keys to look up
+        read: bool
+            when True large binary entries are returned as open files instead of bytes
 
-    def get(self, key, default_value=None):
-        return self._data.get(key, default_value)
+        Returns
+        -------
+        list
+            entries in the same order than keys
+        """
+        keys = list(keys)
+        by_shard: Dict[int, Tuple[dc.Cache, List[str]]] = {}
+        for key in keys:
+            shard = self._shard(key)
+            by_shard.setdefault(id(shard), (shard, []))[1].append(key)
+        found = {}
+        for shard, shard_keys in by_shard.values():
+            found.update(self._fetch_many(shard, shard_keys, read))
+        values = [found.get(key) for key in keys]
+        hits = sum(value is not None for value in values)
+        self._count_lookups(hits=hits, misses=len(values) - hits)
+        return values
 
-    def transact(self):
+    @staticmethod
+    def _fetch_many(shard: dc.Cache, keys: List[str], read: bool) -> Dict[str, Any]:
+        """Looks up given keys of a shard like diskcache get does for a single key, but with one query for all of them.
+        Lookups and the access metadata updates the eviction policy needs share a single transaction."""
+        update_column = dc.core.EVICTION_POLICY[shard.eviction_policy]['get']
+        found = {}
+        with shard.transact(retry=True) if update_column else nullcontext():
+            now = time.time()
+            for start in range(0, len(keys), _MAX_QUERY_KEYS):
+                chunk = keys[start:start + _MAX_QUERY_KEYS]
+                rows = shard._sql('SELECT rowid, key, mode, filename, value FROM Cache WHERE raw = 1 AND key IN '
+                                  f'({", ".join("?" * len(chunk))}) AND (expire_time IS NULL OR expire_time > ?)',
+                                  (*chunk, now)).fetchall()
+                for rowid, key, mode, filename, value in rows:
+                    try:
+                        found[key] = shard.disk.fetch(mode, filename, value, read)
+                    except IOError:
+                        # deleted since the query
+                        continue
+                    if update_column:
+                        shard._sql(f'UPDATE Cache SET {update_column.format(now=now)} WHERE rowid = ?', (rowid,))
+        return found
+
+    def set(self, key, value, expire=None, tag=None):
+        if type(value) is bytearray:
+            # diskcache only stores bytes as is, large serialized entries are streamed to their file instead of being
+            # copied to bytes first
+            if len(value) >= self._data.disk_min_file_size:
+                self._write(key, value, lambda: self._data.set(key, _BufferReader(value), expire=expire, read=True,
+                                                               tag=tag))
+                return
+            value = bytes(value)
+        self._write(key, value, lambda: self._data.set(key, value, expire=expire, tag=tag))
+
+    def get(self, key, default_value=None, read=False):
+        return self._data.get(key, default_value, read=read)
+
+    def transact(self, key: str = None):
+        """Write transaction on the whole cache, a no-op on Fanout caches since locking all shards would serialize all
+        writers. When key is given, only the shard storing it is locked whatever the backend, which is enough to
+        serialize read-modify-write updates of that key.
+        """
+        if key is not None:
+            return self._shard(key).transact(retry=True)
         if self.cache_type != 'Fanout':
             return self._data.transact()
         else:
             return ExitStack()
+
+    def _shards(self) -> List[dc.Cache]:
+        # diskcache has no public accessor for FanoutCache shards, this, _shard and _fetch_many are the only places
+        # relying on its internals
+        return self._data._shards if self.cache_type == 'Fanout' else [self._data]
+
+    def _shard(self, key: str) -> dc.Cache:
+        """Shard storing given key"""
+        if self.cache_type == 'Fanout':
+            return self._data._shards[self._data._hash(key) % self._data._count]
+        return self._data
+
+    @staticmethod
+    def _connect(shard: dc.Cache) -> sqlite3.Connection:
+        """Opens a connection to given shard database, separate from the ones diskcache uses, so metadata queries
+        never interfere with its transactions"""
+        return sqlite3.connect(os.path.join(shard.directory, dc.core.DBNAME), timeout=60, isolation_level=None)
+
+    def iter_entries_info(self, patterns: List[str] = None, batch_size: int = 1000) -> Iterator[CacheEntryInfo]:
+        """Streams metadata of entries whose key matches any of given glob patterns (all entries when None), values
+        are not read. Entries are fetched by batches so no read transaction is held while iterating.
+        """
+        condition = ' OR '.join(['key GLOB ?'] * len(patterns)) if patterns else '1'
+        query = ('SELECT rowid, key, size + ifnull(length(value), 0), store_time, access_time, access_count, tag '
+                 f'FROM Cache WHERE rowid > ? AND raw = 1 AND ({condition}) ORDER BY rowid LIMIT ?')
+        for shard in self._shards():
+            with closing(self._connect(shard)) as connection:
+                last_rowid = 0
+                while True:
+                    rows = connection.execute(query, (last_rowid, *(patterns or []), batch_size)).fetchall()
+                    for row in rows:
+                        yield CacheEntryInfo(*row[1:])
+                    if len(rows) < batch_size:
+                        break
+                    last_rowid = rows[-1][0]
+
+    def entries_info(self, patterns: List[str]) -> List[CacheEntryInfo]:
+        """Lists metadata of entries whose key matches any of given glob patterns, see :meth:`iter_entries_info`"""
+        return list(self.iter_entries_info(patterns))
+
+    def delete(self, key) -> bool:
+        self.memory.pop(key)
+        self.coverage.discard_key(key)
+        return self._data.delete(key, retry=True)
+
+    def compact(self):
+        """Removes expired entries, repairs inconsistencies between the database and value files, deletes orphan value
+        files and reclaims unused database space.
+        """
+        self._data.expire()
+        for shard in self._shards():
+            shard.check(fix=True)
+            with closing(self._connect(shard)) as connection:
+                connection.execute('VACUUM')
+
+    def usage(self, quota: str) -> int:
+        """Disk space in bytes used by entries covered by given quota name, see :meth:`enforce_quotas`"""
+        return sum(entry.size for entry in self.iter_entries_info(quota_patterns(quota)))
+
+    def enforce_quotas(self, quotas: Dict[str, int], max_evictions: int = 1000) -> int:
+        """Evicts entries exceeding given quotas according to this cache eviction policy. Entries are deleted one by
+        one, each deletion is a short transaction, so concurrent readers are never blocked for long. At most
+        max_evictions entries are deleted per call, remaining ones are deleted by next calls.
+
+        Parameters
+        ----------
+        quotas: Dict[str, int]
+            maximum size in bytes per provider cache prefix (e.g. ``cda``) or per provider prefix and product
+            (e.g. ``cda/AC_H0_MFI``)
+        max_evictions: int
+            maximum number of entries deleted by this call
+
+        Returns
+        -------
+        int
+            number of evicted entries
+        """
+        evicted = 0
+        for quota, max_size in quotas.items():
+            entries = self.entries_info(quota_patterns(quota))
+            usage = sum(entry.size for entry in entries)
+            if usage <= max_size:
+                continue
+            for entry in sorted(entries, key=self.eviction_policy.sort_key):
+                if usage <= max_size or evicted >= max_evictions:
+                    break
+                if self.delete(entry.key):
+                    evicted += 1
+                usage -= entry.size
+            log.debug(f"Cache quota {quota}: {usage}/{max_size} bytes used")
+        if evicted:
+            with self._lock:
+                self._evictions += evicted
+            cache_stats.record_evictions("disk", evicted)
+        return evicted
@@ -0,0 +1,202 @@
+"""Offline inspection and maintenance of the provider caches, every function streams over cache entries metadata
+without loading all keys nor values. Also available from command line::
+
+    python -m speasy.core.cache coverage [--provider amda]
+    python -m speasy.core.cache usage
+    python -m speasy.core.cache purge [--dry-run]
+    python -m speasy.core.cache compact
+"""
+import argparse
+import re
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from speasy.core.datetime_range import DateTimeRange
+from ._instance import _cache
+from ._providers_caches import Cacheable, provider_caches
+from ._quotas import CacheEntryInfo, version_tag
+from .cache import Cache
+
+_PREFIX = re.compile(r"^(?P<provider>[^/@]+)(@(?P<hours>\d+)h)?$")
+
+
+class ProviderEntry(NamedTuple):
+    """A provider cache entry, fragment_hours is None when it can't be known"""
+    provider: str
+    product: str
+    start_time: datetime
+    fragment_hours: Optional[int]
+    info: CacheEntryInfo
+
+
+def parse_entry_key(key: str) -> Optional[Tuple[str, Optional[int], str, datetime]]:
+    """Splits a provider cache key into provider prefix, adapted fragment duration if any, product and fragment start
+    time. Returns None for keys which do not belong to a provider cache.
+    """
+    parts = key.split('/')
+    match = _PREFIX.match(parts[0])
+    if len(parts) < 3 or match is None:
+        return None
+    try:
+        start_time = datetime.fromisoformat(parts[-1])
+    except ValueError:
+        return None
+    hours = match.group('hours')
+    return match.group('provider'), int(hours) if hours else None, '/'.join(parts[1:-1]), start_time
+
+
+def _default_fragment_hours(provider: str, product: str) -> Optional[int]:
+    if provider in provider_caches:
+        return provider_caches[provider]._cache.fragment_hours(product)
+    return None
+
+
+def iter_provider_entries(cache: Cache = None, provider: str = None) -> Iterator[ProviderEntry]:
+    """Streams provider cache entries, optionally only those of given provider prefix"""
+    cache = cache or _cache
+    patterns = [f"{provider}/*", f"{provider}@*"] if provider else None
+    for info in cache.iter_entries_info(patterns):
+        parsed = parse_entry_key(info.key)
+        if parsed is not None:
+            prefix, hours, product, start_time = parsed
+            yield ProviderEntry(prefix, product, start_time, hours or _default_fragment_hours(prefix, product), info)
+
+
+def _add_interval(intervals: List[List[datetime]], start: datetime, stop: datetime):
+    index = bisect_left(intervals, [start, stop])
+    if index > 0 and intervals[index - 1][1] >= start:
+        index -= 1
+        intervals[index][1] = max(intervals[index][1], stop)
+    else:
+        intervals.insert(index, [start, stop])
+    while index + 1 < len(intervals) and intervals[index + 1][0] <= intervals[index][1]:
+        intervals[index][1] = max(intervals[index][1], intervals.pop(index + 1)[1])
+
+
+def coverage(cache: Cache = None, provider: str = None) -> Dict[str, List[DateTimeRange]]:
+    """Time ranges covered by cache entries for each product, contiguous fragments are merged. Entries of unknown
+    providers are ignored since their fragments duration is unknown.
+
+    Parameters
+    ----------
+    cache: Cache
+        cache to inspect, speasy cache by default
+    provider: str
+        only inspect given provider cache prefix (e.g. ``cda``)
+
+    Returns
+    -------
+    Dict[str, List[DateTimeRange]]
+        sorted and merged time ranges by ``provider/product``
+    """
+    intervals: Dict[str, List[List[datetime]]] = {}
+    for entry in iter_provider_entries(cache, provider):
+        if entry.fragment_hours:
+            _add_interval(intervals.setdefault(f"{entry.provider}/{entry.product}", []), entry.start_time,
+                          entry.start_time + timedelta(hours=entry.fragment_hours))
+    return {product: [DateTimeRange(start, stop) for start, stop in ranges] for product, ranges in
+            sorted(intervals.items())}
+
+
+def disk_usage(cache: Cache = None) -> Dict[str, Dict[str, int]]:
+    """Number of entries and bytes used per provider cache prefix, other entries are reported as ``other``"""
+    cache = cache or _cache
+    usage: Dict[str, Dict[str, int]] = {}
+    for info in cache.iter_entries_info():
+        parsed = parse_entry_key(info.key)
+        counters = usage.setdefault(parsed[0] if parsed else "other", {"entries": 0, "bytes": 0})
+        counters["entries"] += 1
+        counters["bytes"] += info.size
+    return usage
+
+
+def _newest_versions(cache: Cache, prefixes: List[str]) -> Dict[Tuple[str, str], float]:
+    newest: Dict[Tuple[str, str], float] = {}
+    for prefix in prefixes:
+        for entry in iter_provider_entries(cache, prefix):
+            if entry.info.tag is not None:
+                key = (entry.provider, entry.product)
+                newest[key] = max(newest.get(key, entry.info.tag), entry.info.tag)
+    return newest
+
+
+def purge_outdated(cache: Cache = None, dry_run: bool = False) -> int:
+    """Deletes outdated entries of versioned provider caches (:class:`Cacheable`), those entries would be downloaded
+    again anyway. An entry is outdated when it is older than the current product version given by its provider, or,
+    when the provider was not used yet in this process, older than the newest version found in cache for the same
+    product. Versions are read from entries tags, so entries stored without a tag by older speasy versions are left
+    untouched, as well as unversioned caches since their outdated entries are revalidated rather than downloaded again.
+    Entries are streamed twice, only the reference version of each product is kept in memory.
+
+    Parameters
+    ----------
+    cache: Cache
+        cache to purge, speasy cache by default
+    dry_run: bool
+        only count outdated entries when True
+
+    Returns
+    -------
+    int
+        number of outdated entries
+    """
+    cache = cache or _cache
+    versioned = [prefix for prefix, provider_cache in provider_caches.items() if isinstance(provider_cache, Cacheable)]
+    references = _newest_versions(cache, versioned)
+    for prefix, product in references:
+        current = version_tag(provider_caches[prefix].current_version(product))
+        if current is not None:
+            references[(prefix, product)] = current
+    outdated = 0
+    for prefix in versioned:
+        for entry in iter_provider_entries(cache, prefix):
+            if entry.info.tag is not None and entry.info.tag < references[(entry.provider, entry.product)]:
+                outdated += 1
+                if not dry_run:
+                    cache.delete(entry.info.key)
+    return outdated
+
+
+def compact(cache: Cache = None):
+    """See :meth:`Cache.compact`"""
+    (cache or _cache).compact()
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "kB", "MB", "GB"):
+        if size < 1000:
+            return f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} TB"
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m speasy.core.cache",
+                                     description="Inspect and maintain speasy cache")
+    parser.add_argument("--path", help="cache directory, speasy cache by default")
+    commands = parser.add_subparsers(dest="command", required=True)
+    coverage_parser = commands.add_parser("coverage", help="list cached time ranges per product")
+    coverage_parser.add_argument("--provider", help="only list given provider cache prefix")
+    commands.add_parser("usage", help="report disk usage per provider")
+    purge_parser = commands.add_parser("purge", help="delete entries of versioned providers older than the newest "
+                                                     "cached version of the same product (providers are not queried)")
+    purge_parser.add_argument("--dry-run", action="store_true", help="only count outdated entries")
+    commands.add_parser("compact", help="reclaim unused space and remove orphan files")
+    args = parser.parse_args(argv)
+
+    cache = Cache(args.path) if args.path else _cache
+    if args.command == "coverage":
+        for product, ranges in coverage(cache, args.provider).items():
+            print(product)
+            for dt_range in ranges:
+                print(f"    {dt_range.start_time.isoformat()} -> {dt_range.stop_time.isoformat()}")
+    elif args.command == "usage":
+        for provider, counters in sorted(disk_usage(cache).items()):
+            print(f"{provider:<20} {counters['entries']:>10} entries {_format_size(counters['bytes']):>12}")
+    elif args.command == "purge":
+        count = purge_outdated(cache, dry_run=args.dry_run)
+        print(f"{count} outdated entries {'found' if args.dry_run else 'deleted'}")
+    elif args.command == "compact":
+        compact(cache)
+    return 0
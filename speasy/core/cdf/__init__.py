@@ -1,6 +1,14 @@
+import os
+import shutil
+import tempfile
+from typing import BinaryIO
+
+import numpy as np
 import pyistp
 from ...products import SpeasyVariable, VariableAxis, VariableTimeAxis, DataContainer
 
+_SPOOL_CHUNK_SIZE = 1 << 20
+
 
 def _fix_value_type(value):
     if type(value) in (str, int, float):
@@ -17,16 +25,48 @@ def _fix_attributes_types(attributes: dict):
     return cleaned
 
 
-def _make_axis(axis, time_axis_name):
+def _references_loader_memory(values: np.ndarray) -> bool:
+    base = values
+    while isinstance(base, np.ndarray) and base.base is not None:
+        base = base.base
+    return not isinstance(base, np.ndarray)
+
+
+def _detach(values: np.ndarray, copy: bool) -> np.ndarray:
+    # arrays built by pyistp (time axes for instance) already own their memory
+    return values.copy() if copy and _references_loader_memory(values) else values
+
+
+def _make_axis(axis, time_axis_name, copy: bool):
     if axis.attributes.get('DEPEND_0', '') == time_axis_name:
         is_time_dependent = True
     else:
         is_time_dependent = False
-    return VariableAxis(values=axis.values.copy(), meta=_fix_attributes_types(axis.attributes), name=axis.name,
-                        is_time_dependent=is_time_dependent)
+    return VariableAxis(values=_detach(axis.values, copy), meta=_fix_attributes_types(axis.attributes),
+                        name=axis.name, is_time_dependent=is_time_dependent)
 
 
-def load_variable(variable="", file=None, buffer=None) -> SpeasyVariable or None:
+def load_variable(variable="", file=None, buffer=None, copy: bool = True) -> SpeasyVariable or None:
+    """Loads given variable and its axes from a CDF file or buffer. When loaded from a file, the file is memory mapped
+    and only this variable and its axes are read.
+
+    Parameters
+    ----------
+    variable: str
+        variable name
+    file: str
+        CDF file path
+    buffer: bytes
+        in memory CDF file
+    copy: bool
+        copy arrays referencing the CDF loader memory, otherwise they keep the loaded buffer or the file mapping alive.
+        Only disable it for files owned by the caller which won't be modified (default: True)
+
+    Returns
+    -------
+    SpeasyVariable or None
+        the variable, None when not found
+    """
     istp = pyistp.load(file=file, buffer=buffer)
     if istp:
         if variable in istp.data_variables():
@@ -40,11 +80,37 @@ def load_variable(variable="", file=None, buffer=None) -> SpeasyVariable or None
         if var:
             time_axis_name = var.axes[0].name
             return SpeasyVariable(
-                axes=[VariableTimeAxis(values=var.axes[0].values.copy(),
+                axes=[VariableTimeAxis(values=_detach(var.axes[0].values, copy),
                                        meta=_fix_attributes_types(var.axes[0].attributes))] + [
-                         _make_axis(axis, time_axis_name) for axis in var.axes[1:]],
-                values=DataContainer(values=var.values.copy(), meta=_fix_attributes_types(var.attributes),
+                         _make_axis(axis, time_axis_name, copy) for axis in var.axes[1:]],
+                values=DataContainer(values=_detach(var.values, copy), meta=_fix_attributes_types(var.attributes),
                                      name=var.name,
                                      is_time_dependent=True),
                 columns=var.labels)
     return None
+
+
+def load_variable_from_stream(variable: str, stream: BinaryIO) -> SpeasyVariable or None:
+    """Spools a CDF file from a stream (typically an HTTP response) to a temporary file then loads given variable, see
+    :func:`load_variable`. The whole file is never held in memory, only the requested variable and its axes are copied
+    out of the file mapping so neither the mapping nor the removed file outlive this call.
+
+    Parameters
+    ----------
+    variable: str
+        variable name
+    stream: BinaryIO
+        CDF file content
+
+    Returns
+    -------
+    SpeasyVariable or None
+        the variable, None when not found
+    """
+    fd, path = tempfile.mkstemp(suffix=".cdf")
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            shutil.copyfileobj(stream, spool, _SPOOL_CHUNK_SIZE)
+        return load_variable(variable=variable, file=path, copy=True)
+    finally:
+        os.remove(path)
@@ -0,0 +1,224 @@
+"""Binary serialization format for nested structures holding numpy arrays.
+
+Arrays are stored as raw buffers after a small pickled header describing the structure, each buffer is aligned on
+:data:`ALIGNMENT` bytes. Loading only unpickles the header, arrays are numpy views on the given buffer, when loading
+from a file the file is memory mapped so array data is only read when accessed. Streams which can only be read
+sequentially are decoded by :func:`read` directly into preallocated arrays.
+
+Layout::
+
+    MAGIC (8 bytes) | header length (8 bytes, little endian) | pickled header | padding | buffer | padding | buffer ...
+"""
+import mmap
+import pickle
+from typing import Any, BinaryIO, Callable, List, Union
+
+import numpy as np
+
+MAGIC = b"SPZCOL01"
+ALIGNMENT = 64
+_PREFIX_SIZE = len(MAGIC) + 8
+
+
+class _BufferRef:
+    __slots__ = ['offset', 'dtype', 'shape']
+
+    def __init__(self, offset: int, dtype: str, shape: tuple):
+        self.offset = offset
+        self.dtype = dtype
+        self.shape = shape
+
+    def __getstate__(self):
+        return self.offset, self.dtype, self.shape
+
+    def __setstate__(self, state):
+        self.offset, self.dtype, self.shape = state
+
+
+def _padding(size: int) -> int:
+    return (-size) % ALIGNMENT
+
+
+def _extract_buffers(obj: Any, buffers: List[np.ndarray]) -> Any:
+    if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+        buffers.append(obj)
+        return _BufferRef(offset=len(buffers) - 1, dtype=obj.dtype.str, shape=obj.shape)
+    if type(obj) is dict:
+        return {key: _extract_buffers(value, buffers) for key, value in obj.items()}
+    if type(obj) in (list, tuple):
+        return type(obj)(_extract_buffers(value, buffers) for value in obj)
+    return obj
+
+
+def _resolve_refs(obj: Any, resolve: Callable[[_BufferRef], np.ndarray]) -> Any:
+    if isinstance(obj, _BufferRef):
+        return resolve(obj)
+    if type(obj) is dict:
+        return {key: _resolve_refs(value, resolve) for key, value in obj.items()}
+    if type(obj) in (list, tuple):
+        return type(obj)(_resolve_refs(value, resolve) for value in obj)
+    return obj
+
+
+def _buffer_view(ref: _BufferRef, buffer) -> np.ndarray:
+    dtype = np.dtype(ref.dtype)
+    count = int(np.prod(ref.shape, dtype=np.int64))
+    if count == 0:
+        return np.empty(ref.shape, dtype=dtype)
+    return np.frombuffer(buffer, dtype=dtype, count=count, offset=ref.offset).reshape(ref.shape)
+
+
+def dumps(obj: Any) -> bytearray:
+    """Serializes given structure, numpy arrays nested in dictionaries, lists or tuples are stored as raw buffers.
+    The output is allocated once and each array is copied once into it, even non contiguous ones.
+
+    Parameters
+    ----------
+    obj: Any
+        any picklable object
+
+    Returns
+    -------
+    bytearray
+        serialized object
+    """
+    arrays = []
+    structure = _extract_buffers(obj, arrays)
+    refs = []
+    _collect_refs(structure, refs)
+    # buffer offsets depend on header size, header size is bounded using the widest offset value
+    for ref in refs:
+        ref.offset = 2 ** 62
+    data_start = _PREFIX_SIZE + len(pickle.dumps(structure, protocol=pickle.HIGHEST_PROTOCOL))
+    data_start += _padding(data_start)
+    offset = data_start
+    for ref, array in zip(refs, arrays):
+        ref.offset = offset
+        offset += array.nbytes + _padding(array.nbytes)
+    header = pickle.dumps(structure, protocol=pickle.HIGHEST_PROTOCOL)
+    # zero filled, so padding needs no writes
+    output = bytearray(offset)
+    output[:_PREFIX_SIZE + len(header)] = MAGIC + len(header).to_bytes(8, 'little') + header
+    for ref, array in zip(refs, arrays):
+        if array.size:
+            np.frombuffer(output, dtype=array.dtype, count=array.size, offset=ref.offset).reshape(array.shape)[...] = \
+                array
+    return output
+
+
+def _collect_refs(obj: Any, refs: List[_BufferRef]):
+    if isinstance(obj, _BufferRef):
+        refs.append(obj)
+    elif type(obj) is dict:
+        for value in obj.values():
+            _collect_refs(value, refs)
+    elif type(obj) in (list, tuple):
+        for value in obj:
+            _collect_refs(value, refs)
+
+
+def is_columnar(buffer: Union[bytes, memoryview, mmap.mmap]) -> bool:
+    return len(buffer) >= _PREFIX_SIZE and bytes(buffer[:len(MAGIC)]) == MAGIC
+
+
+def loads(buffer: Union[bytes, memoryview, mmap.mmap]) -> Any:
+    """Deserializes an object produced by :func:`dumps`, arrays are read only views on given buffer.
+
+    Parameters
+    ----------
+    buffer: bytes or memoryview or mmap.mmap
+        serialized object
+
+    Returns
+    -------
+    Any
+        deserialized object
+    """
+    if not is_columnar(buffer):
+        raise ValueError("Not a speasy columnar buffer")
+    header_size = int.from_bytes(buffer[len(MAGIC):_PREFIX_SIZE], 'little')
+    structure = pickle.loads(buffer[_PREFIX_SIZE:_PREFIX_SIZE + header_size])
+    return _resolve_refs(structure, lambda ref: _buffer_view(ref, buffer))
+
+
+def load(file: BinaryIO) -> Any:
+    """Memory maps given file and deserializes its content, see :func:`loads`. The file can be closed once loaded.
+    """
+    return loads(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+def _is_memory_mapped(array: np.ndarray) -> bool:
+    base = array
+    while isinstance(base, np.ndarray):
+        base = base.base
+    if isinstance(base, memoryview):
+        base = base.obj
+    return isinstance(base, mmap.mmap)
+
+
+def detach(obj: Any) -> Any:
+    """Copies arrays nested in given structure which are views on a memory mapped file (see :func:`load`), so the
+    structure no longer keeps the file mapped. Other values are returned as is.
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.copy() if _is_memory_mapped(obj) else obj
+    if type(obj) is dict:
+        return {key: detach(value) for key, value in obj.items()}
+    if type(obj) in (list, tuple):
+        return type(obj)(detach(value) for value in obj)
+    return obj
+
+
+def _read_into(stream: BinaryIO, view: memoryview):
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            raise EOFError("Truncated speasy columnar stream")
+        filled += count
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    buffer = bytearray(size)
+    _read_into(stream, memoryview(buffer))
+    return bytes(buffer)
+
+
+def read(stream: BinaryIO, head: bytes = b"") -> Any:
+    """Deserializes an object produced by :func:`dumps` from a sequentially read stream such as an HTTP response or a
+    decompression stream. Each array is allocated once and filled in place, the serialized object is never held in
+    memory as a whole.
+
+    Parameters
+    ----------
+    stream: BinaryIO
+        any file like object implementing readinto
+    head: bytes
+        bytes already consumed from stream, typically when sniffing its format
+
+    Returns
+    -------
+    Any
+        deserialized object, arrays are writable
+    """
+    prefix = head[:_PREFIX_SIZE] + _read_exactly(stream, max(0, _PREFIX_SIZE - len(head)))
+    if not is_columnar(prefix):
+        raise ValueError("Not a speasy columnar stream")
+    header_size = int.from_bytes(prefix[len(MAGIC):], 'little')
+    header = head[_PREFIX_SIZE:_PREFIX_SIZE + header_size]
+    header += _read_exactly(stream, header_size - len(header))
+    if len(head) > _PREFIX_SIZE + header_size:
+        raise ValueError("Given head goes beyond speasy columnar header")
+    structure = pickle.loads(header)
+    refs = []
+    _collect_refs(structure, refs)
+    position = _PREFIX_SIZE + header_size
+    arrays = {}
+    for ref in sorted(refs, key=lambda ref: ref.offset):
+        _read_exactly(stream, ref.offset - position)
+        array = np.empty(ref.shape, dtype=np.dtype(ref.dtype))
+        if array.nbytes:
+            _read_into(stream, memoryview(array.reshape(-1).view(np.uint8)))
+        position = ref.offset + array.nbytes
+        arrays[id(ref)] = array
+    return _resolve_refs(structure, lambda ref: arrays[id(ref)])
@@ -69,15 +69,30 @@ class DataContainer(object):
             "values": self.__values.tolist() if array_to_list else self.__values.copy(),
             "meta": self.__meta.copy(),
             "name": self.__name,
-            "is_time_dependent": self.is_time_dependent
+            "is_time_dependent": self.is_time_dependent,
+            "dtype": self.__values.dtype.str
         }
 
     @staticmethod
-    def from_dictionary(dictionary: Dict[str, str or Dict[str, str] or List], dtype=np.float) -> "DataContainer":
-        return DataContainer(values=np.array(dictionary["values"], dtype=dtype), meta=dictionary["meta"],
+    def from_dictionary(dictionary: Dict[str, str or Dict[str, str] or List], dtype=None) -> "DataContainer":
+        values = dictionary["values"]
+        if isinstance(values, np.ndarray):
+            # no copy when values already have the requested dtype or when no dtype is requested
+            values = values if dtype is None else values.astype(dtype, copy=False)
+        else:
+            values = np.array(values, dtype=dtype or dictionary.get("dtype", np.float64))
+        return DataContainer(values=values, meta=dictionary["meta"],
                              name=dictionary["name"],
                              is_time_dependent=dictionary["is_time_dependent"])
 
+    def as_float32(self) -> 'DataContainer':
+        """Returns a container where float64 values are converted to float32, any other dtype is returned as is
+        """
+        if self.__values.dtype != np.float64:
+            return self
+        return DataContainer(values=self.__values.astype(np.float32), meta=self.__meta, name=self.__name,
+                             is_time_dependent=self.__is_time_dependent)
+
     @staticmethod
     def reserve_like(other: 'DataContainer', length: int = 0) -> 'DataContainer':
         return DataContainer(name=other.__name, meta=other.__meta,
@@ -138,6 +153,9 @@ class VariableAxis(object):
         assert dictionary['type'] == "VariableAxis"
         return VariableAxis(data=DataContainer.from_dictionary(dictionary))
 
+    def as_float32(self) -> 'VariableAxis':
+        return VariableAxis(data=self.__data.as_float32())
+
     @staticmethod
     def reserve_like(other: 'VariableAxis', length: int = 0) -> 'VariableAxis':
         return VariableAxis(data=DataContainer.reserve_like(other.__data, length))
@@ -4,6 +4,7 @@ from functools import wraps
 from typing import Callable, List, Optional
 from threading import Lock
 
+from speasy.core.aio import run_in_thread
 from speasy.core.datetime_range import DateTimeRange
 from speasy.core.inventory import ProviderInventory
 from speasy.core.inventory.indexes import (DatasetIndex, ParameterIndex,
@@ -68,6 +69,12 @@ class DataProvider:
             self.flat_inventory.clear()
             self.flat_inventory.update(tree.__dict__[self.provider_name])
 
+    async def get_data_async(self, *args, **kwargs):
+        """Asynchronous counterpart of provider get_data method, accepts the same arguments.
+        See :func:`speasy.get_data_async` for details about threading and cancellation.
+        """
+        return await run_in_thread(self.get_data, *args, **kwargs)
+
     def _to_dataset_index(self, index_or_str) -> DatasetIndex:
         if type(index_or_str) is str:
             if index_or_str in self.flat_inventory.datasets:
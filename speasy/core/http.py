@@ -1,7 +1,16 @@
 from speasy import __version__
+from speasy.config import http as http_cfg
 import platform
 import requests
+from requests.adapters import HTTPAdapter
 from requests.utils import quote as _quote
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+from urllib.request import urlopen as _urlopen
+from io import BytesIO
+from concurrent.futures import CancelledError
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Event, Lock, local
 from time import sleep
 import logging
 
@@ -9,19 +18,232 @@ log = logging.getLogger(__name__)
 
 USER_AGENT = f'Speasy/{__version__} {platform.uname()} (SciQLop project)'
 
+
+class _Counters:
+    __slots__ = ['_lock', 'requests', 'new_connections']
+
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def count_new_connection(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.new_connections = 0
+
+
+_counters = _Counters()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _counters.count_new_connection()
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _counters.count_new_connection()
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool
+        }
+
+
+class _SessionPool:
+    """Hands out one :class:`requests.Session` per thread, all of them sharing the same connection pools.
+    urllib3 pools are thread safe while sessions are not, this way keep-alive connections are reused across threads
+    without sharing session state.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._adapter = None
+        self._generation = 0
+        self._local = local()
+
+    def _shared_adapter(self):
+        with self._lock:
+            if self._adapter is None:
+                self._adapter = _PooledAdapter(pool_connections=http_cfg.pool_connections(),
+                                               pool_maxsize=http_cfg.pool_maxsize())
+                self._generation += 1
+            return self._adapter, self._generation
+
+    def session(self) -> requests.Session:
+        adapter, generation = self._shared_adapter()
+        if getattr(self._local, 'generation', None) != generation:
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+            self._local.generation = generation
+        return self._local.session
+
+    def reset(self):
+        with self._lock:
+            if self._adapter is not None:
+                self._adapter.close()
+            self._adapter = None
+
+
+_sessions = _SessionPool()
+
+
+_cancellation: ContextVar = ContextVar('speasy_http_cancellation', default=None)
+
+
+class RequestCancelled(CancelledError):
+    """Raised by any HTTP call issued from a cancelled context, see :func:`cancellable`"""
+    pass
+
+
+@contextmanager
+def cancellable(event: Event):
+    """Any HTTP request issued inside this context, or from a worker thread running a copy of it, raises
+    :class:`RequestCancelled` once given event is set.
+
+    Parameters
+    ----------
+    event: Event
+        cancellation event
+    """
+    token = _cancellation.set(event)
+    try:
+        yield
+    finally:
+        _cancellation.reset(token)
+
+
+def is_cancelled() -> bool:
+    """Returns True when called from a cancelled context, see :func:`cancellable`"""
+    event = _cancellation.get()
+    return event is not None and event.is_set()
+
+
+def _check_cancellation(url):
+    if is_cancelled():
+        raise RequestCancelled(f"Request to {url} cancelled")
+
+
 def quote(*args, **kwargs):
     return _quote(*args, **kwargs)
 
-def get(url, headers: dict = None, params: dict = None):
+
+def _timeout():
+    return http_cfg.connect_timeout(), http_cfg.read_timeout()
+
+
+def _request(method: str, url, headers: dict = None, **kwargs):
     headers = {} if headers is None else headers
     headers['User-Agent'] = USER_AGENT
-    resp = requests.get(url, headers=headers, params=params)
+    session = _sessions.session()
+    kwargs['timeout'] = kwargs.get('timeout') or _timeout()
+    _check_cancellation(url)
+    _counters.count_request()
+    resp = session.request(method, url, headers=headers, **kwargs)
     while resp.status_code in [429, 503]:
         try:
             delay = float(resp.headers['Retry-After'])
-        except ValueError:
+        except (ValueError, KeyError):
             delay = 5
         log.debug(f"Got {resp.status_code} response, will sleep for {delay} seconds")
         sleep(delay)
-        resp = requests.get(url, headers=headers, params=params)
+        _check_cancellation(url)
+        _counters.count_request()
+        resp = session.request(method, url, headers=headers, **kwargs)
     return resp
+
+
+def get(url, headers: dict = None, params: dict = None, timeout=None, stream: bool = False):
+    return _request('GET', url, headers=headers, params=params, stream=stream, timeout=timeout)
+
+
+def post(url, headers: dict = None, params: dict = None, json=None, timeout=None, stream: bool = False):
+    return _request('POST', url, headers=headers, params=params, json=json, stream=stream, timeout=timeout)
+
+
+def head(url, headers: dict = None, params: dict = None, timeout=None):
+    return _request('HEAD', url, headers=headers, params=params, timeout=timeout)
+
+
+def urlopen(url: str) -> BytesIO:
+    """Downloads given URL through the shared session and returns its content as a file like object, local files
+    (file://) are also supported.
+
+    Parameters
+    ----------
+    url: str
+        remote or local (file://) URL
+
+    Returns
+    -------
+    BytesIO
+        URL content
+    """
+    if url.startswith('file:'):
+        with _urlopen(url) as f:
+            return BytesIO(f.read())
+    resp = get(url)
+    resp.raise_for_status()
+    return BytesIO(resp.content)
+
+
+@contextmanager
+def urlopen_stream(url: str):
+    """Opens given URL through the shared session and yields a file like object reading its content while it is
+    downloaded, local files (file://) are also supported.
+
+    Parameters
+    ----------
+    url: str
+        remote or local (file://) URL
+    """
+    if url.startswith('file:'):
+        with _urlopen(url) as f:
+            yield f
+        return
+    with get(url, stream=True) as resp:
+        resp.raise_for_status()
+        resp.raw.decode_content = True
+        yield resp.raw
+
+
+def stats() -> dict:
+    """Returns HTTP connection reuse counters
+
+    Returns
+    -------
+    dict
+        number of requests sent, of new connections opened and of requests which reused a kept alive connection
+    """
+    return {
+        "requests": _counters.requests,
+        "new_connections": _counters.new_connections,
+        "reused_connections": max(0, _counters.requests - _counters.new_connections)
+    }
+
+
+def reset_stats():
+    _counters.reset()
+
+
+def reset_sessions():
+    """Closes all pooled connections, new sessions will use current HTTP configuration (pool sizes)
+    """
+    _sessions.reset()
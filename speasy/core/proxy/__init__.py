@@ -1,8 +1,14 @@
 import logging
 import pickle
+from concurrent.futures import CancelledError, Future
+from contextlib import contextmanager
+from contextvars import ContextVar
 from functools import wraps
+from threading import Lock, Timer
+from typing import Dict, List, Optional, Tuple
 import warnings
 
+import requests
 from packaging.version import Version
 from dateutil import parser
 
@@ -13,10 +19,16 @@ from ...products.variable import from_dictionary as var_from_dict
 from .. import http
 from ..inventory.indexes import from_dict as inventory_from_dict
 from ..index import index
+from .. import columnar
+from ._circuit_breaker import CLOSED, CircuitBreaker
 
 log = logging.getLogger(__name__)
 PROXY_ALLOWED_KWARGS = ['disable_proxy']
 MINIMUM_REQUIRED_PROXY_VERSION = Version("0.6.0")
+# first proxy version answering format=speasy_columnar requests with a speasy.core.columnar stream
+MINIMUM_COLUMNAR_PROXY_VERSION = Version("0.12.0")
+# first proxy version answering several products at once from /get_data_batch
+MINIMUM_BATCH_PROXY_VERSION = Version("0.13.0")
 _CURRENT_PROXY_SERVER_VERSION = None
 
 if proxy_cfg.url() == "" or proxy_cfg.enabled() == False:
@@ -30,6 +42,22 @@ spz.config.proxy.enabled.set(True)
             """, stacklevel=0)
 
 
+def _forget_proxy_version():
+    global _CURRENT_PROXY_SERVER_VERSION
+    _CURRENT_PROXY_SERVER_VERSION = None
+
+
+# shared by all providers, the server version is queried again once the proxy is back
+circuit_breaker = CircuitBreaker("Proxy server", failure_threshold=proxy_cfg.failure_threshold,
+                                 recovery_timeout=proxy_cfg.recovery_timeout, on_open=_forget_proxy_version)
+
+
+def proxy_health() -> dict:
+    """Returns proxy server circuit breaker status: its state (closed, open or half-open), the number of consecutive
+    failures, the last error and the time in seconds before the proxy is tried again when open"""
+    return circuit_breaker.status()
+
+
 def query_proxy_version():
     global _CURRENT_PROXY_SERVER_VERSION
     if _CURRENT_PROXY_SERVER_VERSION is None:
@@ -59,24 +87,180 @@ except ImportError:
         return data
 
 
+try:
+    import zstandard
+
+    stream_zstd_compression = 'true'
+
+
+    def stream_decompressor(stream):
+        # servers may flush several zstd frames while streaming a product
+        return zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+
+except ImportError:
+    stream_zstd_compression = 'false'
+
+
+    def stream_decompressor(stream):
+        return stream
+
+
+def columnar_transport_supported() -> bool:
+    proxy_version = query_proxy_version()
+    return proxy_version is not None and proxy_version >= MINIMUM_COLUMNAR_PROXY_VERSION
+
+
+def _read_streamed_product(resp) -> dict:
+    """Decodes a product while it is downloaded, decompressing it on the fly when needed. Servers answering with a
+    pickled dictionary are still supported."""
+    resp.raw.decode_content = True
+    stream = stream_decompressor(resp.raw)
+    head = columnar._read_exactly(stream, len(columnar.MAGIC))
+    if head == columnar.MAGIC:
+        return columnar.read(stream, head=head)
+    return pickle.loads(head + stream.read())
+
+
+def batch_transport_supported() -> bool:
+    proxy_version = query_proxy_version()
+    return proxy_version is not None and proxy_version >= MINIMUM_BATCH_PROXY_VERSION
+
+
+_batching: ContextVar = ContextVar('speasy_proxy_batching', default=False)
+
+
+@contextmanager
+def batching():
+    """Product requests sent to the proxy from this context, or from worker threads running a copy of it, are
+    coalesced into batch requests when the proxy server supports them. Only useful when several requests are issued
+    concurrently, each request waits up to :data:`speasy.config.proxy.batch_window` seconds for others to join.
+    """
+    token = _batching.set(True)
+    try:
+        yield
+    finally:
+        _batching.reset(token)
+
+
+def batching_active() -> bool:
+    return _batching.get()
+
+
+def batching_available(disable_proxy: bool = False, **kwargs) -> bool:
+    """Returns True when product requests can be batched, ie the proxy is enabled and its server supports batches"""
+    if disable_proxy or not proxy_cfg.enabled() or proxy_cfg.url() == "" or circuit_breaker.state != CLOSED:
+        return False
+    try:
+        return batch_transport_supported()
+    except Exception as e:  # lgtm [py/catch-base-exception]
+        log.debug(f"Can't get proxy server version: {e!r}")
+        return False
+
+
+class GetProductBatch:
+    @staticmethod
+    def get(batch: List[Dict]) -> List[Optional["SpeasyVariable"]]:
+        """Requests several products in a single round trip, the server answers a speasy.core.columnar stream of a
+        list holding one product dictionary (or None) per request. Raises on any failure so callers can fall back to
+        one request per product."""
+        url = proxy_cfg.url()
+        params = {'format': 'speasy_columnar', 'zstd_compression': stream_zstd_compression}
+        with http.post(f"{url}/get_data_batch?", params=params, json={'requests': batch}, stream=True) as resp:
+            log.debug(f"Asking {len(batch)} products from proxy {resp.url}")
+            if resp.status_code != 200:
+                raise ValueError(f"Proxy batch request failed with {resp.status_code} HTTP response")
+            products = _read_streamed_product(resp)
+        if type(products) is not list or len(products) != len(batch):
+            raise ValueError("Malformed proxy batch response")
+        return [var_from_dict(product) for product in products]
+
+
+class _ProductBatcher:
+    """Collects product requests issued concurrently and sends them with :class:`GetProductBatch`, either
+    :data:`speasy.config.proxy.batch_window` seconds after the first one or as soon as
+    :data:`speasy.config.proxy.max_batch_size` requests are pending.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._pending: List[Tuple[Dict, Future]] = []
+        self._timer: Optional[Timer] = None
+
+    def _take(self) -> List[Tuple[Dict, Future]]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take()
+        self._send(batch)
+
+    @staticmethod
+    def _send(batch: List[Tuple[Dict, Future]]):
+        if not batch:
+            return
+        try:
+            products = GetProductBatch.get([request for request, _ in batch])
+        except Exception as e:  # lgtm [py/catch-base-exception]
+            log.warning(f"Proxy batch request failed, falling back to one request per product: {e!r}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), product in zip(batch, products):
+            future.set_result(product)
+
+    def get(self, request: Dict) -> Optional["SpeasyVariable"]:
+        future = Future()
+        with self._lock:
+            self._pending.append((request, future))
+            batch = self._take() if len(self._pending) >= proxy_cfg.max_batch_size() else None
+            if batch is None and self._timer is None:
+                self._timer = Timer(proxy_cfg.batch_window(), self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch is not None:
+            self._send(batch)
+        return future.result()
+
+
+_batcher = _ProductBatcher()
+
+
 class GetProduct:
     def __init__(self):
         pass
 
     @staticmethod
     def get(path: str, start_time: str, stop_time: str, **kwargs):
-        url = proxy_cfg.url()
         kwargs['path'] = path
         kwargs['start_time'] = start_time
         kwargs['stop_time'] = stop_time
+        if batching_active() and batch_transport_supported():
+            try:
+                return _batcher.get(dict(kwargs))
+            except requests.exceptions.ConnectionError:
+                raise
+            except Exception:  # lgtm [py/catch-base-exception]
+                pass
+        url = proxy_cfg.url()
+        if columnar_transport_supported():
+            kwargs['format'] = 'speasy_columnar'
+            kwargs['zstd_compression'] = stream_zstd_compression
+            with http.get(f"{url}/get_data?", params=kwargs, stream=True) as resp:
+                log.debug(f"Asking data from proxy {resp.url}, {resp.request.headers}")
+                if resp.status_code != 200:
+                    raise ValueError(f"Proxy get_data request failed with {resp.status_code} HTTP response")
+                return var_from_dict(_read_streamed_product(resp))
         kwargs['format'] = 'python_dict'
         kwargs['zstd_compression'] = zstd_compression
         resp = http.get(f"{url}/get_data?", params=kwargs)
         log.debug(f"Asking data from proxy {resp.url}, {resp.request.headers}")
-        if resp.status_code == 200:
-            var = var_from_dict(pickle.loads(decompress(resp.content)))
-            return var
-        return None
+        if resp.status_code != 200:
+            raise ValueError(f"Proxy get_data request failed with {resp.status_code} HTTP response")
+        return var_from_dict(pickle.loads(decompress(resp.content)))
 
 
 class GetInventory:
@@ -98,7 +282,7 @@ class GetInventory:
             return inventory
         if resp.status_code == 304:
             return saved_inventory
-        return None
+        raise ValueError(f"Proxy get_inventory request failed with {resp.status_code} HTTP response")
 
 
 class Proxyfiable(object):
@@ -110,16 +294,34 @@ class Proxyfiable(object):
         @wraps(func)
         def wrapped(*args, **kwargs):
             disable_proxy = kwargs.pop("disable_proxy", False)
-            if proxy_cfg.enabled() and not disable_proxy:
+            if proxy_cfg.enabled() and not disable_proxy and circuit_breaker.allow_request():
+                recorded = False
                 try:
                     proxy_version = query_proxy_version()
                     if proxy_version is not None and proxy_version >= MINIMUM_REQUIRED_PROXY_VERSION:
-                        return self.request.get(**self.arg_builder(**kwargs))
+                        result = self.request.get(**self.arg_builder(**kwargs))
+                        circuit_breaker.record_success()
+                        recorded = True
+                        return result
+                    elif proxy_version is None:
+                        circuit_breaker.record_failure()
+                        recorded = True
+                        log.error(f"Can't get proxy server {proxy_cfg.url()} version")
                     else:
+                        circuit_breaker.record_success()
+                        recorded = True
                         log.warning(
                             f"You are using an incompatible proxy server {proxy_cfg.url()} which is {proxy_version} while minimun required version is {MINIMUM_REQUIRED_PROXY_VERSION}")
-                except:  # lgtm [py/catch-base-exception]
+                except CancelledError:
+                    raise
+                except Exception as e:  # lgtm [py/catch-base-exception]
+                    circuit_breaker.record_failure(e, trip=isinstance(e, requests.exceptions.ConnectionError))
+                    recorded = True
                     log.error(f"Can't get data from proxy server {proxy_cfg.url()}")
+                finally:
+                    # cancellations and interruptions tell nothing about the proxy health, the request is only released
+                    if not recorded:
+                        circuit_breaker.record_cancellation()
             return func(*args, **kwargs)
 
         return wrapped
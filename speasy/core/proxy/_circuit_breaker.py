@@ -0,0 +1,108 @@
+import logging
+from threading import Lock
+from time import monotonic
+from typing import Callable, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker:
+    """Tracks the health of a remote server shared by several callers. The circuit opens after ``failure_threshold()``
+    consecutive failures, or right away on failures reported with ``trip=True`` such as connection errors. While
+    open, :meth:`allow_request` returns False so callers skip the server without paying a timeout. Once
+    ``recovery_timeout()`` seconds elapsed the circuit is half-open and lets a single probe request through, its
+    outcome either closes the circuit or opens it again.
+
+    Every allowed request must end with :meth:`record_success`, :meth:`record_failure` or :meth:`record_cancellation`.
+
+    Parameters
+    ----------
+    name: str
+        server name used in logs
+    failure_threshold: Callable[[], int]
+        returns the number of consecutive failures opening the circuit
+    recovery_timeout: Callable[[], float]
+        returns the time in seconds before probing the server again
+    on_open: Callable[[], None], optional
+        called each time the circuit opens, typically to drop cached server state
+    """
+
+    def __init__(self, name: str, failure_threshold: Callable[[], int], recovery_timeout: Callable[[], float],
+                 on_open: Optional[Callable[[], None]] = None):
+        self._name = name
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._on_open = on_open
+        self._lock = Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.
+        self._probing = False
+        self._last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Returns True when the server can be requested, in half-open state only the first caller gets True"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and monotonic() - self._opened_at >= self._recovery_timeout():
+                self._state = HALF_OPEN
+                self._probing = False
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                log.info(f"{self._name} is back, closing circuit")
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self, error: Optional[BaseException] = None, trip: bool = False):
+        """Counts a failure, trip opens the circuit whatever the number of consecutive failures"""
+        with self._lock:
+            self._failures += 1
+            self._last_error = repr(error) if error is not None else None
+            opening = trip or self._state == HALF_OPEN or self._failures >= self._failure_threshold()
+            if opening:
+                if self._state != OPEN:
+                    log.warning(f"{self._name} looks unavailable after {self._failures} failure(s), bypassing it for "
+                                f"{self._recovery_timeout()} seconds: {self._last_error}")
+                self._state = OPEN
+                self._opened_at = monotonic()
+                self._probing = False
+        if opening and self._on_open is not None:
+            self._on_open()
+
+    def record_cancellation(self):
+        """Ends an allowed request which tells nothing about the server health, such as a cancelled one"""
+        with self._lock:
+            self._probing = False
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+            self._last_error = None
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "last_error": self._last_error,
+                "retry_in": max(0., self._opened_at + self._recovery_timeout() - monotonic())
+                if self._state == OPEN else 0.
+            }
@@ -1,2 +1,5 @@
+from .concurrency import provider_request
 from .split_large_requests import SplitLargeRequests
 from .request_dispatch import get_data
+from .async_dispatch import get_data_async
+from .prefetch import PrefetchHandle, prefetch
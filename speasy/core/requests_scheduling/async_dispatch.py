@@ -0,0 +1,47 @@
+import asyncio
+
+from ...products import MaybeAnyProduct
+from ..aio import run_in_thread
+from .request_dispatch import (_PendingRequest, _compile_args, _fill_results,
+                               _flatten_requests, _plan_requests)
+
+
+async def get_data_async(*args, **kwargs) -> MaybeAnyProduct:
+    """Asynchronous counterpart of :func:`speasy.get_data`, accepts the same arguments and returns the same products.
+    Requests run on Speasy worker threads and share the same cache, proxy and request splitting logic than
+    :func:`speasy.get_data`. When several products and/or time ranges are requested, they are all awaited
+    concurrently, failed requests are logged and replaced by None, or by the exception they raised when
+    ``return_exceptions=True``. Cancelling the awaiting task stops pending requests
+    and interrupts running ones at their next HTTP request.
+
+    Parameters
+    ----------
+    args :
+        see :func:`speasy.get_data`
+    kwargs :
+        see :func:`speasy.get_data`
+
+    Returns
+    -------
+        requested product(s) according to given parameters, either a single product or a collection of products.
+
+    Examples
+    --------
+
+    >>> import asyncio
+    >>> import speasy as spz
+    >>> asyncio.run(spz.get_data_async("amda/imf_gsm", "2016-10-10", "2016-10-11"))
+    <speasy.products.variable.SpeasyVariable object at ...>
+
+    """
+    args, kwargs = _compile_args(*args, **kwargs)
+    if len(args) == 0:
+        raise ValueError("You must at least provide a product to retrieve")
+    kwargs.pop('concurrent', None)
+    return_exceptions = kwargs.pop('return_exceptions', False)
+    plan = await run_in_thread(_plan_requests, *args, **kwargs)
+    if isinstance(plan, _PendingRequest):
+        return await run_in_thread(plan.run)
+    requests = _flatten_requests(plan)
+    results = await asyncio.gather(*[run_in_thread(request, return_exceptions) for request in requests])
+    return _fill_results(plan, dict(zip(requests, results)))
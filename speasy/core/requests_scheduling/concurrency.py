@@ -0,0 +1,169 @@
+import atexit
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import copy_context
+from functools import wraps
+from queue import SimpleQueue
+from threading import BoundedSemaphore, Lock, Thread
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from ...config import concurrency as concurrency_cfg
+
+log = logging.getLogger(__name__)
+
+
+class ProviderThrottle:
+    """Limits the number of requests in flight for each provider, requests targeting a provider which has reached its
+    limit wait until a slot is released.
+
+    Parameters
+    ----------
+    max_in_flight: Callable[[str], int]
+        returns the maximum number of concurrent requests allowed for a given provider name
+    """
+
+    def __init__(self, max_in_flight: Callable[[str], int]):
+        self._max_in_flight = max_in_flight
+        self._semaphores: Dict[str, BoundedSemaphore] = {}
+        self._lock = Lock()
+
+    def _semaphore(self, provider: str) -> BoundedSemaphore:
+        with self._lock:
+            if provider not in self._semaphores:
+                self._semaphores[provider] = BoundedSemaphore(max(1, self._max_in_flight(provider)))
+            return self._semaphores[provider]
+
+    @contextmanager
+    def slot(self, provider: str):
+        semaphore = self._semaphore(provider)
+        with semaphore:
+            yield
+
+
+provider_requests = ProviderThrottle(
+    lambda provider: concurrency_cfg.max_requests_per_provider().get(provider, concurrency_cfg.max_workers()))
+
+
+def provider_request(provider: str):
+    """Decorates functions actually sending requests to given provider, their calls share the process wide
+    :data:`provider_requests` limit whatever the thread pools they run from, so nested pools (concurrent get_data,
+    fragment downloads, split requests, ...) can't multiply requests in flight. Decorated functions must not call each
+    other for the same provider.
+
+    Parameters
+    ----------
+    provider: str
+        provider name as used in :data:`speasy.config.concurrency.max_requests_per_provider`
+    """
+
+    def decorator(func: Callable):
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            with provider_requests.slot(provider):
+                return func(*args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def bounded_map(func: Callable[[Any], Any], items: Iterable[Any], max_workers: int,
+                progress: Callable[[Iterable], Iterable] = None) -> List[Any]:
+    """Applies func on each item using at most max_workers threads, results order matches items order.
+    Runs sequentially in the calling thread when max_workers <= 1 or when there is less than two items.
+    Each call runs in a copy of the caller context so context variables such as request cancellation propagate
+    to worker threads.
+
+    Parameters
+    ----------
+    func: Callable[[Any], Any]
+        function to apply
+    items: Iterable[Any]
+        function inputs
+    max_workers: int
+        maximum number of threads
+    progress: Callable[[Iterable], Iterable], optional
+        wraps results iterator, typically a progress bar
+
+    Returns
+    -------
+    List[Any]
+        func results in the same order than items
+    """
+    items = list(items)
+    progress = progress or (lambda x: x)
+    if max_workers <= 1 or len(items) < 2:
+        return list(progress(map(func, items)))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        futures = [executor.submit(copy_context().run, func, item) for item in items]
+        return list(progress(map(lambda f: f.result(), futures)))
+
+
+class BackgroundWorker:
+    """Runs fire and forget tasks on daemon threads started on first use, tasks submitted while another task with the
+    same key is pending are dropped. Failures are logged. Tasks still queued at interpreter exit are cancelled and
+    running ones are abandoned, so background work never delays exit.
+
+    Parameters
+    ----------
+    max_workers: Callable[[], int]
+        returns the maximum number of tasks running at the same time, read when the threads are started
+    name: str
+        threads name prefix
+    """
+
+    def __init__(self, max_workers: Callable[[], int], name: str):
+        self._max_workers = max_workers
+        self._name = name
+        self._queue: SimpleQueue = SimpleQueue()
+        self._threads: List[Thread] = []
+        self._pending: Dict[Any, Future] = {}
+        self._closed = False
+        self._lock = Lock()
+        atexit.register(self.close)
+
+    def _work(self):
+        while True:
+            key, future, func, args = self._queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    func(*args)
+                except Exception as e:  # lgtm [py/catch-base-exception]
+                    log.error(f"{self._name} task {key} failed: {e!r}")
+                future.set_result(None)
+            finally:
+                with self._lock:
+                    if self._pending.get(key) is future:
+                        del self._pending[key]
+
+    def submit(self, key, func: Callable, *args) -> Optional[Future]:
+        """Schedules func(*args), returns None when a task with the same key is already pending or once closed"""
+        with self._lock:
+            if self._closed or key in self._pending:
+                return None
+            if not self._threads:
+                for index in range(max(1, self._max_workers())):
+                    thread = Thread(target=self._work, name=f"{self._name}_{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            future = Future()
+            self._pending[key] = future
+            self._queue.put((key, future, func, args))
+            return future
+
+    def close(self):
+        """Cancels queued tasks and refuses new ones, called at interpreter exit"""
+        with self._lock:
+            self._closed = True
+            futures = list(self._pending.values())
+        for future in futures:
+            future.cancel()
+
+    def join(self, timeout: Optional[float] = None):
+        """Waits for pending tasks, mostly useful for tests"""
+        with self._lock:
+            futures = list(self._pending.values())
+        wait(futures, timeout=timeout)
@@ -0,0 +1,146 @@
+import logging
+from concurrent.futures import CancelledError, ThreadPoolExecutor, wait as wait_futures
+from contextvars import copy_context
+from threading import Event, Lock
+from typing import Dict, List, Optional, Tuple
+
+from ...config import concurrency as concurrency_cfg
+from .. import http
+from .request_dispatch import _PendingRequest, _compile_args, _flatten_requests, _plan_requests
+
+log = logging.getLogger(__name__)
+
+
+class PrefetchHandle:
+    """Tracks a prefetch started by :func:`prefetch`, requests run in background threads and the handle reports their
+    progress. Failed requests are logged and reported by :attr:`failed`, they do not stop the other ones.
+    """
+
+    def __init__(self, requests: List[_PendingRequest], max_workers: int):
+        self._requests = requests
+        self._cancel = Event()
+        self._lock = Lock()
+        self._completed = 0
+        self._failed: List[Tuple[_PendingRequest, str]] = []
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(requests))),
+                                            thread_name_prefix="speasy_prefetch")
+        with http.cancellable(self._cancel):
+            self._futures = [self._executor.submit(copy_context().run, self._run, request) for request in requests]
+        self._executor.shutdown(wait=False)
+
+    def _run(self, request: _PendingRequest):
+        try:
+            if not self._cancel.is_set():
+                request.run()
+        except CancelledError:
+            pass
+        except Exception as e:  # lgtm [py/catch-base-exception]
+            log.error(f"Failed to prefetch {request.args[0]} with {request.args[1:]}: {e!r}")
+            with self._lock:
+                self._failed.append((request, repr(e)))
+        finally:
+            with self._lock:
+                self._completed += 1
+
+    @property
+    def total(self) -> int:
+        """Number of requests"""
+        return len(self._requests)
+
+    @property
+    def completed(self) -> int:
+        """Number of finished requests, including failed and cancelled ones"""
+        return self._completed
+
+    @property
+    def progress(self) -> float:
+        """Fraction of finished requests, from 0 to 1"""
+        return self._completed / self.total if self.total else 1.
+
+    @property
+    def failed(self) -> List[Tuple[str, Tuple, str]]:
+        """Failed requests as (product, time range, error) tuples"""
+        with self._lock:
+            return [(request.args[0], request.args[1:], error) for request, error in self._failed]
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def done(self) -> bool:
+        """Returns True once all requests are finished"""
+        return all(future.done() for future in self._futures)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until all requests are finished or timeout is reached
+
+        Parameters
+        ----------
+        timeout: float or None
+            maximum time to wait in seconds, waits forever when None
+
+        Returns
+        -------
+        bool
+            True when all requests are finished
+        """
+        wait_futures(self._futures, timeout=timeout)
+        return self.done()
+
+    def cancel(self):
+        """Skips pending requests and interrupts running ones at their next HTTP request, fragments already downloaded
+        stay in cache."""
+        self._cancel.set()
+
+    def status(self) -> Dict:
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "failed": len(self._failed),
+            "cancelled": self.cancelled,
+            "done": self.done()
+        }
+
+    def __repr__(self):
+        return f"<PrefetchHandle {self.completed}/{self.total} done, {len(self._failed)} failed>"
+
+
+def prefetch(*args, max_workers: Optional[int] = None, **kwargs) -> PrefetchHandle:
+    """Fills the cache with given product(s) over given time range(s) in background so later :func:`speasy.get_data`
+    calls with the same arguments only hit the cache. Fragments already in cache and up to date are not downloaded
+    again. Accepts the same product(s) and time range(s) arguments than :func:`speasy.get_data`, time ranges are
+    mandatory. Timetables and catalogs used as time ranges are resolved before returning.
+
+    Parameters
+    ----------
+    args :
+        product(s) and time range(s), see :func:`speasy.get_data`
+    max_workers: int or None
+        maximum number of concurrent requests, defaults to :data:`speasy.config.concurrency.max_workers`. Per provider
+        limits still apply.
+    kwargs :
+        see :func:`speasy.get_data`
+
+    Returns
+    -------
+    PrefetchHandle
+        handle to follow, wait or cancel the prefetch
+
+    Examples
+    --------
+
+    >>> import speasy as spz
+    >>> handle = spz.prefetch(["amda/imf_gsm", "amda/imf"], [["2016-10-10", "2016-10-11"],
+    ...                                                      ["2017-10-10", "2017-10-11"]])
+    >>> handle.wait()
+    True
+    """
+    args, kwargs = _compile_args(*args, **kwargs)
+    if len(args) < 2:
+        raise ValueError("You must provide product(s) and time range(s) to prefetch")
+    kwargs.pop('concurrent', None)
+    kwargs.pop('disable_cache', None)
+    # cached fragments are only referenced by lazy variables, nothing gets merged or copied
+    kwargs['lazy'] = True
+    requests = _flatten_requests(_plan_requests(*args, **kwargs))
+    return PrefetchHandle(requests, max_workers=max_workers or concurrency_cfg.max_workers())
@@ -1,3 +1,6 @@
+import logging
+from concurrent.futures import CancelledError
+from contextlib import nullcontext
 from datetime import datetime
 from typing import Iterable, List, Optional, Tuple, Union, overload
 
@@ -10,8 +13,12 @@ from ..inventory.indexes import (CatalogIndex, ComponentIndex,
 from ...products import *
 from ...webservices import (AMDA_Webservice, CDA_Webservice, CSA_Webservice,
                             SSC_Webservice)
-from .. import is_collection, progress_bar
+from ...config import concurrency as concurrency_cfg
+from .. import is_collection, progress_bar, proxy
 from ..datetime_range import DateTimeRange
+from .concurrency import bounded_map
+
+log = logging.getLogger(__name__)
 
 TimeT = Union[str, datetime, float, np.datetime64]
 TimeRangeT = Union[DateTimeRange, Tuple[TimeT, TimeT]]
@@ -129,13 +136,18 @@ def provider_and_product(path_or_product: str or SpeasyIndex) -> (str, str):
         f"Wrong type for {path_or_product}, expecting a string or a SpeasyIndex, got {type(path_or_product)}")
 
 
-def _scalar_get_data(index, *args, **kwargs):
+def _provider(index):
     provider_uid, product_uid = provider_and_product(index)
     if provider_uid in PROVIDERS:
-        return PROVIDERS[provider_uid].get_data(product_uid, *args, **kwargs)
+        return PROVIDERS[provider_uid], product_uid
     raise ValueError(f"Can't find a provider for {index}")
 
 
+def _scalar_get_data(index, *args, **kwargs):
+    provider, product_uid = _provider(index)
+    return provider.get_data(product_uid, *args, **kwargs)
+
+
 def _get_catalog_or_timetable(index, **kwargs):
     return _scalar_get_data(index, **kwargs)
 
@@ -165,6 +177,66 @@ def _is_dtrange(value):
         hasattr(value, '__len__') and len(value) == 2 and _could_be_datetime(value[0]) and _could_be_datetime(value[1]))
 
 
+class _PendingRequest:
+    __slots__ = ['function', 'args', 'kwargs']
+
+    def __init__(self, function, *args, **kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        # requests in flight per provider are limited where providers are actually called, see provider_request
+        return self.function(*self.args, **self.kwargs)
+
+    def __call__(self, return_exceptions: bool = False):
+        try:
+            return self.run()
+        except CancelledError:
+            raise
+        except Exception as e:  # lgtm [py/catch-base-exception]
+            log.error(f"Failed to get {self.args[0]} with {self.args[1:]}: {e!r}")
+            return e if return_exceptions else None
+
+
+def _plan_requests(product, *args, **kwargs):
+    """Mirrors :func:`get_data` dispatch logic but returns nested lists of pending requests instead of results"""
+    if is_collection(product) and not isinstance(product, SpeasyIndex):
+        return [_plan_requests(p, *args, **kwargs) for p in product]
+    if len(args) == 0:
+        return _PendingRequest(_get_catalog_or_timetable, product, **kwargs)
+    if len(args) == 1:
+        t_range = args[0]
+        if _is_dtrange(t_range):
+            return _PendingRequest(_get_timeserie1, product, t_range, **kwargs)
+        if is_collection(t_range):
+            return [_plan_requests(product, r, **kwargs) for r in t_range]
+        return _plan_requests(product, get_data(t_range), **kwargs)
+    return _PendingRequest(_get_timeserie2, product, *args, **kwargs)
+
+
+def _flatten_requests(plan) -> List[_PendingRequest]:
+    if type(plan) is list:
+        return [request for item in plan for request in _flatten_requests(item)]
+    return [plan]
+
+
+def _fill_results(plan, results):
+    if type(plan) is list:
+        return [_fill_results(item, results) for item in plan]
+    return results[plan]
+
+
+def _concurrent_get_data(*args, return_exceptions: bool = False, **kwargs):
+    plan = _plan_requests(*args, **kwargs)
+    requests = _flatten_requests(plan)
+    # requests of all workers reaching the proxy at the same time are sent as one batch when it supports them
+    with proxy.batching() if proxy.batching_available(**kwargs) else nullcontext():
+        results = bounded_map(lambda r: r(return_exceptions), requests, max_workers=concurrency_cfg.max_workers(),
+                              progress=progress_bar(leave=True, **kwargs))
+    return _fill_results(plan, dict(zip(requests, results)))
+
+
 def get_data(*args, **kwargs) -> MaybeAnyProduct:
     """Retrieve requested product(s).
     Speasy gives access to two kind of products, time-dependent products such as physical measurements or trajectories
@@ -201,8 +273,20 @@ def get_data(*args, **kwargs) -> MaybeAnyProduct:
             ignore proxy configuration and always bypass proxy server when True (default: False).
         - disable_cache: bool
             ignore cache content when True (default: False).
+        - lazy: bool
+            return a :class:`~speasy.products.lazy_variable.LazyVariable` assembled from cache fragments only when
+            accessed, slicing it by time or selecting columns first avoids copying unused data (default: False).
         - progress: bool
             show progress bar when True (default: False).
+        - concurrent: bool
+            when several products and/or time ranges are requested, run them concurrently on a thread pool
+            (default: :data:`speasy.config.concurrency.enabled`). When the proxy server accepts batch requests,
+            concurrent requests are retrieved in a single round trip. Results keep the same order than sequential
+            execution, failed requests are logged and replaced by None instead of aborting the whole batch.
+        - return_exceptions: bool
+            with concurrent requests, failed requests are replaced by the exception they raised instead of None, so
+            failures can be told apart from empty results (default: False). Has no effect on sequential requests,
+            which raise on the first failure.
 
     Returns
     -------
@@ -290,8 +374,16 @@ def get_data(*args, **kwargs) -> MaybeAnyProduct:
         raise ValueError("You must at least provide a product to retrieve")
 
     product = args[0]
+    concurrent = kwargs.pop('concurrent', None)
+    return_exceptions = kwargs.pop('return_exceptions', False)
+    if concurrent is not False:
+        if (is_collection(product) and not isinstance(product, SpeasyIndex)) or (
+            len(args) == 2 and not _is_dtrange(args[1])):
+            if concurrent or concurrency_cfg.enabled():
+                return _concurrent_get_data(*args, return_exceptions=return_exceptions, **kwargs)
     if is_collection(product) and not isinstance(product, SpeasyIndex):
-        return list(map(lambda p: get_data(p, *args[1:], **kwargs), progress_bar(leave=True, **kwargs)(product)))
+        return list(map(lambda p: get_data(p, *args[1:], concurrent=False, **kwargs),
+                        progress_bar(leave=True, **kwargs)(product)))
 
     if len(args) == 1:
         return _get_catalog_or_timetable(*args, **kwargs)
@@ -301,8 +393,8 @@ def get_data(*args, **kwargs) -> MaybeAnyProduct:
             return _get_timeserie1(*args, **kwargs)
         if is_collection(t_range):
             return list(
-                map(lambda r: get_data(product, r, *args[2:], **kwargs),
+                map(lambda r: get_data(product, r, *args[2:], concurrent=False, **kwargs),
                     progress_bar(leave=False, **kwargs)(t_range)))
-        return get_data(product, get_data(t_range), *args[2:], **kwargs)
+        return get_data(product, get_data(t_range), *args[2:], concurrent=False, **kwargs)
     if len(args) == 3:
         return _get_timeserie2(*args, **kwargs)
@@ -2,7 +2,16 @@ from typing import Callable
 from speasy.core.datetime_range import DateTimeRange
 from datetime import timedelta
 from functools import wraps
+from speasy.config import concurrency as concurrency_cfg
 from speasy.products.variable import merge as var_merge
+from .concurrency import ProviderThrottle, bounded_map
+
+
+def _max_in_flight(provider: str) -> int:
+    return max(1, concurrency_cfg.split_requests_max_in_flight().get(provider, 1))
+
+
+_in_flight = ProviderThrottle(_max_in_flight)
 
 
 class SplitLargeRequests(object):
@@ -19,8 +28,14 @@ class SplitLargeRequests(object):
                 return get_data(wrapped_self, product=product, start_time=start_time, stop_time=stop_time, **kwargs)
             else:
                 fragments = range.split(max_range_per_request)
-                return var_merge(
-                    [get_data(wrapped_self, product=product, start_time=r.start_time, stop_time=r.stop_time, **kwargs)
-                     for r in fragments])
+                provider = getattr(wrapped_self, 'provider_name', '')
+
+                def get_fragment(r: DateTimeRange):
+                    # the throttle is shared by all requests so concurrent callers can't exceed provider limits
+                    with _in_flight.slot(provider):
+                        return get_data(wrapped_self, product=product, start_time=r.start_time,
+                                        stop_time=r.stop_time, **kwargs)
+
+                return var_merge(bounded_map(get_fragment, fragments, max_workers=_max_in_flight(provider)))
 
         return wrapped
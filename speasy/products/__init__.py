@@ -3,6 +3,7 @@ from .catalog import Catalog, Event
 from .timetable import TimeTable
 from .dataset import Dataset
 from .variable import SpeasyVariable, VariableTimeAxis, VariableAxis, DataContainer
+from .lazy_variable import LazyVariable
 from typing import Optional, Union, List
 
 MaybeAnyProduct = Optional[Union[SpeasyProduct, List[SpeasyProduct]]]
@@ -10,4 +11,4 @@ MaybeTimeDependentProduct = Optional[Union[SpeasyVariable, Dataset]]
 MaybeTimeIndependentProduct = Optional[Union[TimeTable, Catalog]]
 
 __all__ = ['SpeasyVariable', 'Catalog', 'Event', 'Dataset', 'TimeTable', 'MaybeAnyProduct', 'MaybeTimeDependentProduct',
-           'MaybeTimeIndependentProduct', 'VariableAxis', 'VariableTimeAxis', 'DataContainer']
+           'MaybeTimeIndependentProduct', 'VariableAxis', 'VariableTimeAxis', 'DataContainer', 'LazyVariable']
@@ -0,0 +1,125 @@
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from .variable import SpeasyVariable, merge
+
+
+def _to_datetime64(key) -> np.datetime64 or None:
+    if isinstance(key, np.datetime64):
+        return key.astype('datetime64[ns]')
+    if isinstance(key, datetime):
+        if key.tzinfo is not None:
+            key = key.astimezone(timezone.utc).replace(tzinfo=None)
+        return np.datetime64(key, 'ns')
+    if isinstance(key, float):
+        return np.datetime64(int(key * 1e9), 'ns')
+    return None
+
+
+class LazyVariable:
+    """A time series assembled on demand from a list of fragments, typically cache entries. Slicing it by time or
+    selecting some of its columns returns a new LazyVariable without touching the data, only the selected time range
+    and columns get copied once the variable is materialized. Any other attribute access materializes the variable
+    and forwards to the resulting :class:`~speasy.products.variable.SpeasyVariable`.
+
+    Parameters
+    ----------
+    fragments: List[SpeasyVariable]
+        fragments in any order, they can overlap
+    start_time: datetime or np.datetime64 or float
+        first time of the selected range (included)
+    stop_time: datetime or np.datetime64 or float
+        last time of the selected range (excluded)
+    columns: List[str] or None
+        selected columns, all columns when None
+    transform: Callable[[SpeasyVariable], SpeasyVariable] or None
+        applied on the materialized variable
+
+    Methods
+    -------
+    materialize:
+        Builds the SpeasyVariable holding selected time range and columns
+    filter_columns:
+        Returns a LazyVariable only containing selected columns
+    """
+
+    def __init__(self, fragments: List[SpeasyVariable], start_time, stop_time, columns: Optional[List[str]] = None,
+                 transform: Optional[Callable[[SpeasyVariable], SpeasyVariable]] = None):
+        self._lazy_fragments = [fragment for fragment in fragments if fragment is not None]
+        self._lazy_start = _to_datetime64(start_time)
+        self._lazy_stop = _to_datetime64(stop_time)
+        self._lazy_columns = columns
+        self._lazy_transform = transform
+        self._lazy_variable = None
+
+    def _restricted(self, start=None, stop=None, columns=None) -> "LazyVariable":
+        start = max(start, self._lazy_start) if start is not None else self._lazy_start
+        stop = min(stop, self._lazy_stop) if stop is not None else self._lazy_stop
+        return LazyVariable(self._lazy_fragments, start_time=start, stop_time=max(start, stop),
+                            columns=self._lazy_columns if columns is None else columns, transform=self._lazy_transform)
+
+    @property
+    def is_materialized(self) -> bool:
+        return self._lazy_variable is not None
+
+    def materialize(self) -> Optional[SpeasyVariable]:
+        """Builds the SpeasyVariable holding selected time range and columns, it is only built once.
+
+        Returns
+        -------
+        SpeasyVariable or None
+            materialized variable, None when there is no fragment
+        """
+        if self._lazy_variable is None:
+            chunks = [fragment[self._lazy_start:self._lazy_stop] for fragment in self._lazy_fragments]
+            if self._lazy_columns is not None:
+                chunks = [chunk.filter_columns(self._lazy_columns) for chunk in chunks]
+            variable = merge(chunks)
+            if variable is not None and self._lazy_transform is not None:
+                variable = self._lazy_transform(variable)
+            self._lazy_variable = variable
+        return self._lazy_variable
+
+    def filter_columns(self, columns: List[str]) -> "LazyVariable":
+        """Builds a LazyVariable with only selected columns
+
+        Parameters
+        ----------
+        columns : List[str]
+            list of column names to keep
+
+        Returns
+        -------
+        LazyVariable
+            a LazyVariable with only selected columns
+        """
+        return self._restricted(columns=list(columns))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice) and key.step is None:
+            start, stop = _to_datetime64(key.start), _to_datetime64(key.stop)
+            if (key.start is None or start is not None) and (key.stop is None or stop is not None):
+                return self._restricted(start=start, stop=stop)
+        if type(key) in (list, tuple) and all(map(lambda v: type(v) is str, key)):
+            return self.filter_columns(key)
+        if type(key) is str:
+            return self.filter_columns([key])
+        return self.materialize()[key]
+
+    def __getattr__(self, name):
+        if name.startswith('_lazy_'):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def __len__(self):
+        return len(self.materialize())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LazyVariable):
+            other = other.materialize()
+        return self.materialize() == other
+
+    def __repr__(self):
+        return f"<LazyVariable [{self._lazy_start}, {self._lazy_stop}) from {len(self._lazy_fragments)} fragments>"
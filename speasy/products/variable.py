@@ -1,5 +1,5 @@
 from copy import deepcopy
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import astropy.table
 import astropy.units
@@ -63,6 +63,8 @@ class SpeasyVariable(SpeasyProduct):
         Converts a SpeasyVariable to a Python dictionary, mostly used for serialization purposes
     copy:
         Returns a copy
+    as_float32:
+        Returns a copy where float64 values are converted to float32
 
     """
 
@@ -128,6 +130,21 @@ class SpeasyVariable(SpeasyProduct):
             columns=deepcopy(self.columns),
         )
 
+    def as_float32(self) -> "SpeasyVariable":
+        """Builds a SpeasyVariable where float64 values and axes are converted to float32, time axis and other dtypes
+        are kept as is
+
+        Returns
+        -------
+        SpeasyVariable
+            variable with float32 values
+        """
+        return SpeasyVariable(
+            axes=[self.__axes[0]] + [axis.as_float32() for axis in self.__axes[1:]],
+            values=self.__values_container.as_float32(),
+            columns=self.columns,
+        )
+
     def filter_columns(self, columns: List[str]) -> "SpeasyVariable":
         """Builds a SpeasyVariable with only selected columns
 
@@ -550,9 +567,33 @@ def to_dataframe(var: SpeasyVariable) -> pds.DataFrame:
     return SpeasyVariable.to_dataframe(var)
 
 
+def _merge_plan(variables: List[SpeasyVariable]) -> List[Tuple[SpeasyVariable, int]]:
+    """Selects which variables contribute to the merge result and how many samples each one of them gives.
+    Variables are sorted by start time, those covered by another one are dropped and where two variables overlap the
+    one starting later wins from its first sample.
+    """
+    candidates = sorted(((v, v.time) for v in variables if v is not None and len(v.time) > 0),
+                        key=lambda item: (item[1][0], item[1][-1]))
+    kept = []
+    for var, time in candidates:
+        if kept and kept[-1][1][-1] >= time[-1]:
+            continue  # covered by previous one
+        if kept and kept[-1][1][0] == time[0]:
+            kept.pop()  # covered by this one
+        kept.append((var, time))
+    if not kept:
+        return []
+    return [(current, int(np.searchsorted(current_time, next_time[0], side='left')))
+            for (current, current_time), (_, next_time) in zip(kept[:-1], kept[1:])] + [
+        (kept[-1][0], len(kept[-1][1]))]
+
+
 def merge(variables: List[SpeasyVariable]) -> Optional[SpeasyVariable]:
     """Merge a list of :class:`~speasy.common.variable.SpeasyVariable` objects.
 
+    Variables can be given in any order and can overlap, where two variables overlap the one starting later is used.
+    Each array of the result is allocated once and filled with a single copy of each contributing variable.
+
     Parameters
     ----------
     variables: List[SpeasyVariable]
@@ -565,49 +606,19 @@ def merge(variables: List[SpeasyVariable]) -> Optional[SpeasyVariable]:
     """
     if len(variables) == 0:
         return None
-    sorted_var_list = [v for v in variables if (
-        v is not None) and (len(v.time) > 0)]
-    sorted_var_list.sort(key=lambda v: v.time[0])
-
-    # drop variables covered by previous ones
-    for prev, current in zip(sorted_var_list[:-1], sorted_var_list[1:]):
-        if prev.time[-1] >= current.time[-1]:
-            sorted_var_list.remove(current)
-
-    # drop variables covered by next ones
-    for current, nxt in zip(sorted_var_list[:-1], sorted_var_list[1:]):
-        if nxt.time[0] == current.time[0] and nxt.time[-1] >= current.time[-1]:
-            sorted_var_list.remove(current)
-
-    if len(sorted_var_list) == 0:
+    plan = _merge_plan(variables)
+    if len(plan) == 0:
         for v in variables:
             if v is not None:
                 return SpeasyVariable.reserve_like(v, length=0)
         return None
 
-    overlaps = [
-        np.where(current.time >= nxt.time[0])[0][0]
-        if current.time[-1] >= nxt.time[0]
-        else -1
-        for current, nxt in zip(sorted_var_list[:-1], sorted_var_list[1:])
-    ]
-
-    dest_len = int(
-        np.sum(
-            [
-                overlap if overlap != -1 else len(r.time)
-                for overlap, r in zip(overlaps, sorted_var_list[:-1])
-            ]
-        )
-    )
-    dest_len += len(sorted_var_list[-1].time)
-
-    result = SpeasyVariable.reserve_like(sorted_var_list[0], dest_len)
-
+    result = SpeasyVariable.reserve_like(plan[0][0], sum(length for _, length in plan))
+    destinations = [result.values] + [axis.values for axis in result.axes if axis.is_time_dependent]
     pos = 0
-
-    for r, overlap in zip(sorted_var_list, overlaps + [-1]):
-        frag_len = len(r.time) if overlap == -1 else overlap
-        result[pos: (pos + frag_len)] = r[0:frag_len]
-        pos += frag_len
+    for var, length in plan:
+        sources = [var.values] + [axis.values for axis in var.axes if axis.is_time_dependent]
+        for destination, source in zip(destinations, sources):
+            destination[pos:pos + length] = source[:length]
+        pos += length
     return result
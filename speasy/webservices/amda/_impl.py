@@ -1,12 +1,14 @@
 import logging
+from concurrent.futures import Future
 from datetime import datetime, timedelta
 from types import SimpleNamespace
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 # General modules
 from ...config import amda as amda_cfg
 from ...core.cache import CacheCall
 from ...core.inventory.indexes import SpeasyIndex
+from ...core.requests_scheduling.concurrency import bounded_map, provider_request
 from ...inventories import flat_inventories
 from ...products.variable import SpeasyVariable, merge
 from . import rest_client
@@ -91,13 +93,15 @@ class AmdaImpl:
         self._update_private_lists(TimeTables=root.TimeTables, Catalogs=root.Catalogs, root=root)
         return root
 
-    def dl_parameter_chunk(self, start_time: datetime, stop_time: datetime, parameter_id: str,
-                           extra_http_headers: Dict or None = None, **kwargs) -> Optional[
-        SpeasyVariable]:
-        url = rest_client.get_parameter(server_url=self.server_url, startTime=start_time.timestamp(),
-                                        stopTime=stop_time.timestamp(), parameterID=parameter_id, timeFormat='UNIXTIME',
-                                        extra_http_headers=extra_http_headers, **kwargs)
-        # check status until done
+    @provider_request("amda")
+    def submit_parameter_chunk(self, start_time: datetime, stop_time: datetime, parameter_id: str,
+                               extra_http_headers: Dict or None = None, **kwargs) -> Future:
+        return rest_client.submit_parameter(server_url=self.server_url, startTime=start_time.timestamp(),
+                                            stopTime=stop_time.timestamp(), parameterID=parameter_id,
+                                            timeFormat='UNIXTIME', extra_http_headers=extra_http_headers, **kwargs)
+
+    @provider_request("amda")
+    def load_parameter_chunk(self, url: str or None) -> Optional[SpeasyVariable]:
         if url is not None:
             var = load_csv(url)
             if len(var):
@@ -108,23 +112,49 @@ class AmdaImpl:
             return var
         return None
 
+    def dl_parameter_chunk(self, start_time: datetime, stop_time: datetime, parameter_id: str,
+                           extra_http_headers: Dict or None = None, **kwargs) -> Optional[
+        SpeasyVariable]:
+        # the provider request slot is released while AMDA processes the job
+        return self.load_parameter_chunk(rest_client.wait(
+            self.submit_parameter_chunk(start_time, stop_time, parameter_id, extra_http_headers=extra_http_headers,
+                                        **kwargs)))
+
+    def dl_parameter_chunks(self, chunks: List[Tuple[datetime, datetime]], parameter_id: str,
+                            extra_http_headers: Dict or None = None, **kwargs) -> List[Optional[SpeasyVariable]]:
+        """Keeps up to max_parallel_chunks AMDA jobs in flight and loads each chunk as soon as its job completes,
+        results are returned in chunks order."""
+        results = [None] * len(chunks)
+        pending = list(enumerate(chunks))[::-1]
+        in_flight = {}
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < amda_cfg.max_parallel_chunks():
+                    index, (start_time, stop_time) = pending.pop()
+                    in_flight[self.submit_parameter_chunk(start_time, stop_time, parameter_id,
+                                                          extra_http_headers=extra_http_headers, **kwargs)] = index
+                done = list(rest_client.wait_any(in_flight))
+                for future, var in zip(done, bounded_map(lambda f: self.load_parameter_chunk(f.result()), done,
+                                                         max_workers=len(done))):
+                    results[in_flight.pop(future)] = var
+        finally:
+            for future in in_flight:
+                future.cancel()
+        return results
+
     def dl_parameter(self, start_time: datetime, stop_time: datetime, parameter_id: str,
                      extra_http_headers: Dict or None = None, **kwargs) -> Optional[
         SpeasyVariable]:
         dt = timedelta(days=amda_cfg.max_chunk_size_days())
 
         if stop_time - start_time > dt:
-            var = None
+            chunks = []
             curr_t = start_time
             while curr_t < stop_time:
-                if curr_t + dt < stop_time:
-                    var = merge([var, self.dl_parameter_chunk(curr_t, curr_t + dt, parameter_id,
-                                                              extra_http_headers=extra_http_headers, **kwargs)])
-                else:
-                    var = merge([var, self.dl_parameter_chunk(curr_t, stop_time, parameter_id,
-                                                              extra_http_headers=extra_http_headers, **kwargs)])
+                chunks.append((curr_t, min(curr_t + dt, stop_time)))
                 curr_t += dt
-            return var
+            return merge(self.dl_parameter_chunks(chunks, parameter_id, extra_http_headers=extra_http_headers,
+                                                  **kwargs))
         else:
             return self.dl_parameter_chunk(start_time, stop_time, parameter_id, extra_http_headers=extra_http_headers,
                                            **kwargs)
@@ -136,6 +166,7 @@ class AmdaImpl:
                                  **auth_args(username=username, password=password), **kwargs)
 
     @CacheCall(cache_retention=amda_cfg.user_cache_retention())
+    @provider_request("amda")
     def dl_timetable(self, timetable_id: str, **kwargs):
         url = rest_client.get_timetable(ttID=timetable_id, server_url=self.server_url, **kwargs)
         if url is not None:
@@ -153,6 +184,7 @@ class AmdaImpl:
         return self.dl_timetable(timetable_id, **auth_args(username=username, password=password), **kwargs)
 
     @CacheCall(cache_retention=amda_cfg.user_cache_retention())
+    @provider_request("amda")
     def dl_catalog(self, catalog_id: str, **kwargs):
         url = rest_client.get_catalog(catID=catalog_id, server_url=self.server_url, **kwargs)
         if url is not None:
@@ -1,6 +1,11 @@
+import heapq
+import itertools
 import logging
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, TimeoutError as FutureTimeoutError, wait as wait_futures
+from datetime import datetime, timedelta
 from enum import Enum
+from threading import Condition, Lock, Thread
 
 from speasy.core import http, pack_kwargs
 from speasy.core.cache import CacheCall
@@ -8,7 +13,7 @@ from speasy.config import amda as amda_cfg
 
 import xml.etree.ElementTree as Et
 
-from typing import Dict
+from typing import Callable, Dict, Iterable, Set, Tuple
 
 log = logging.getLogger(__name__)
 
@@ -76,6 +81,51 @@ def token(server_url: str = "http://amda.irap.omp.eu") -> str:
         raise RuntimeError("Failed to get auth token")
 
 
+class TokenManager:
+    """Thread safe AMDA authentication token cache. Tokens are fetched once per server and reused until they
+    reach their validity period or until the server rejects them.
+
+    Parameters
+    ----------
+    fetch: Callable[[str], str]
+        function used to get a new token from a given server URL
+    validity: Callable[[], timedelta]
+        returns how long a token can be reused, it should be shorter than server side token lifetime so tokens get
+        proactively refreshed before the server rejects them
+    """
+
+    def __init__(self, fetch: Callable[[str], str], validity: Callable[[], timedelta]):
+        self._fetch = fetch
+        self._validity = validity
+        self._lock = Lock()
+        self._tokens: Dict[str, Tuple[str, datetime]] = {}
+
+    def get(self, server_url: str) -> str:
+        with self._lock:
+            token, expiration = self._tokens.get(server_url, (None, None))
+            if token is None or expiration <= datetime.utcnow():
+                log.debug(f"Getting a new AMDA token from {server_url}")
+                token = self._fetch(server_url)
+                self._tokens[server_url] = (token, datetime.utcnow() + self._validity())
+            return token
+
+    def invalidate(self, server_url: str, token: str or None = None):
+        """Forgets cached token for given server, when token is given it is only forgotten if it is still the cached
+        one so concurrent invalidations only trigger one refresh.
+        """
+        with self._lock:
+            if token is None or self._tokens.get(server_url, (None, None))[0] == token:
+                self._tokens.pop(server_url, None)
+
+
+tokens = TokenManager(fetch=lambda server_url: token(server_url=server_url),
+                      validity=lambda: timedelta(seconds=amda_cfg.token_validity()))
+
+
+def _is_auth_failure(response) -> bool:
+    return response.status_code in (401, 403)
+
+
 def send_request(endpoint: Endpoint, params: dict = None, n_try: int = 3,
                  server_url: str = "http://amda.irap.omp.eu") -> str or None:
     """Send a request on the AMDA_Webservice REST service to the given endpoint with given parameters. Retry up to :data:`n_try` times upon failure.
@@ -99,14 +149,16 @@ def send_request(endpoint: Endpoint, params: dict = None, n_try: int = 3,
     """
     url = request_url(endpoint, server_url=server_url)
     params = params or {}
-    params['token'] = token(server_url=server_url)
     for _ in [None] * n_try:  # in case of failure
-        # add token now ? does it change
+        params['token'] = tokens.get(server_url)
         log.debug(f"Send request on AMDA_Webservice server {url}")
         r = http.get(url, params=params)
         if r is None:
             # try again
             continue
+        if _is_auth_failure(r):
+            tokens.invalidate(server_url, params['token'])
+            continue
         return r.text.strip()
     return None
 
@@ -143,10 +195,157 @@ def send_indirect_request(endpoint: Endpoint, params: dict = None, n_try: int =
     return None
 
 
-def send_request_json(endpoint: Endpoint, params: Dict = None, n_try: int = 3,
-                      server_url: str = "http://amda.irap.omp.eu",
-                      extra_http_headers: Dict or None = None) -> str or None:
-    """Send a request on the AMDA_Webservice REST service to the given endpoint with given parameters. We expect the result to be JSON data.
+class _Job:
+    __slots__ = ['params', 'status_url', 'headers', 'future', 'delay', 'deadline']
+
+    def __init__(self, params: Dict, status_url: str, headers: Dict, future: Future, delay: float, deadline: float):
+        self.params = params
+        self.status_url = status_url
+        self.headers = headers
+        self.future = future
+        self.delay = delay
+        self.deadline = deadline
+
+
+class JobPoller:
+    """Tracks AMDA jobs still in progress from a single background thread. Each job status is checked with an
+    exponential backoff, starting from ``initial_delay`` and doubling up to ``max_delay``, until it completes or reaches
+    its deadline. Any number of jobs can be in flight at once, each one is exposed as a
+    :class:`concurrent.futures.Future` resolved with the job data file URLs.
+
+    Parameters
+    ----------
+    initial_delay: Callable[[], float]
+        returns the delay in seconds before the first status check
+    max_delay: Callable[[], float]
+        returns the maximum delay in seconds between two status checks
+    timeout: Callable[[], float]
+        returns the maximum duration in seconds of a job
+    """
+
+    def __init__(self, initial_delay: Callable[[], float], max_delay: Callable[[], float],
+                 timeout: Callable[[], float]):
+        self._initial_delay = initial_delay
+        self._max_delay = max_delay
+        self._timeout = timeout
+        self._condition = Condition()
+        self._queue = []
+        self._counter = itertools.count()
+        self._thread = None
+
+    def submit(self, job: Dict, server_url: str = "http://amda.irap.omp.eu",
+               extra_http_headers: Dict or None = None) -> Future:
+        """Starts tracking given job.
+
+        Parameters
+        ----------
+        job: Dict
+            AMDA answer describing the job in progress, sent back as is to get job status
+        server_url: str
+            the base server URL
+        extra_http_headers: Dict or None
+            extra HTTP headers sent with each status request
+
+        Returns
+        -------
+        Future
+            resolved with job data file URLs once done
+        """
+        future = Future()
+        now = time.monotonic()
+        delay = self._initial_delay()
+        self._schedule(now + delay,
+                       _Job(params=job, status_url=request_url(Endpoint.GETSTATUS, server_url=server_url),
+                            headers=extra_http_headers or {}, future=future, delay=delay,
+                            deadline=now + self._timeout()))
+        return future
+
+    def _schedule(self, when: float, job: _Job):
+        with self._condition:
+            heapq.heappush(self._queue, (when, next(self._counter), job))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = Thread(target=self._run, name="speasy-amda-job-poller", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _next_due_job(self) -> _Job or None:
+        with self._condition:
+            while True:
+                if not self._queue:
+                    self._thread = None
+                    return None
+                when, _, job = self._queue[0]
+                now = time.monotonic()
+                if when <= now:
+                    heapq.heappop(self._queue)
+                    return job
+                self._condition.wait(when - now)
+
+    def _run(self):
+        while True:
+            job = self._next_due_job()
+            if job is None:
+                return
+            if not job.future.cancelled():
+                try:
+                    self._poll(job)
+                except Exception as e:  # job cancelled while being polled
+                    log.debug(f"Dropping AMDA job: {e}")
+
+    def _poll(self, job: _Job):
+        try:
+            status = http.get(job.status_url, params=job.params, headers=job.headers).json()
+        except Exception as e:
+            log.debug(f"Failed to get AMDA job status: {e}")
+            status = None
+        if status is not None and status.get("status") == "done":
+            job.future.set_result(status["dataFileURLs"])
+        elif status is not None and status.get("success") is False:
+            job.future.set_exception(RuntimeError(f"AMDA job failed: {status}"))
+        elif time.monotonic() + job.delay > job.deadline:
+            job.future.set_exception(TimeoutError(f"AMDA job still in progress after {self._timeout()} seconds"))
+        else:
+            job.delay = min(job.delay * 2, self._max_delay())
+            self._schedule(time.monotonic() + job.delay, job)
+
+
+jobs = JobPoller(initial_delay=amda_cfg.job_poll_initial_delay, max_delay=amda_cfg.job_poll_max_delay,
+                 timeout=amda_cfg.job_timeout)
+
+
+def wait(future: Future):
+    """Waits for given job result, gives up if the calling context gets cancelled (see
+    :func:`speasy.core.http.cancellable`).
+    """
+    while True:
+        try:
+            return future.result(timeout=.5)
+        except FutureTimeoutError:
+            if http.is_cancelled():
+                future.cancel()
+                raise http.RequestCancelled("AMDA job cancelled")
+
+
+def wait_any(futures: Iterable[Future]) -> Set[Future]:
+    """Waits until at least one of given jobs completes and returns the completed ones, gives up and cancels them all
+    if the calling context gets cancelled (see :func:`speasy.core.http.cancellable`).
+    """
+    futures = list(futures)
+    while True:
+        done, _ = wait_futures(futures, timeout=.5, return_when=FIRST_COMPLETED)
+        if done:
+            return done
+        if http.is_cancelled():
+            for future in futures:
+                future.cancel()
+            raise http.RequestCancelled("AMDA job cancelled")
+
+
+def submit_request_json(endpoint: Endpoint, params: Dict = None, n_try: int = 3,
+                        server_url: str = "http://amda.irap.omp.eu",
+                        extra_http_headers: Dict or None = None) -> Future:
+    """Send a request on the AMDA_Webservice REST service to the given endpoint with given parameters without waiting
+    for long running jobs. We expect the result to be JSON data.
 
     Parameters
     ----------
@@ -158,45 +357,70 @@ def send_request_json(endpoint: Endpoint, params: Dict = None, n_try: int = 3,
         the number of retry in case of failure
     server_url: str
         the base server URL
+    extra_http_headers: Dict or None
+        extra HTTP headers
 
     Returns
     -------
-    str or None
-        request result parsed as json object
+    Future
+        resolved with the request result parsed as json object or None, jobs still in progress on server side are
+        tracked by :data:`jobs`
     """
 
     url = request_url(endpoint, server_url=server_url)
     params = params or {}
     http_headers = extra_http_headers or {}
-    params['token'] = token(server_url=server_url)
     for _ in [None] * n_try:  # in case of failure
-        # add token now ? does it change
+        params['token'] = tokens.get(server_url)
         log.debug(f"Send request on AMDA_Webservice server {url}")
         r = http.get(url, params=params, headers=http_headers)
+        if _is_auth_failure(r):
+            tokens.invalidate(server_url, params['token'])
+            continue
         js = r.json()
         if 'success' in js and \
             js['success'] is True and \
             'dataFileURLs' in js:
             log.debug(f"success: {js['dataFileURLs']}")
-            return js['dataFileURLs']
+            future = Future()
+            future.set_result(js['dataFileURLs'])
+            return future
         elif "success" in js and \
             js["success"] is True and \
             "status" in js and \
             js["status"] == "in progress":
             log.warning("This request duration is too long, consider reducing time range")
-            while True:
-                default_sleep_time = 10.
-                time.sleep(default_sleep_time)
-                url = request_url(Endpoint.GETSTATUS, server_url=server_url)
+            return jobs.submit(js, server_url=server_url, extra_http_headers=http_headers)
+        else:
+            log.debug(f"Failed: {r.text}")
+    future = Future()
+    future.set_result(None)
+    return future
 
-                status = http.get(url, params=js, headers=http_headers).json()
-                if status is not None and status["status"] == "done":
-                    return status["dataFileURLs"]
 
+def send_request_json(endpoint: Endpoint, params: Dict = None, n_try: int = 3,
+                      server_url: str = "http://amda.irap.omp.eu",
+                      extra_http_headers: Dict or None = None) -> str or None:
+    """Send a request on the AMDA_Webservice REST service to the given endpoint with given parameters. We expect the result to be JSON data.
 
-        else:
-            log.debug(f"Failed: {r.text}")
-    return None
+    Parameters
+    ----------
+    endpoint: Endpoint
+        target API endpoint on which the request will be performed
+    params: dict
+        request parameters
+    n_try: int
+        the number of retry in case of failure
+    server_url: str
+        the base server URL
+
+    Returns
+    -------
+    str or None
+        request result parsed as json object
+    """
+    return wait(submit_request_json(endpoint, params=params, n_try=n_try, server_url=server_url,
+                                    extra_http_headers=extra_http_headers))
 
 
 @CacheCall(cache_retention=amda_cfg.user_cache_retention(), is_pure=True)
@@ -376,6 +600,29 @@ def get_parameter(server_url: str = "http://amda.irap.omp.eu", extra_http_header
                              extra_http_headers=extra_http_headers)
 
 
+def submit_parameter(server_url: str = "http://amda.irap.omp.eu", extra_http_headers: Dict or None = None,
+                     **kwargs: Dict) -> Future:
+    """Same as :func:`get_parameter` but returns a future instead of waiting for long running jobs, this allows to
+    keep several AMDA jobs in flight and to collect them as they complete.
+
+    Parameters
+    ----------
+    extra_http_headers : Dict or None
+        reserved for internal use
+    server_url: str
+        the base server URL
+    kwargs: dict
+        extra request arguments such as username and password for private parameters
+
+    Returns
+    -------
+    Future
+        resolved with the data file URL or None
+    """
+    return submit_request_json(Endpoint.GETPARAM, params=kwargs, server_url=server_url,
+                               extra_http_headers=extra_http_headers)
+
+
 @CacheCall(cache_retention=24 * 60 * 60, is_pure=True)
 def get_obs_data_tree(server_url: str = "http://amda.irap.omp.eu") -> str or None:
     """Get observatory data tree.
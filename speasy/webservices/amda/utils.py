@@ -5,12 +5,12 @@ conversion procedures for parsing CSV and VOTable data.
 import datetime
 import os
 from typing import Dict, List
-from urllib.request import urlopen
 
 import numpy as np
 import pandas as pds
 
 from speasy.core import epoch_to_datetime64
+from speasy.core.http import urlopen
 from speasy.core.datetime_range import DateTimeRange
 from speasy.products.catalog import Catalog, Event
 from speasy.products.timetable import TimeTable
@@ -46,9 +46,9 @@ def load_csv(filename: str) -> SpeasyVariable:
         columns = [col.strip()
                    for col in meta.get('DATA_COLUMNS', "").split(', ')[:]]
         meta["UNITS"] = meta.get("PARAMETER_UNITS")
-        with urlopen(filename) as f:
-            data = pds.read_csv(f, comment='#', delim_whitespace=True,
-                                header=None, names=columns).values.transpose()
+        csv.seek(0)
+        data = pds.read_csv(csv, comment='#', delim_whitespace=True,
+                            header=None, names=columns).values.transpose()
         time, data = epoch_to_datetime64(data[0]), data[1:].transpose()
 
         if "PARAMETER_TABLE_MIN_VALUES[1]" in meta:
@@ -315,7 +315,7 @@ class AMDA_Webservice(DataProvider):
 
     @AllowedKwargs(PROXY_ALLOWED_KWARGS + CACHE_ALLOWED_KWARGS + GET_DATA_ALLOWED_KWARGS)
     @ParameterRangeCheck()
-    @Cacheable(prefix="amda", version=product_version, fragment_hours=lambda x: 12)
+    @Cacheable(prefix="amda", version=product_version, fragment_hours=lambda x: 12, adaptive_fragments=True)
     @Proxyfiable(GetProduct, get_parameter_args)
     def get_parameter(self, product, start_time, stop_time, extra_http_headers: Dict or None = None, **kwargs) -> \
     Optional[
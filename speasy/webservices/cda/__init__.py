@@ -9,19 +9,18 @@ __version__ = '0.1.0'
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
-from urllib.request import urlopen
 
 from speasy.core import AllowedKwargs, http
 from speasy.core.cache import _cache  # _cache is used for tests (hack...)
 from speasy.core.cache import CACHE_ALLOWED_KWARGS, UnversionedProviderCache
-from speasy.core.cdf import load_variable
+from speasy.core.cdf import load_variable_from_stream
 from speasy.core.dataprovider import (GET_DATA_ALLOWED_KWARGS, DataProvider,
                                       ParameterRangeCheck)
 from speasy.core.datetime_range import DateTimeRange
 from speasy.core.inventory.indexes import (DatasetIndex, ParameterIndex,
                                            SpeasyIndex)
 from speasy.core.proxy import PROXY_ALLOWED_KWARGS, GetProduct, Proxyfiable
-from speasy.core.requests_scheduling import SplitLargeRequests
+from speasy.core.requests_scheduling import SplitLargeRequests, provider_request
 from speasy.products.variable import SpeasyVariable
 
 log = logging.getLogger(__name__)
@@ -33,8 +32,8 @@ class CdaWebException(BaseException):
 
 
 def _read_cdf(url: str, variable: str) -> SpeasyVariable:
-    with urlopen(url) as remote_cdf:
-        return load_variable(buffer=remote_cdf.read(), variable=variable)
+    with http.urlopen_stream(url) as remote_cdf:
+        return load_variable_from_stream(variable=variable, stream=remote_cdf)
 
 
 def get_parameter_args(start_time: datetime, stop_time: datetime, product: str, **kwargs):
@@ -118,6 +117,7 @@ class CDA_Webservice(DataProvider):
             raise ValueError(f"Given string does not look like a CDA dataset/variable pair: {index_or_str}")
         raise TypeError(f"Wrong type for {index_or_str}, expecting a string or a SpeasyIndex, got {type(index_or_str)}")
 
+    @provider_request("cda")
     def _dl_variable(self,
                      dataset: str, variable: str,
                      start_time: datetime, stop_time: datetime, if_newer_than: datetime or None = None,
@@ -147,7 +147,8 @@ class CDA_Webservice(DataProvider):
     @AllowedKwargs(
         PROXY_ALLOWED_KWARGS + CACHE_ALLOWED_KWARGS + GET_DATA_ALLOWED_KWARGS + ['if_newer_than'])
     @ParameterRangeCheck()
-    @UnversionedProviderCache(prefix="cda", fragment_hours=lambda x: 12, cache_retention=timedelta(days=7))
+    @UnversionedProviderCache(prefix="cda", fragment_hours=lambda x: 12, cache_retention=timedelta(days=7),
+                              adaptive_fragments=True)
     @SplitLargeRequests(threshold=lambda: timedelta(days=7))
     @Proxyfiable(GetProduct, get_parameter_args)
     def get_data(self, product, start_time: datetime, stop_time: datetime, if_newer_than: datetime or None = None,
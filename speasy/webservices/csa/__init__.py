@@ -6,15 +6,13 @@ from speasy.core.cache import Cacheable, CACHE_ALLOWED_KWARGS  # _cache is used
 from speasy.products.variable import SpeasyVariable
 from speasy.core import http, AllowedKwargs, fix_name
 from speasy.core.proxy import Proxyfiable, GetProduct, PROXY_ALLOWED_KWARGS
-from speasy.core.cdf import load_variable
+from speasy.core.cdf import load_variable_from_stream
 from speasy.core.inventory.indexes import ParameterIndex, DatasetIndex, SpeasyIndex, make_inventory_node
 from speasy.core.dataprovider import DataProvider, ParameterRangeCheck, GET_DATA_ALLOWED_KWARGS
-from tempfile import TemporaryDirectory
 from speasy.core.datetime_range import DateTimeRange
-from speasy.core.requests_scheduling import SplitLargeRequests
+from speasy.core.requests_scheduling import SplitLargeRequests, provider_request
 import tarfile
 import logging
-from io import BytesIO
 
 log = logging.getLogger(__name__)
 
@@ -103,12 +101,11 @@ def build_inventory(root: SpeasyIndex, tapurl="https://csa.esac.esa.int/csa-sl-t
 
 
 def _read_cdf(response: requests.Response, variable: str) -> SpeasyVariable:
-    with tarfile.open(fileobj=BytesIO(response.content)) as tar:
-        tarname = tar.getnames()
-        if len(tarname):
-            with TemporaryDirectory() as tmp_dir:
-                tar.extractall(tmp_dir)
-                return load_variable(file=f"{tmp_dir}/{tarname[0]}", variable=variable)
+    response.raw.decode_content = True
+    with tarfile.open(fileobj=response.raw, mode='r|*') as tar:
+        for member in tar:
+            if member.isfile():
+                return load_variable_from_stream(variable=variable, stream=tar.extractfile(member))
 
 
 def get_parameter_args(start_time: datetime, stop_time: datetime, product: str, **kwargs):
@@ -126,6 +123,7 @@ class CSA_Webservice(DataProvider):
             dataset = self.flat_inventory.datasets[dataset]
         return DateTimeRange(dataset.start_date, dataset.stop_date)
 
+    @provider_request("csa")
     def _dl_variable(self,
                      dataset: str, variable: str,
                      start_time: datetime, stop_time: datetime, extra_http_headers: Dict[str, str] or None = None) -> \
@@ -139,20 +137,21 @@ class CSA_Webservice(DataProvider):
         headers = {}
         if extra_http_headers is not None:
             headers.update(extra_http_headers)
-        resp = http.get(self.__url, params={
+        with http.get(self.__url, params={
             "RETRIEVAL_TYPE": "product",
             "DATASET_ID": dataset,
             "START_DATE": start_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
             "END_DATE": stop_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
             "DELIVERY_FORMAT": "CDF_ISTP",
             "DELIVERY_INTERVAL": "all"
-        }, headers=headers)
-        log.debug(f"{resp.url}")
-        if resp.status_code != 200:
-            raise RuntimeError(f'Failed to get data with request: {resp.url}, got {resp.status_code} HTTP response')
-        if not resp.ok:
-            return None
-        return _read_cdf(resp, variable)
+        }, headers=headers, stream=True) as resp:
+            log.debug(f"{resp.url}")
+            if resp.status_code != 200:
+                raise RuntimeError(
+                    f'Failed to get data with request: {resp.url}, got {resp.status_code} HTTP response')
+            if not resp.ok:
+                return None
+            return _read_cdf(resp, variable)
 
     @staticmethod
     def build_inventory(root: SpeasyIndex):
@@ -222,7 +221,7 @@ class CSA_Webservice(DataProvider):
 
     @AllowedKwargs(PROXY_ALLOWED_KWARGS + CACHE_ALLOWED_KWARGS + GET_DATA_ALLOWED_KWARGS)
     @ParameterRangeCheck()
-    @Cacheable(prefix="csa", fragment_hours=lambda x: 12, version=product_last_update)
+    @Cacheable(prefix="csa", fragment_hours=lambda x: 12, version=product_last_update, adaptive_fragments=True)
     @SplitLargeRequests(threshold=lambda: timedelta(days=7))
     @Proxyfiable(GetProduct, get_parameter_args)
     def get_data(self, product, start_time: datetime, stop_time: datetime,
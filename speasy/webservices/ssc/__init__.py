@@ -15,7 +15,7 @@ from speasy.core.proxy import Proxyfiable, GetProduct, PROXY_ALLOWED_KWARGS
 from speasy.core.inventory.indexes import ParameterIndex, SpeasyIndex
 from speasy.core.dataprovider import DataProvider, ParameterRangeCheck, GET_DATA_ALLOWED_KWARGS
 from speasy.core.datetime_range import DateTimeRange
-from speasy.core.requests_scheduling import SplitLargeRequests
+from speasy.core.requests_scheduling import SplitLargeRequests, provider_request
 import numpy as np
 from astropy import units
 
@@ -122,9 +122,11 @@ class SSC_Webservice(DataProvider):
         PROXY_ALLOWED_KWARGS + CACHE_ALLOWED_KWARGS + GET_DATA_ALLOWED_KWARGS + ['coordinate_system',
                                                                                  'debug'])
     @ParameterRangeCheck()
-    @Cacheable(prefix="ssc_orbits", fragment_hours=lambda x: 24, version=version, entry_name=_make_cache_entry_name)
+    @Cacheable(prefix="ssc_orbits", fragment_hours=lambda x: 24, version=version, entry_name=_make_cache_entry_name,
+               adaptive_fragments=True)
     @SplitLargeRequests(threshold=lambda: timedelta(days=60))
     @Proxyfiable(GetProduct, get_parameter_args)
+    @provider_request("ssc")
     def _get_orbit(self, product: str, start_time: datetime, stop_time: datetime, coordinate_system: str = 'gse',
                    debug=False, extra_http_headers: Dict or None = None) -> Optional[SpeasyVariable]:
         if stop_time - start_time < timedelta(days=1):
@@ -80,6 +80,20 @@ class PublicProductsRequests(unittest.TestCase):
             self.assertTrue(
                 any(["This request duration is too long, consider reducing time range" in line for line in cm.output]))
 
+    def test_get_variable_split_in_parallel_chunks(self):
+        start_date = datetime(2006, 1, 8, 0, 0, 0, tzinfo=timezone.utc)
+        stop_date = datetime(2006, 1, 10, 12, 0, 0, tzinfo=timezone.utc)
+        parameter_id = "c1_b_gsm"
+        reference = spz.amda.get_parameter(parameter_id, start_date, stop_date, disable_proxy=True,
+                                           disable_cache=True)
+        os.environ[spz.config.amda.max_chunk_size_days.env_var_name] = "1"
+        try:
+            result = spz.amda.get_parameter(parameter_id, start_date, stop_date, disable_proxy=True,
+                                            disable_cache=True)
+        finally:
+            os.environ.pop(spz.config.amda.max_chunk_size_days.env_var_name)
+        self.assertEqual(result, reference)
+
     def test_returns_none_for_a_request_outside_of_range(self):
         with self.assertLogs('speasy.core.dataprovider', level='WARNING') as cm:
             start_date = datetime(1999, 1, 1, 0, 0, 0, tzinfo=timezone.utc)
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+import unittest
+from collections import Counter
+from concurrent.futures import as_completed
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+from speasy.webservices.amda._impl import AmdaImpl
+from speasy.webservices.amda.rest_client import JobPoller, TokenManager, _is_auth_failure
+
+
+class _JobStatusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    polls = Counter()
+
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        self.polls[query["id"]] += 1
+        polls_needed = int(query["polls_needed"])
+        if polls_needed < 0:
+            status = {"success": False, "message": "error"}
+        elif self.polls[query["id"]] >= polls_needed:
+            status = {"success": True, "status": "done", "dataFileURLs": f"url_{query['id']}"}
+        else:
+            status = {"success": True, "status": "in progress"}
+        body = json.dumps(status).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class AmdaTokenManager(unittest.TestCase):
+    def setUp(self):
+        self.fetch_count = 0
+
+    def _fetch(self, server_url):
+        self.fetch_count += 1
+        time.sleep(0.01)
+        return f"{server_url}_{self.fetch_count}"
+
+    def test_reuses_token(self):
+        tokens = TokenManager(fetch=self._fetch, validity=lambda: timedelta(minutes=5))
+        self.assertListEqual([tokens.get("server") for _ in range(37)], ["server_1"] * 37)
+        self.assertEqual(self.fetch_count, 1)
+
+    def test_fetches_token_once_across_threads(self):
+        tokens = TokenManager(fetch=self._fetch, validity=lambda: timedelta(minutes=5))
+        threads = [threading.Thread(target=tokens.get, args=("server",)) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.fetch_count, 1)
+
+    def test_refreshes_expired_token(self):
+        tokens = TokenManager(fetch=self._fetch, validity=lambda: timedelta(seconds=0))
+        self.assertEqual(tokens.get("server"), "server_1")
+        self.assertEqual(tokens.get("server"), "server_2")
+
+    def test_refreshes_rejected_token_once(self):
+        tokens = TokenManager(fetch=self._fetch, validity=lambda: timedelta(minutes=5))
+        rejected = tokens.get("server")
+        tokens.invalidate("server", rejected)
+        refreshed = tokens.get("server")
+        tokens.invalidate("server", rejected)
+        self.assertEqual(tokens.get("server"), refreshed)
+        self.assertEqual(self.fetch_count, 2)
+
+    def test_only_rejected_requests_are_auth_failures(self):
+        self.assertTrue(_is_auth_failure(SimpleNamespace(status_code=401, text="")))
+        self.assertTrue(_is_auth_failure(SimpleNamespace(status_code=403, text="")))
+        self.assertFalse(_is_auth_failure(SimpleNamespace(status_code=200, text="# invalid value, token expired")))
+
+
+class _JobServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _JobStatusHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _JobStatusHandler.polls.clear()
+        self.jobs = JobPoller(initial_delay=lambda: .01, max_delay=lambda: .04, timeout=lambda: 5.)
+
+
+class AmdaJobPoller(_JobServerTestCase):
+    def test_polls_until_done(self):
+        future = self.jobs.submit({"id": "a", "polls_needed": 4}, server_url=self.url)
+        self.assertEqual(future.result(timeout=5), "url_a")
+        self.assertEqual(_JobStatusHandler.polls["a"], 4)
+
+    def test_tracks_several_jobs_at_once(self):
+        futures = {self.jobs.submit({"id": str(i), "polls_needed": 6 - i}, server_url=self.url): i for i in
+                   range(6)}
+        completion_order = [futures[f] for f in as_completed(futures, timeout=5)]
+        self.assertEqual(sorted(completion_order), list(range(6)))
+        self.assertEqual(completion_order[0], 5)
+        for future, i in futures.items():
+            self.assertEqual(future.result(), f"url_{i}")
+
+    def test_reports_failed_jobs(self):
+        future = self.jobs.submit({"id": "b", "polls_needed": -1}, server_url=self.url)
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+
+    def test_gives_up_after_deadline(self):
+        jobs = JobPoller(initial_delay=lambda: .01, max_delay=lambda: .02, timeout=lambda: .1)
+        start = time.monotonic()
+        future = jobs.submit({"id": "c", "polls_needed": 1000}, server_url=self.url)
+        with self.assertRaises(TimeoutError):
+            future.result(timeout=5)
+        self.assertLess(time.monotonic() - start, 1.)
+
+    def test_stops_polling_cancelled_jobs(self):
+        future = self.jobs.submit({"id": "d", "polls_needed": 1000}, server_url=self.url)
+        time.sleep(.1)
+        future.cancel()
+        time.sleep(.1)
+        polls = _JobStatusHandler.polls["d"]
+        time.sleep(.2)
+        self.assertEqual(_JobStatusHandler.polls["d"], polls)
+
+
+class _ChunksAmdaImpl(AmdaImpl):
+    def __init__(self, jobs: JobPoller, server_url: str):
+        super().__init__(server_url=server_url)
+        self.jobs = jobs
+        self.submitted = []
+        self.max_in_flight = 0
+
+    def submit_parameter_chunk(self, start_time, stop_time, parameter_id, extra_http_headers=None, **kwargs):
+        self.max_in_flight = max(self.max_in_flight, sum(not f.done() for f in self.submitted) + 1)
+        # later chunks complete first
+        future = self.jobs.submit({"id": f"{parameter_id}_{start_time.day}", "polls_needed": 10 - start_time.day},
+                                  server_url=self.server_url)
+        self.submitted.append(future)
+        return future
+
+    def load_parameter_chunk(self, url):
+        return url
+
+
+class AmdaParameterChunks(_JobServerTestCase):
+    def test_keeps_several_jobs_in_flight(self):
+        impl = _ChunksAmdaImpl(self.jobs, self.url)
+        chunks = [(datetime(2020, 1, day), datetime(2020, 1, day + 1)) for day in range(1, 9)]
+        self.assertEqual(impl.dl_parameter_chunks(chunks, "chunk"), [f"url_chunk_{day}" for day in range(1, 9)])
+        self.assertGreater(impl.max_in_flight, 1)
+        self.assertLessEqual(impl.max_in_flight, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import speasy as spz
+from speasy.core import epoch_to_datetime64, http
+from speasy.core.cache import Cache, Cacheable
+from speasy.core.dataprovider import DataProvider
+from speasy.core.requests_scheduling import SplitLargeRequests, request_dispatch
+from speasy.products.variable import DataContainer, SpeasyVariable, VariableTimeAxis
+
+dirpath = tempfile.mkdtemp()
+cache = Cache(dirpath)
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = 0
+    delay = 0.
+
+    def do_GET(self):
+        type(self).hits += 1
+        time.sleep(type(self).delay)
+        query = parse_qs(urlparse(self.path).query)
+        start, stop = float(query['start'][0]), float(query['stop'][0])
+        body = np.arange(start, stop, 60.).tobytes()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubProvider(DataProvider):
+    provider_name = 'stub'
+
+    def __init__(self, url):
+        # DataProvider constructor builds and registers an inventory, not needed here
+        self.url = url
+
+    def version(self, product):
+        return 1
+
+    def get_data(self, product, start_time, stop_time, **kwargs):
+        return self._get_data(product, start_time, stop_time, **kwargs)
+
+    @Cacheable(prefix="stub", cache_instance=cache, version=version, fragment_hours=lambda x: 1)
+    @SplitLargeRequests(threshold=lambda: timedelta(hours=2))
+    def _get_data(self, product, start_time, stop_time):
+        resp = http.get(f"{self.url}/data", params={'start': start_time.timestamp(), 'stop': stop_time.timestamp()})
+        time_axis = np.frombuffer(resp.content, dtype=np.float64)
+        return SpeasyVariable(axes=[VariableTimeAxis(values=epoch_to_datetime64(time_axis))],
+                              values=DataContainer(values=time_axis.copy()))
+
+
+class AsyncGetData(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        request_dispatch.PROVIDERS['stub'] = _StubProvider(f"http://127.0.0.1:{cls.server.server_address[1]}")
+
+    @classmethod
+    def tearDownClass(cls):
+        request_dispatch.PROVIDERS.pop('stub')
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _StubHandler.delay = 0.
+
+    def test_same_result_than_sync_api(self):
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        ranges = [[start, start + timedelta(hours=3)], [start + timedelta(days=1), start + timedelta(days=1, hours=5)]]
+        expected = spz.get_data("stub/test_same_result", ranges, disable_cache=True)
+        result = asyncio.run(spz.get_data_async("stub/test_same_result", ranges))
+        self.assertEqual(len(result), 2)
+        for e, r in zip(expected, result):
+            self.assertEqual(e, r)
+        single = asyncio.run(spz.get_data_async("stub/test_same_result", ranges[0][0], ranges[0][1]))
+        self.assertEqual(single, expected[0])
+
+    def test_provider_async_method(self):
+        start = datetime(2020, 2, 1, tzinfo=timezone.utc)
+        provider = request_dispatch.PROVIDERS['stub']
+        self.assertEqual(asyncio.run(provider.get_data_async("test_provider_method", start, start + timedelta(hours=1))),
+                         provider.get_data("test_provider_method", start, start + timedelta(hours=1),
+                                           disable_cache=True))
+
+    def test_failures_can_be_returned_as_exceptions(self):
+        start = datetime(2020, 4, 1, tzinfo=timezone.utc)
+        products = ["stub/test_failures", "wrong/path"]
+        result = spz.get_data(products, start, start + timedelta(hours=1), concurrent=True, return_exceptions=True)
+        self.assertIsInstance(result[0], SpeasyVariable)
+        self.assertIsInstance(result[1], ValueError)
+        self.assertIsNone(spz.get_data(products, start, start + timedelta(hours=1), concurrent=True)[1])
+        result = asyncio.run(spz.get_data_async(products, start, start + timedelta(hours=1), return_exceptions=True))
+        self.assertIsInstance(result[1], ValueError)
+
+    def test_cancellation_stops_requests(self):
+        _StubHandler.delay = 0.1
+        start = datetime(2020, 3, 1, tzinfo=timezone.utc)
+
+        async def cancel_after(delay):
+            task = asyncio.ensure_future(
+                spz.get_data_async("stub/test_cancellation", start, start + timedelta(days=2), disable_cache=True))
+            await asyncio.sleep(delay)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        hits = _StubHandler.hits
+        asyncio.run(cancel_after(0.25))
+        time.sleep(0.5)
+        self.assertLess(_StubHandler.hits - hits, 10)
+
+
+class Prefetch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        request_dispatch.PROVIDERS['stub'] = _StubProvider(f"http://127.0.0.1:{cls.server.server_address[1]}")
+
+    @classmethod
+    def tearDownClass(cls):
+        request_dispatch.PROVIDERS.pop('stub')
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _StubHandler.delay = 0.
+
+    def test_later_requests_hit_cache(self):
+        start = datetime(2021, 1, 1, tzinfo=timezone.utc)
+        ranges = [[start + timedelta(days=i), start + timedelta(days=i, hours=3)] for i in range(4)]
+        handle = spz.prefetch(["stub/test_prefetch_a", "stub/test_prefetch_b"], ranges, max_workers=4)
+        self.assertEqual(handle.total, 8)
+        self.assertTrue(handle.wait(timeout=30))
+        self.assertEqual(handle.progress, 1.)
+        self.assertEqual(handle.failed, [])
+        hits = _StubHandler.hits
+        result = spz.get_data(["stub/test_prefetch_a", "stub/test_prefetch_b"], ranges)
+        self.assertEqual(_StubHandler.hits, hits)
+        self.assertEqual(result, spz.get_data(["stub/test_prefetch_a", "stub/test_prefetch_b"], ranges,
+                                              disable_cache=True))
+        hits = _StubHandler.hits
+        handle = spz.prefetch("stub/test_prefetch_a", ranges)
+        self.assertTrue(handle.wait(timeout=30))
+        self.assertEqual(_StubHandler.hits, hits)
+
+    def test_cancel_skips_pending_requests(self):
+        _StubHandler.delay = 0.2
+        start = datetime(2021, 2, 1, tzinfo=timezone.utc)
+        ranges = [[start + timedelta(days=i), start + timedelta(days=i, hours=1)] for i in range(20)]
+        hits = _StubHandler.hits
+        handle = spz.prefetch("stub/test_prefetch_cancel", ranges, max_workers=1)
+        time.sleep(0.1)
+        handle.cancel()
+        self.assertTrue(handle.wait(timeout=30))
+        self.assertTrue(handle.status()["cancelled"])
+        self.assertEqual(handle.completed, 20)
+        self.assertLess(_StubHandler.hits - hits, 5)
+
+    def test_requires_time_ranges(self):
+        with self.assertRaises(ValueError):
+            spz.prefetch("stub/test_prefetch_a")
+
+
+def tearDownModule():
+    shutil.rmtree(dirpath, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
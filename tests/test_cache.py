@@ -1,20 +1,35 @@
+import contextlib
+import io
+import json
 import operator
+import os
 import shutil
 import tempfile
 import time
 import unittest
 from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
 
 import dateutil.parser as dt_parser
 import numpy as np
 import packaging.version as Version
 from ddt import data, ddt, unpack
 
+from speasy.config import cache as cache_cfg, concurrency as concurrency_cfg
 from speasy.core import epoch_to_datetime64
-from speasy.core.cache import Cache, Cacheable, UnversionedProviderCache
+from speasy.core.cache import (Cache, CacheItem, Cacheable, CacheStatistics, MemoryCache, UnversionedProviderCache,
+                               cache_stats)
+from speasy.core.cache._providers_caches import background_revalidations, fragment_hours_for_size
+from speasy.core.cache import tools as cache_tools
+from speasy.core.cache._quotas import version_tag
+from speasy.core.cache.cache import cache_version, decode_item, encode_item
 from speasy.core.cache.version import str_to_version, version_to_str
+from speasy.core.datetime_range import DateTimeRange
+from speasy.core.index import index
+from speasy.core.requests_scheduling.concurrency import bounded_map
+from speasy.products import LazyVariable
 from speasy.products.variable import (DataContainer, SpeasyVariable,
-                                      VariableTimeAxis)
+                                      VariableTimeAxis, to_dictionary)
 
 start_date = datetime(2016, 6, 1, 12, tzinfo=timezone.utc)
 
@@ -85,6 +100,18 @@ class _CacheTest(unittest.TestCase):
         self.assertGreater(new_stats["hit"], stats["hit"])
         self.assertGreater(new_stats["misses"], stats["misses"])
 
+    def test_counts_each_fragment_lookup_once(self):
+        # 3h30 plus 20% margins rounded to hours gives 5 one hour fragments (11:00 to 16:00)
+        tstart = datetime(2012, 6, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2012, 6, 1, 15, 30, tzinfo=timezone.utc)
+        stats = self._make_data.cache.stats()
+        self._make_data("test_counts_each_fragment_lookup_once", tstart, tend)
+        new_stats = self._make_data.cache.stats()
+        self.assertEqual(new_stats["misses"] - stats["misses"], 5)
+        self._make_data("test_counts_each_fragment_lookup_once", tstart, tend)
+        self.assertEqual(self._make_data.cache.stats()["hit"] - new_stats["hit"], 5)
+        self.assertEqual(self._make_data.cache.stats()["misses"], new_stats["misses"])
+
     def test_get_newer_version_data(self):
         tstart = datetime(2010, 6, 1, 12, 0, tzinfo=timezone.utc)
         tend = datetime(2010, 6, 1, 15, 30, tzinfo=timezone.utc)
@@ -124,6 +151,40 @@ class _CacheTest(unittest.TestCase):
         var = self._make_unversioned_data("test_get_outdated_from_unversioned_cache", tstart, tend)
         self.assertEqual(self._make_unversioned_data_cntr, 2)
 
+    def test_downloads_missing_fragment_groups_in_parallel(self):
+        os.environ[concurrency_cfg.max_fragment_downloads.env_var_name] = "4"
+        try:
+            tstart = datetime(2011, 6, 1, 13, 0, tzinfo=timezone.utc)
+            tend = datetime(2011, 6, 1, 14, 0, tzinfo=timezone.utc)
+            self._make_data("test_parallel_fragments", tstart, tend)
+            self._make_unversioned_data("test_parallel_unversioned_fragments", tstart, tend)
+            tstart = datetime(2011, 6, 1, 6, 0, tzinfo=timezone.utc)
+            tend = datetime(2011, 6, 1, 20, 0, tzinfo=timezone.utc)
+            var = self._make_data("test_parallel_fragments", tstart, tend)
+            self.assertEqual(var, data_generator(tstart, tend))
+            self.assertEqual(self._make_data_cntr, 3)
+            var = self._make_unversioned_data("test_parallel_unversioned_fragments", tstart, tend)
+            self.assertEqual(var, data_generator(tstart, tend))
+            self.assertEqual(self._make_unversioned_data_cntr, 3)
+        finally:
+            os.environ.pop(concurrency_cfg.max_fragment_downloads.env_var_name)
+
+    def test_lazy_get_data(self):
+        tstart = datetime(2010, 8, 1, 12, 10, tzinfo=timezone.utc)
+        tend = datetime(2010, 8, 1, 17, 30, tzinfo=timezone.utc)
+        for product, data_f in (("test_lazy_get_data", self._make_data),
+                                ("test_lazy_get_unversioned_data", self._make_unversioned_data)):
+            expected = data_f(product, tstart, tend)
+            var = data_f(product, tstart, tend, lazy=True)
+            self.assertIsInstance(var, LazyVariable)
+            sliced = var[tstart + timedelta(hours=1):tstart + timedelta(hours=2)]
+            self.assertFalse(var.is_materialized or sliced.is_materialized)
+            self.assertEqual(sliced, expected[tstart + timedelta(hours=1):tstart + timedelta(hours=2)])
+            self.assertEqual(len(sliced), 60)
+            self.assertFalse(var.is_materialized)
+            self.assertEqual(var, expected)
+            self.assertTrue(var.values.flags.writeable)
+
     def test_list_keys(self):
         keys = self._make_data.cache.keys()
         types = [type(key) for key in keys]
@@ -139,6 +200,684 @@ class _CacheTest(unittest.TestCase):
         pass
 
 
+@ddt
+class _CacheGetManyTest(unittest.TestCase):
+    @data('Cache', 'Fanout')
+    def test_get_many(self, cache_type):
+        path = tempfile.mkdtemp()
+        try:
+            c = Cache(path, cache_type=cache_type)
+            for i in range(0, 10, 2):
+                c[f"key_{i}"] = i
+            stats = c.stats()
+            values = c.get_many([f"key_{i}" for i in range(10)])
+            self.assertListEqual(values, [0, None, 2, None, 4, None, 6, None, 8, None])
+            self.assertEqual(c.stats()["hit"] - stats["hit"], 5)
+            self.assertEqual(c.stats()["misses"] - stats["misses"], 5)
+            # each shard is queried once
+            queried = []
+            fetch_many = Cache._fetch_many
+            with patch.object(Cache, "_fetch_many", staticmethod(
+                    lambda shard, keys, read: queried.append(shard) or fetch_many(shard, keys, read))):
+                self.assertListEqual(c.get_many([f"key_{i}" for i in range(0, 10, 2)] * 2), [0, 2, 4, 6, 8] * 2)
+            self.assertEqual(len(queried), len(set(map(id, queried))))
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class _MemoryCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._cntr = 0
+        self._version = 0
+        self.var_nbytes = data_generator(start_date, start_date + timedelta(hours=1)).nbytes
+        os.environ[cache_cfg.memory_size.env_var_name] = str(10 * self.var_nbytes)
+
+    def tearDown(self):
+        os.environ.pop(cache_cfg.memory_size.env_var_name)
+
+    @Cacheable(prefix="memory", cache_instance=cache, version=lambda self, product: self._version)
+    def _make_data(self, product, start_time, stop_time):
+        self._cntr += 1
+        return data_generator(start_time, stop_time)
+
+    def test_is_bounded_in_bytes(self):
+        memory = MemoryCache(max_bytes=lambda: 3 * self.var_nbytes)
+        for i in range(5):
+            var = data_generator(start_date + timedelta(hours=i), start_date + timedelta(hours=i + 1))
+            memory.put(f"key_{i}", CacheItem(to_dictionary(var), 0))
+        self.assertEqual(len(memory), 3)
+        self.assertLessEqual(memory.nbytes, 3 * self.var_nbytes)
+        self.assertIsNone(memory.get("key_0"))
+        self.assertIsNotNone(memory.get("key_2"))
+        memory.put("key_5", CacheItem(to_dictionary(var), 0))
+        self.assertIn("key_2", memory)
+        self.assertNotIn("key_3", memory)
+        self.assertEqual(memory.stats()["hit"], 1)
+        self.assertEqual(memory.stats()["misses"], 1)
+
+    def test_stores_copies_of_memory_mapped_entries(self):
+        time = np.datetime64("2016-06-01T12:00", "ns") + np.arange(100000) * np.timedelta64(1, "m")
+        var = SpeasyVariable(axes=[VariableTimeAxis(values=time)],
+                             values=DataContainer(values=np.arange(100000, dtype=np.float64)))
+        cache.set("memory/test_stores_copies", encode_item(CacheItem(to_dictionary(var), 0)))
+        item = decode_item(cache.get("memory/test_stores_copies", read=True), lazy=True)
+        self.assertFalse(item.data["values"]["values"].flags.owndata)
+        memory = MemoryCache(max_bytes=lambda: 2 * var.nbytes)
+        memory.put("key", item)
+        stored = memory.get("key")
+        self.assertTrue(stored.data["values"]["values"].flags.owndata)
+        self.assertTrue(stored.data["axes"][0]["values"].flags.owndata)
+        self.assertTrue(np.array_equal(stored.data["values"]["values"], var.values))
+        self.assertFalse(item.data["values"]["values"].flags.owndata)
+
+    def test_serves_hits_from_memory(self):
+        tstart = datetime(2013, 6, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2013, 6, 1, 15, 30, tzinfo=timezone.utc)
+        expected = self._make_data("test_serves_hits_from_memory", tstart, tend)
+        stats = cache.stats()
+        for _ in range(10):
+            self.assertEqual(self._make_data("test_serves_hits_from_memory", tstart, tend), expected)
+        new_stats = cache.stats()
+        self.assertEqual(self._cntr, 1)
+        self.assertEqual(new_stats["hit"], stats["hit"])
+        self.assertEqual(new_stats["misses"], stats["misses"])
+        self.assertEqual(new_stats["memory"]["hit"] - stats["memory"]["hit"], 50)
+
+    def test_drops_outdated_entries(self):
+        tstart = datetime(2013, 7, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2013, 7, 1, 15, 30, tzinfo=timezone.utc)
+        self._make_data("test_drops_outdated_entries", tstart, tend)
+        self._version = 1
+        self._make_data("test_drops_outdated_entries", tstart, tend)
+        self.assertEqual(self._cntr, 2)
+        self._make_data("test_drops_outdated_entries", tstart, tend)
+        self.assertEqual(self._cntr, 2)
+
+    def test_is_disabled_by_default(self):
+        os.environ.pop(cache_cfg.memory_size.env_var_name)
+        try:
+            memory = MemoryCache(max_bytes=cache_cfg.memory_size)
+            memory.put("key", CacheItem(to_dictionary(data_generator(start_date, start_date + timedelta(hours=1))), 0))
+            self.assertEqual(len(memory), 0)
+        finally:
+            os.environ[cache_cfg.memory_size.env_var_name] = "0"
+
+
+@ddt
+class _AdaptiveFragmentsTest(unittest.TestCase):
+    def setUp(self):
+        self._cntr = 0
+        self.bytes_per_hour = data_generator(start_date, start_date + timedelta(hours=1)).nbytes
+        self._columns = 1
+        os.environ[cache_cfg.fragment_target_size.env_var_name] = str(int(4.5 * self.bytes_per_hour))
+        for product in ("test_adaptive_fragments", "test_reads_default_fragments", "test_reestimates_fragments"):
+            for module in ("cache-fragment-hours", "cache-fragment-size", "cache-previous-fragment-hours"):
+                if index.contains(module, f"adaptive/{product}"):
+                    index.pop(module, f"adaptive/{product}")
+
+    def tearDown(self):
+        os.environ.pop(cache_cfg.fragment_target_size.env_var_name)
+
+    @Cacheable(prefix="adaptive", cache_instance=cache, fragment_hours=lambda x: 1, adaptive_fragments=True)
+    def _make_data(self, product, start_time, stop_time):
+        self._cntr += 1
+        var = data_generator(start_time, stop_time)
+        if self._columns == 1:
+            return var
+        return SpeasyVariable(axes=var.axes,
+                              values=DataContainer(values=np.repeat(var.values, self._columns, axis=1)))
+
+    @data(
+        (0, 1, 768),
+        (1000, 1, 1),
+        (1000, 4500, 4),
+        (1000, 30000, 24),
+        (1000, 100000, 96),
+    )
+    @unpack
+    def test_fragment_hours_for_size(self, bytes_per_hour, target_size, expected):
+        self.assertEqual(fragment_hours_for_size(bytes_per_hour, target_size), expected)
+
+    def test_learns_fragment_duration_from_first_download(self):
+        product = "test_adaptive_fragments"
+        tstart = datetime(2015, 1, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2015, 1, 1, 15, 30, tzinfo=timezone.utc)
+        first = self._make_data(product, tstart, tend)
+        self.assertTrue(all(key.startswith("adaptive/") for key in cache.keys()
+                            if product in key and not key.startswith("coverage/")))
+        self.assertEqual(index.get("cache-fragment-hours", f"adaptive/{product}"), 4)
+        self.assertEqual(self._make_data(product, tstart + timedelta(days=1), tend + timedelta(days=1)),
+                         data_generator(tstart + timedelta(days=1), tend + timedelta(days=1)))
+        self.assertEqual(self._cntr, 2)
+        self.assertIn(f"adaptive@4h/{product}/2015-01-02T12:00:00+00:00", cache.keys())
+        self.assertEqual(self._make_data(product, tstart + timedelta(days=1), tend + timedelta(days=1)),
+                         data_generator(tstart + timedelta(days=1), tend + timedelta(days=1)))
+        self.assertEqual(self._cntr, 2)
+        self.assertEqual(first, data_generator(tstart, tend))
+
+    def test_reads_entries_stored_before_adapting(self):
+        product = "test_reads_default_fragments"
+        tstart = datetime(2015, 2, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2015, 2, 1, 15, 30, tzinfo=timezone.utc)
+        # entries stored by a version without adaptive fragments use provider default duration
+        os.environ[cache_cfg.fragment_target_size.env_var_name] = "0"
+        self._make_data(product, tstart - timedelta(hours=4), tend)
+        self.assertIn(f"adaptive/{product}/2015-02-01T08:00:00+00:00", cache.keys())
+        os.environ[cache_cfg.fragment_target_size.env_var_name] = str(int(4.5 * self.bytes_per_hour))
+        self._make_data(product, tstart + timedelta(days=1), tend + timedelta(days=1))
+        self.assertEqual(index.get("cache-fragment-hours", f"adaptive/{product}"), 4)
+        self.assertEqual(self._cntr, 2)
+        self.assertEqual(self._make_data(product, tstart, tend), data_generator(tstart, tend))
+        self.assertEqual(self._cntr, 2)
+        self.assertIn(f"adaptive@4h/{product}/2015-02-01T12:00:00+00:00", cache.keys())
+
+    def test_reestimates_fragment_duration(self):
+        product = "test_reestimates_fragments"
+        tstart = datetime(2015, 3, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2015, 3, 1, 15, 30, tzinfo=timezone.utc)
+        self._make_data(product, tstart, tend)
+        self.assertEqual(index.get("cache-fragment-hours", f"adaptive/{product}"), 4)
+        self._make_data(product, tstart + timedelta(days=1), tend + timedelta(days=1))
+        self._columns = 16
+        for day in range(2, 5):
+            self._make_data(product, tstart + timedelta(days=day), tend + timedelta(days=day))
+        self.assertLess(index.get("cache-fragment-hours", f"adaptive/{product}"), 4)
+        self.assertIn(4, index.get("cache-previous-fragment-hours", f"adaptive/{product}"))
+        downloads = self._cntr
+        self._columns = 1
+        self.assertEqual(self._make_data(product, tstart + timedelta(days=1), tend + timedelta(days=1)),
+                         data_generator(tstart + timedelta(days=1), tend + timedelta(days=1)))
+        self.assertEqual(self._cntr, downloads)
+
+
+@ddt
+class _CacheQuotasTest(unittest.TestCase):
+    entry_size = 100_000
+
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath, ignore_errors=True)
+
+    def _fill(self, cache, prefix, count, tags=None):
+        for i in range(count):
+            cache.set(f"{prefix}/product/{i}", bytes(self.entry_size), tag=tags[i] if tags else None)
+
+    def test_quotas_only_evict_their_own_entries(self):
+        quota_cache = Cache(self.dirpath)
+        self._fill(quota_cache, "big", 10)
+        self._fill(quota_cache, "big@48h", 5)
+        self._fill(quota_cache, "precious", 5)
+        self.assertEqual(quota_cache.usage("big"), 15 * self.entry_size)
+        evicted = quota_cache.enforce_quotas({"big": 8 * self.entry_size, "precious": 10 * self.entry_size})
+        self.assertEqual(evicted, 7)
+        self.assertEqual(quota_cache.usage("big"), 8 * self.entry_size)
+        self.assertEqual(quota_cache.usage("precious"), 5 * self.entry_size)
+        self.assertEqual(quota_cache.stats()["evictions"], 7)
+
+    @data('Cache', 'Fanout')
+    def test_counts_size_limit_evictions(self, cache_type):
+        os.environ[cache_cfg.size.env_var_name] = str(20 * self.entry_size)
+        try:
+            limited_cache = Cache(self.dirpath, cache_type=cache_type)
+        finally:
+            os.environ.pop(cache_cfg.size.env_var_name)
+        limited_cache.set("expiring", bytes(self.entry_size), expire=0.01)
+        time.sleep(0.02)
+        self._fill(limited_cache, "big", 40)
+        evictions = limited_cache.stats()["evictions"]
+        self.assertGreater(evictions, 0)
+        self.assertNotIn("expiring", limited_cache)
+        # the version entry and expired one are not evictions
+        self.assertEqual(evictions, 40 - len(limited_cache) + 1)
+        # diskcache still culls writes which do not go through Cache.set, such as coverage records
+        self.assertTrue(all(shard.cull_limit > 0 for shard in limited_cache._shards()))
+
+    def test_evictions_are_incremental(self):
+        quota_cache = Cache(self.dirpath)
+        self._fill(quota_cache, "big", 10)
+        self.assertEqual(quota_cache.enforce_quotas({"big": 0}, max_evictions=4), 4)
+        self.assertEqual(quota_cache.enforce_quotas({"big": 0}, max_evictions=4), 4)
+        self.assertEqual(quota_cache.enforce_quotas({"big": 0}, max_evictions=4), 2)
+        self.assertEqual(quota_cache.usage("big"), 0)
+
+    def test_per_product_quota(self):
+        quota_cache = Cache(self.dirpath)
+        self._fill(quota_cache, "provider", 4)
+        quota_cache.set("provider/other/0", bytes(self.entry_size))
+        quota_cache.enforce_quotas({"provider/product": 2 * self.entry_size})
+        self.assertEqual(quota_cache.usage("provider/product"), 2 * self.entry_size)
+        self.assertIn("provider/other/0", quota_cache)
+
+    @data('Cache', 'Fanout')
+    def test_streams_entries_info_by_batches(self, cache_type):
+        quota_cache = Cache(self.dirpath, cache_type=cache_type)
+        self._fill(quota_cache, "streamed", 10)
+        keys = []
+        for info in quota_cache.iter_entries_info(["streamed/*"], batch_size=3):
+            keys.append(info.key)
+            # deleting already listed entries does not disturb the iteration
+            quota_cache.delete(info.key)
+        self.assertEqual(sorted(keys), sorted(f"streamed/product/{i}" for i in range(10)))
+        self.assertEqual(quota_cache.usage("streamed"), 0)
+
+    def test_lru_policy(self):
+        quota_cache = Cache(self.dirpath, eviction_policy="lru")
+        self._fill(quota_cache, "lru", 4)
+        time.sleep(.01)
+        quota_cache.get("lru/product/0")
+        time.sleep(.01)
+        # batched lookups update access times too
+        quota_cache.get_many(["lru/product/2"])
+        quota_cache.enforce_quotas({"lru": 2 * self.entry_size})
+        self.assertEqual(sorted(quota_cache.keys()), ["cache/version", "lru/product/0", "lru/product/2"])
+
+    def test_oldest_version_first_policy(self):
+        quota_cache = Cache(self.dirpath, eviction_policy="oldest-version-first")
+        self._fill(quota_cache, "versions", 4, tags=[4., 1., 3., 2.])
+        quota_cache.enforce_quotas({"versions": 2 * self.entry_size})
+        self.assertEqual(sorted(quota_cache.keys()), ["cache/version", "versions/product/0", "versions/product/2"])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            Cache(self.dirpath, eviction_policy="random")
+
+    @data(
+        (3, 3.),
+        (datetime(2020, 1, 1, tzinfo=timezone.utc), datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp()),
+        ("2020-01-01T00:00:00Z", datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp()),
+        ("not a date", None),
+        (None, None),
+    )
+    @unpack
+    def test_version_tag(self, version, expected):
+        self.assertEqual(version_tag(version), expected)
+
+
+class _CacheToolsTest(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.cache = Cache(self.dirpath)
+        self._version = 1
+
+        @Cacheable(prefix="tools", cache_instance=self.cache, version=lambda _, product: self._version,
+                   fragment_hours=lambda x: 2)
+        def versioned(_, product, start_time, stop_time):
+            return data_generator(start_time, stop_time)
+
+        @UnversionedProviderCache(prefix="tools_unversioned", cache_instance=self.cache, fragment_hours=lambda x: 2)
+        def unversioned(_, product, start_time, stop_time, if_newer_than=None):
+            return data_generator(start_time, stop_time)
+
+        self.versioned = versioned
+        self.unversioned = unversioned
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath, ignore_errors=True)
+
+    def test_parse_entry_key(self):
+        self.assertEqual(cache_tools.parse_entry_key("cda@48h/AC_H0_MFI/2020-01-01T00:00:00+00:00"),
+                         ("cda", 48, "AC_H0_MFI", datetime(2020, 1, 1, tzinfo=timezone.utc)))
+        self.assertEqual(cache_tools.parse_entry_key("ssc_orbits/wind/gse/2020-01-01T00:00:00+00:00")[2], "wind/gse")
+        self.assertIsNone(cache_tools.parse_entry_key("cache/version"))
+        self.assertIsNone(cache_tools.parse_entry_key("amda/inventory/not_a_date"))
+
+    def test_coverage_merges_contiguous_fragments(self):
+        day = datetime(2016, 6, 1, tzinfo=timezone.utc)
+        self.versioned(None, "product", day + timedelta(hours=10), day + timedelta(hours=12))
+        self.versioned(None, "product", day + timedelta(hours=2), day + timedelta(hours=4))
+        self.versioned(None, "product", day + timedelta(hours=5), day + timedelta(hours=9))
+        self.unversioned(None, "other", day + timedelta(hours=2), day + timedelta(hours=4))
+        coverage = cache_tools.coverage(self.cache)
+        self.assertEqual(coverage["tools/product"], [DateTimeRange(day, day + timedelta(hours=14))])
+        self.assertEqual(coverage["tools_unversioned/other"], [DateTimeRange(day, day + timedelta(hours=6))])
+        self.assertEqual(list(cache_tools.coverage(self.cache, provider="tools")), ["tools/product"])
+
+    def test_disk_usage(self):
+        day = datetime(2016, 6, 1, tzinfo=timezone.utc)
+        self.versioned(None, "product", day + timedelta(hours=2), day + timedelta(hours=4))
+        usage = cache_tools.disk_usage(self.cache)
+        self.assertEqual(usage["tools"]["entries"], 3)
+        self.assertGreater(usage["tools"]["bytes"], 0)
+        # cache version and product coverage
+        self.assertEqual(usage["other"]["entries"], 2)
+
+    def test_purge_outdated(self):
+        day = datetime(2016, 6, 1, tzinfo=timezone.utc)
+        self.versioned(None, "product", day + timedelta(hours=2), day + timedelta(hours=4))
+        self._version = 2
+        self.versioned(None, "product", day + timedelta(hours=10), day + timedelta(hours=12))
+        self.unversioned(None, "other", day + timedelta(hours=2), day + timedelta(hours=4))
+        self.assertEqual(cache_tools.purge_outdated(self.cache, dry_run=True), 3)
+        self.assertEqual(cache_tools.purge_outdated(self.cache), 3)
+        self.assertEqual(cache_tools.purge_outdated(self.cache), 0)
+        self.assertEqual(cache_tools.disk_usage(self.cache)["tools"]["entries"], 3)
+        self.assertEqual(cache_tools.disk_usage(self.cache)["tools_unversioned"]["entries"], 3)
+        cache_tools.compact(self.cache)
+        self.assertEqual(len(self.cache), 9)
+
+    def test_purge_compares_with_current_version(self):
+        day = datetime(2016, 6, 1, tzinfo=timezone.utc)
+        provider = object()
+        self.versioned(provider, "product", day + timedelta(hours=2), day + timedelta(hours=4))
+        self.assertEqual(cache_tools.purge_outdated(self.cache), 0)
+        # the only cached version is stale
+        self._version = 2
+        self.assertEqual(cache_tools.purge_outdated(self.cache), 3)
+        self.assertNotIn("tools", cache_tools.disk_usage(self.cache))
+
+    def test_purge_ignores_untagged_entries(self):
+        day = datetime(2016, 6, 1, tzinfo=timezone.utc)
+        self.versioned(None, "product", day + timedelta(hours=2), day + timedelta(hours=4))
+        self._version = 2
+        self.versioned(None, "product", day + timedelta(hours=10), day + timedelta(hours=12))
+        # written by a speasy version which did not tag entries
+        self.cache.set(f"tools/product/{(day + timedelta(hours=20)).isoformat()}", b"untagged")
+        self.assertEqual(cache_tools.purge_outdated(self.cache), 3)
+        self.assertIn(f"tools/product/{(day + timedelta(hours=20)).isoformat()}", self.cache)
+
+    def test_command_line(self):
+        day = datetime(2016, 6, 1, tzinfo=timezone.utc)
+        self.versioned(None, "product", day + timedelta(hours=2), day + timedelta(hours=4))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(cache_tools.main(["--path", self.dirpath, "coverage"]), 0)
+            self.assertEqual(cache_tools.main(["--path", self.dirpath, "usage"]), 0)
+            self.assertEqual(cache_tools.main(["--path", self.dirpath, "purge", "--dry-run"]), 0)
+        self.assertIn("tools/product", output.getvalue())
+        self.assertIn("0 outdated entries found", output.getvalue())
+
+
+@ddt
+class _CoverageIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.cache = Cache(self.dirpath)
+        self._cntr = 0
+
+        @Cacheable(prefix="coverage_test", cache_instance=self.cache, version=lambda _, product: 0)
+        def make_data(_, product, start_time, stop_time):
+            self._cntr += 1
+            return data_generator(start_time, stop_time)
+
+        self.make_data = make_data
+
+    def tearDown(self):
+        shutil.rmtree(self.dirpath, ignore_errors=True)
+
+    def test_merges_and_splits_intervals(self):
+        coverage = self.cache.coverage
+        self.assertIsNone(coverage.intervals("stem/"))
+        coverage.add("stem/", 1, [start_date + timedelta(hours=h) for h in (0, 1, 2, 5, 4)])
+        self.assertEqual(coverage.intervals("stem/").tolist(),
+                         [[start_date.timestamp(), start_date.timestamp() + 3 * 3600.],
+                          [start_date.timestamp() + 4 * 3600., start_date.timestamp() + 6 * 3600.]])
+        coverage.remove("stem/", 1, [start_date + timedelta(hours=1)])
+        self.assertEqual(len(coverage.intervals("stem/")), 3)
+        self.assertEqual(coverage.covered("stem/", [start_date + timedelta(hours=h) for h in range(7)], 1).tolist(),
+                         [True, False, True, False, True, True, False])
+        # coverage recorded with another fragment duration is seeded again from entries keys
+        self.assertEqual(coverage.covered("stem/", [start_date], 2).tolist(), [False])
+
+    @data('Cache', 'Fanout')
+    def test_concurrent_updates_are_not_lost(self, cache_type):
+        coverage = Cache(self.dirpath, cache_type=cache_type).coverage
+
+        def add(thread):
+            # disjoint fragments so no interval merges
+            for i in range(50):
+                coverage.add("stem/", 1, [start_date + timedelta(hours=2 * (thread * 50 + i))])
+
+        bounded_map(add, range(8), max_workers=8)
+        self.assertEqual(len(coverage.intervals("stem/", 1)), 400)
+
+    def test_skips_lookups_of_uncovered_fragments(self):
+        tstart = datetime(2016, 1, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2016, 1, 1, 15, 30, tzinfo=timezone.utc)
+        self.make_data(None, "product", tstart, tend)
+        stats = self.cache.stats()
+        looked_up = []
+        fetch_many = Cache._fetch_many
+        with patch.object(Cache, "_fetch_many", staticmethod(
+                lambda shard, keys, read: looked_up.extend(keys) or fetch_many(shard, keys, read))):
+            self.assertEqual(self.make_data(None, "product", tstart, tend + timedelta(hours=6)),
+                             data_generator(tstart, tend + timedelta(hours=6)))
+        self.assertEqual(len([key for key in looked_up if key.startswith("coverage_test/")]), 5)
+        self.assertEqual(self.cache.stats()["hit"] - stats["hit"], 5)
+        self.assertEqual(self.cache.stats()["misses"] - stats["misses"], 7)
+        self.assertEqual(self._cntr, 2)
+
+    def test_seeds_coverage_of_entries_written_without_it(self):
+        tstart = datetime(2016, 3, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2016, 3, 1, 15, 30, tzinfo=timezone.utc)
+        self.make_data(None, "product", tstart, tend)
+        self.make_data(None, "other", tstart, tend)
+        # entries written by previous versions have no coverage
+        self.cache._data.delete("coverage/coverage_test/product/")
+        self.assertEqual(self.make_data(None, "product", tstart, tend), data_generator(tstart, tend))
+        self.assertEqual(self._cntr, 2)
+        self.assertEqual(self.cache.coverage.intervals("coverage_test/product/", 1).tolist(),
+                         [[tstart.timestamp() - 3600., tstart.timestamp() + 4 * 3600.]])
+
+    def test_evictions_update_coverage(self):
+        tstart = datetime(2016, 2, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2016, 2, 1, 15, 30, tzinfo=timezone.utc)
+        self.make_data(None, "product", tstart, tend)
+        self.cache.delete("coverage_test/product/2016-02-01T12:00:00+00:00")
+        covered = self.cache.coverage.covered("coverage_test/product/",
+                                              [tstart - timedelta(hours=1) + timedelta(hours=h) for h in range(5)], 1)
+        self.assertEqual(covered.tolist(), [True, False, True, True, True])
+        # diskcache size limit evictions are only noticed at lookup
+        self.cache._data.delete("coverage_test/product/2016-02-01T13:00:00+00:00")
+        self.assertEqual(self.make_data(None, "product", tstart, tend), data_generator(tstart, tend))
+        self.assertEqual(self._cntr, 2)
+        self.assertEqual(self.make_data(None, "product", tstart, tend), data_generator(tstart, tend))
+        self.assertEqual(self._cntr, 2)
+
+
+class _StaleWhileRevalidateTest(unittest.TestCase):
+    def setUp(self):
+        self.dirpath = tempfile.mkdtemp()
+        self.cache = Cache(self.dirpath)
+        self.revalidations = 0
+        os.environ[cache_cfg.stale_while_revalidate.env_var_name] = "True"
+
+        @UnversionedProviderCache(prefix="swr", cache_instance=self.cache, cache_retention=timedelta(seconds=.5))
+        def make_data(_, product, start_time, stop_time, if_newer_than=None):
+            if if_newer_than is not None:
+                self.revalidations += 1
+                time.sleep(.5)
+            return data_generator(start_time, stop_time)
+
+        self.make_data = make_data
+
+    def tearDown(self):
+        os.environ.pop(cache_cfg.stale_while_revalidate.env_var_name)
+        shutil.rmtree(self.dirpath, ignore_errors=True)
+
+    def test_returns_stale_data_and_revalidates_in_background(self):
+        tstart = datetime(2016, 3, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2016, 3, 1, 15, 30, tzinfo=timezone.utc)
+        expected = self.make_data(None, "product", tstart, tend)
+        time.sleep(.6)
+        begin = time.perf_counter()
+        self.assertEqual(self.make_data(None, "product", tstart, tend), expected)
+        self.assertEqual(self.make_data(None, "product", tstart, tend), expected)
+        self.assertLess(time.perf_counter() - begin, .5)
+        background_revalidations.join(timeout=10)
+        self.assertEqual(self.revalidations, 1)
+        self.assertEqual(self.make_data(None, "product", tstart, tend), expected)
+        self.assertEqual(self.revalidations, 1)
+
+    def test_disabled_by_default(self):
+        os.environ[cache_cfg.stale_while_revalidate.env_var_name] = "False"
+        tstart = datetime(2016, 4, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2016, 4, 1, 15, 30, tzinfo=timezone.utc)
+        self.make_data(None, "product", tstart, tend)
+        time.sleep(.6)
+        self.make_data(None, "product", tstart, tend)
+        self.assertEqual(self.revalidations, 1)
+
+
+class _CacheStatisticsTest(unittest.TestCase):
+    def setUp(self):
+        self._cntr = 0
+        cache_stats.reset()
+
+    @Cacheable(prefix="stats", cache_instance=cache, version=lambda self, product: 0)
+    def _make_data(self, product, start_time, stop_time):
+        self._cntr += 1
+        return data_generator(start_time, stop_time)
+
+    def test_counts_per_provider_and_product(self):
+        tstart = datetime(2014, 1, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2014, 1, 1, 15, 30, tzinfo=timezone.utc)
+        var = self._make_data("test_counts_per_provider_and_product", tstart, tend)
+        self._make_data("test_counts_per_provider_and_product", tstart, tend)
+        snapshot = cache_stats.snapshot()
+        counters = snapshot["providers"]["stats"]["products"]["test_counts_per_provider_and_product"]
+        self.assertEqual(counters["requests"], 2)
+        self.assertEqual(counters["fragments"], 10)
+        self.assertEqual(counters["misses"], 5)
+        self.assertEqual(counters["hits"] + counters["memory_hits"], 5)
+        self.assertEqual(counters["hit_ratio"], 0.5)
+        self.assertEqual(counters["fragments_per_request"], 5)
+        self.assertGreaterEqual(counters["bytes_from_network"], var.nbytes)
+        self.assertGreater(counters["bytes_from_cache"], 0)
+        self.assertEqual(snapshot["total"]["requests"], 2)
+        self.assertGreaterEqual(snapshot["serialization"]["encoded"], 5)
+        self.assertGreaterEqual(snapshot["serialization"]["decoded"], 5)
+
+    def test_reset_clears_counters(self):
+        stats = CacheStatistics()
+        stats.record_lookup("provider", "product", fragments=2, hits=1, memory_hits=0, misses=1, nbytes=10)
+        stats.record_evictions("disk", 3)
+        self.assertEqual(stats.snapshot()["evictions"]["disk"], 3)
+        stats.reset()
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot["providers"], {})
+        self.assertEqual(snapshot["total"]["requests"], 0)
+        self.assertEqual(snapshot["evictions"]["disk"], 0)
+
+    def test_counts_memory_evictions(self):
+        var = data_generator(start_date, start_date + timedelta(hours=1))
+        memory = MemoryCache(max_bytes=lambda: var.nbytes)
+        memory.put("key_0", CacheItem(to_dictionary(var), 0))
+        memory.put("key_1", CacheItem(to_dictionary(var), 0))
+        self.assertEqual(memory.stats()["evictions"], 1)
+        self.assertEqual(cache_stats.snapshot()["evictions"]["memory"], 1)
+
+    def test_periodic_dump(self):
+        stats = CacheStatistics()
+        stats.record_download("provider", "product", 42)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "stats.jsonl")
+            stats.start_periodic_dump(path, interval=.05)
+            time.sleep(.3)
+            stats.stop_periodic_dump()
+            with open(path) as f:
+                lines = f.readlines()
+        self.assertGreaterEqual(len(lines), 2)
+        snapshot = json.loads(lines[-1])
+        self.assertEqual(snapshot["providers"]["provider"]["products"]["product"]["bytes_from_network"], 42)
+
+
+@ddt
+class _CacheEntryFormatTest(unittest.TestCase):
+    def setUp(self):
+        self._cntr = 0
+
+    @Cacheable(prefix="format", cache_instance=cache, version=lambda self, product: 0)
+    def _make_typed_data(self, product, start_time, stop_time):
+        self._cntr += 1
+        var = data_generator(start_time, stop_time)
+        return SpeasyVariable(axes=var.axes, values=DataContainer(values=var.values.astype(product)))
+
+    @data("float32", "int16", "uint64", "float64")
+    def test_preserves_dtype(self, dtype):
+        tstart = datetime(2011, 6, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2011, 6, 1, 15, 30, tzinfo=timezone.utc)
+        expected = self._make_typed_data(dtype, tstart, tend)
+        var = self._make_typed_data(dtype, tstart, tend)
+        self.assertEqual(self._cntr, 1)
+        self.assertEqual(var.values.dtype, np.dtype(dtype))
+        self.assertTrue(np.array_equal(var.values, expected.values))
+
+    def test_downcasts_to_float32(self):
+        tstart = datetime(2011, 7, 1, 12, 0, tzinfo=timezone.utc)
+        tend = datetime(2011, 7, 1, 15, 30, tzinfo=timezone.utc)
+        os.environ[cache_cfg.downcast_to_float32.env_var_name] = "True"
+        try:
+            fresh = self._make_typed_data("float64", tstart, tend)
+            cached = self._make_typed_data("float64", tstart, tend)
+            integers = self._make_typed_data("int32", tstart, tend)
+        finally:
+            os.environ.pop(cache_cfg.downcast_to_float32.env_var_name)
+        self.assertEqual(self._cntr, 2)
+        self.assertEqual(fresh.values.dtype, np.float32)
+        self.assertEqual(cached.values.dtype, np.float32)
+        self.assertEqual(integers.values.dtype, np.int32)
+        self.assertEqual(self._make_typed_data("float64", tstart, tend).values.dtype, np.float32)
+
+    @staticmethod
+    def _make_var(size):
+        time = np.datetime64("2016-06-01T12:00", "ns") + np.arange(size) * np.timedelta64(1, "m")
+        return SpeasyVariable(axes=[VariableTimeAxis(values=time)],
+                              values=DataContainer(values=np.arange(size, dtype=np.float64)))
+
+    @data(10, 100000)
+    def test_decodes_lazily_without_copies(self, size):
+        var = self._make_var(size)
+        cache.set("format/test_decodes_without_copies", encode_item(CacheItem(to_dictionary(var), 12)))
+        item = decode_item(cache.get("format/test_decodes_without_copies", read=True), lazy=True)
+        self.assertEqual(item.version, 12)
+        self.assertFalse(item.data["values"]["values"].flags.owndata)
+        self.assertTrue(np.array_equal(item.data["values"]["values"], var.values))
+        self.assertTrue(np.array_equal(item.data["axes"][0]["values"], var.time))
+
+    def test_reads_file_entries_into_memory(self):
+        var = self._make_var(100000)
+        cache.set("format/test_reads_file_entries_into_memory", encode_item(CacheItem(to_dictionary(var), 12)))
+        value = cache.get("format/test_reads_file_entries_into_memory", read=True)
+        self.assertNotIsInstance(value, bytes)
+        item = decode_item(value)
+        self.assertTrue(value.closed)
+        self.assertTrue(item.data["values"]["values"].flags.owndata)
+        self.assertTrue(np.array_equal(item.data["values"]["values"], var.values))
+
+    @data('Cache', 'Fanout')
+    def test_stores_serialized_entries_of_any_size(self, cache_type):
+        path = tempfile.mkdtemp()
+        try:
+            sized_cache = Cache(path, cache_type=cache_type)
+            for size in (10, 100000):
+                var = self._make_var(size)
+                sized_cache.set(f"format/{size}", encode_item(CacheItem(to_dictionary(var), 12)))
+                item = decode_item(sized_cache.get_many([f"format/{size}"], read=True)[0])
+                self.assertEqual(item.version, 12)
+                self.assertTrue(np.array_equal(item.data["values"]["values"], var.values))
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def test_reads_entries_from_cache_version_2(self):
+        path = tempfile.mkdtemp()
+        try:
+            legacy_cache = Cache(path)
+            legacy_cache.version = "2.0"
+            var = data_generator(start_date, start_date + timedelta(hours=1))
+            legacy_cache["format/legacy"] = CacheItem(to_dictionary(var), 3)
+            del legacy_cache
+
+            migrated_cache = Cache(path)
+            self.assertEqual(migrated_cache.version, cache_version)
+            item = decode_item(migrated_cache.get("format/legacy", read=True))
+            self.assertEqual(item.version, 3)
+            self.assertTrue(np.array_equal(item.data["values"]["values"], var.values))
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+
 @ddt
 class _CacheVersionTest(unittest.TestCase):
 
@@ -173,11 +912,12 @@ class _CacheVersionTest(unittest.TestCase):
         self.assertEqual(op(version_to_str(str_to_version(version_str))), op(version_str))
 
 
+def tearDownModule():
+    try:
+        shutil.rmtree(dirpath)
+    except PermissionError:
+        print(f"Can't rm temporary cache folder {dirpath}")
+
+
 if __name__ == '__main__':
     unittest.main()
-
-try:
-    del cache
-    shutil.rmtree(dirpath)
-except PermissionError:
-    print(f"Can't rm temporary cache folder {dirpath}")
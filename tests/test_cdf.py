@@ -0,0 +1,92 @@
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pycdfpp
+
+from speasy.core.cdf import load_variable, load_variable_from_stream
+from speasy.webservices.csa import _read_cdf as csa_read_cdf
+
+
+def make_cdf(records: int = 1000) -> bytes:
+    cdf = pycdfpp.CDF()
+    time = np.datetime64("2020-01-01", "ns") + np.arange(records) * np.timedelta64(1, 's')
+    cdf.add_variable("Epoch", pycdfpp.to_tt2000(time), data_type=pycdfpp.DataType.CDF_TIME_TT2000)
+    cdf.add_variable("B", np.arange(records * 3, dtype=np.float64).reshape(records, 3),
+                     attributes={"VAR_TYPE": ["data"], "DEPEND_0": ["Epoch"], "UNITS": ["nT"]})
+    cdf.add_variable("other", np.ones((records, 10)), attributes={"VAR_TYPE": ["data"], "DEPEND_0": ["Epoch"]})
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pycdfpp.save(cdf, f"{tmp_dir}/test.cdf")
+        with open(f"{tmp_dir}/test.cdf", 'rb') as f:
+            return f.read()
+
+
+def _owns_memory(values: np.ndarray) -> bool:
+    while values.base is not None:
+        if not isinstance(values.base, np.ndarray):
+            return False
+        values = values.base
+    return True
+
+
+class LoadVariable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cdf = make_cdf()
+        cls.expected = np.arange(3000, dtype=np.float64).reshape(1000, 3)
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self._previous_tempdir = tempfile.tempdir
+        tempfile.tempdir = self.tmp_dir.name
+
+    def tearDown(self):
+        tempfile.tempdir = self._previous_tempdir
+        self.tmp_dir.cleanup()
+
+    def _check(self, var):
+        self.assertIsNotNone(var)
+        self.assertTrue(np.array_equal(var.values, self.expected))
+        self.assertEqual(var.time[0], np.datetime64("2020-01-01", "ns"))
+        self.assertEqual(len(var.time), 1000)
+        self.assertEqual(var.unit, "nT")
+
+    def test_copies_arrays_loaded_from_buffer(self):
+        var = load_variable(variable="B", buffer=self.cdf)
+        self._check(var)
+        self.assertTrue(_owns_memory(var.values))
+        self.assertTrue(_owns_memory(var.time))
+
+    def test_loads_from_stream_without_keeping_files(self):
+        var = load_variable_from_stream(variable="B", stream=io.BytesIO(self.cdf))
+        self._check(var)
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+        self.assertTrue(_owns_memory(var.values))
+        self.assertTrue(all(_owns_memory(axis.values) for axis in var.axes))
+        var.values[0, 0] = 42.
+        self.assertEqual(var.values[0, 0], 42.)
+
+    def test_missing_variable(self):
+        self.assertIsNone(load_variable_from_stream(variable="missing", stream=io.BytesIO(self.cdf)))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_reads_csa_tarballs_as_streams(self):
+        archive = io.BytesIO()
+        with tarfile.open(fileobj=archive, mode='w:gz') as tar:
+            directory = tarfile.TarInfo("CSA_Download")
+            directory.type = tarfile.DIRTYPE
+            tar.addfile(directory)
+            info = tarfile.TarInfo("CSA_Download/test.cdf")
+            info.size = len(self.cdf)
+            tar.addfile(info, io.BytesIO(self.cdf))
+        archive.seek(0)
+        self._check(csa_read_cdf(SimpleNamespace(raw=archive), "B"))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
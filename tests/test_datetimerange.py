@@ -319,6 +319,20 @@ class _DateTimeRangeTest(unittest.TestCase):
             DateTimeRange(datetime(2000, 1, 1, 0, 0, 0, tzinfo=timezone.utc),
                           datetime(2000, 1, 1, 12, 0, 0, tzinfo=timezone.utc))
         ),
+        (
+            DateTimeRange(datetime(2000, 1, 1, 3, 30, 0, tzinfo=timezone.utc),
+                          datetime(2000, 1, 3, 5, 30, 0, tzinfo=timezone.utc)),
+            48,
+            DateTimeRange(datetime(1999, 12, 31, 0, 0, 0, tzinfo=timezone.utc),
+                          datetime(2000, 1, 4, 0, 0, 0, tzinfo=timezone.utc))
+        ),
+        (
+            DateTimeRange(datetime(2000, 1, 2, 0, 0, 0, tzinfo=timezone.utc),
+                          datetime(2000, 1, 4, 0, 0, 0, tzinfo=timezone.utc)),
+            48,
+            DateTimeRange(datetime(2000, 1, 2, 0, 0, 0, tzinfo=timezone.utc),
+                          datetime(2000, 1, 4, 0, 0, 0, tzinfo=timezone.utc))
+        ),
     )
     @unpack
     def test_range_rounding(self, dt_range, fragment_hours, expected):
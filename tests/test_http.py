@@ -0,0 +1,72 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from speasy.core import http
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpSessionPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        http.reset_sessions()
+        http.reset_stats()
+
+    def test_reuses_connections(self):
+        for i in range(10):
+            resp = http.get(f"{self.url}/test_{i}")
+            self.assertEqual(resp.text, f"/test_{i}")
+        stats = http.stats()
+        self.assertEqual(stats["requests"], 10)
+        self.assertEqual(stats["new_connections"], 1)
+        self.assertEqual(stats["reused_connections"], 9)
+
+    def test_shares_pools_across_threads(self):
+        def worker():
+            for i in range(5):
+                self.assertEqual(http.get(f"{self.url}/{i}").status_code, 200)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = http.stats()
+        self.assertEqual(stats["requests"], 20)
+        self.assertLessEqual(stats["new_connections"], 4)
+
+    def test_urlopen(self):
+        with http.urlopen(f"{self.url}/some/path") as f:
+            self.assertEqual(f.read(), b"/some/path")
+
+    def test_urlopen_stream(self):
+        with http.urlopen_stream(f"{self.url}/some/path") as f:
+            self.assertEqual(f.read(5), b"/some")
+            self.assertEqual(f.read(), b"/path")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,398 @@
+import io
+import json
+import os
+import pickle
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import requests
+
+import speasy.core.proxy
+from speasy.config import proxy as proxy_cfg
+from speasy.core import columnar, http
+from speasy.core.proxy import GetProduct, Proxyfiable, circuit_breaker
+from speasy.core.proxy._circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from speasy.products.variable import to_dictionary
+from speasy.products import SpeasyVariable, VariableTimeAxis, DataContainer
+
+
+def make_variable(size: int = 1000) -> SpeasyVariable:
+    time = np.arange(np.datetime64("2020-01-01"), np.datetime64("2020-01-01") + np.timedelta64(size, 's'),
+                     np.timedelta64(1, 's')).astype("datetime64[ns]")
+    return SpeasyVariable(axes=[VariableTimeAxis(values=time)],
+                          values=DataContainer(values=np.random.random_sample((size, 3)), name="test"),
+                          columns=["x", "y", "z"])
+
+
+class _OneByteStream(io.RawIOBase):
+    """Returns at most one byte per read like a slow network stream would"""
+
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._data.read(1)
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+class ColumnarRead(unittest.TestCase):
+    def setUp(self):
+        self.var = make_variable()
+        self.data = columnar.dumps(to_dictionary(self.var))
+
+    def _check(self, decoded):
+        values = decoded["values"]["values"]
+        self.assertTrue(np.array_equal(values, self.var.values))
+        self.assertTrue(values.flags.writeable)
+        self.assertTrue(np.array_equal(decoded["axes"][0]["values"], self.var.time))
+
+    def test_copies_any_array_layout(self):
+        values = np.arange(60, dtype=np.float64).reshape(20, 3)
+        data = {"column": values[:, 1], "transposed": values.T, "swapped": values.astype(">i4")[::3],
+                "empty": np.empty((0, 3)), "scalar": np.float32(1.5)}
+        buffer = columnar.dumps(data)
+        self.assertIsInstance(buffer, bytearray)
+        for decoded in (columnar.loads(bytes(buffer)), columnar.read(io.BytesIO(buffer))):
+            for key, expected in data.items():
+                self.assertTrue(np.array_equal(decoded[key], expected))
+                self.assertEqual(np.asarray(decoded[key]).dtype, np.asarray(expected).dtype)
+
+    def test_reads_from_stream(self):
+        self._check(columnar.read(io.BytesIO(self.data)))
+
+    def test_reads_from_short_reads(self):
+        self._check(columnar.read(_OneByteStream(self.data)))
+
+    def test_reads_after_sniffed_head(self):
+        stream = io.BytesIO(self.data)
+        head = stream.read(len(columnar.MAGIC))
+        self._check(columnar.read(stream, head=head))
+
+    def test_rejects_truncated_stream(self):
+        with self.assertRaises(EOFError):
+            columnar.read(io.BytesIO(self.data[:-10]))
+
+    def test_rejects_other_formats(self):
+        with self.assertRaises(ValueError):
+            columnar.read(io.BytesIO(pickle.dumps(to_dictionary(self.var))))
+
+    def test_sniffs_format_from_short_reads(self):
+        for data in (self.data, pickle.dumps(to_dictionary(self.var))):
+            resp = SimpleNamespace(raw=_OneByteStream(data))
+            self._check(speasy.core.proxy._read_streamed_product(resp))
+
+
+class _ProxyStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    version = "0.12.0"
+    columnar_answers = True
+    batch_answers = True
+    get_data_status = 200
+    variable = None
+    formats = []
+    batches = []
+
+    def _answer(self, body: bytes, chunk_size: int = 4096):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        for start in range(0, len(body), chunk_size):
+            self.wfile.write(body[start:start + chunk_size])
+            self.wfile.flush()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/get_version":
+            return self._answer(self.version.encode())
+        fmt = parse_qs(url.query)["format"][0]
+        _ProxyStubHandler.formats.append(fmt)
+        if self.get_data_status != 200:
+            self.send_response(self.get_data_status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = to_dictionary(self.variable)
+        if fmt == "speasy_columnar" and self.columnar_answers:
+            return self._answer(columnar.dumps(data))
+        return self._answer(pickle.dumps(data))
+
+    def do_POST(self):
+        requests = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["requests"]
+        _ProxyStubHandler.batches.append([request["path"] for request in requests])
+        if not self.batch_answers:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        products = [to_dictionary(self.variable) if request["path"] != "test/missing" else None
+                    for request in requests]
+        return self._answer(columnar.dumps(products))
+
+    def log_message(self, *args):
+        pass
+
+
+class ProxyTransport(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _ProxyStubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        os.environ[proxy_cfg.url.env_var_name] = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        _ProxyStubHandler.variable = make_variable(100000)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.environ.pop(proxy_cfg.url.env_var_name)
+        speasy.core.proxy._CURRENT_PROXY_SERVER_VERSION = None
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        speasy.core.proxy._CURRENT_PROXY_SERVER_VERSION = None
+        _ProxyStubHandler.version = "0.12.0"
+        _ProxyStubHandler.columnar_answers = True
+        _ProxyStubHandler.batch_answers = True
+        _ProxyStubHandler.get_data_status = 200
+        _ProxyStubHandler.formats = []
+        _ProxyStubHandler.batches = []
+        circuit_breaker.reset()
+        http.reset_sessions()
+
+    def _get(self, path: str = "test/product") -> SpeasyVariable:
+        start = datetime(2020, 1, 1)
+        return GetProduct.get(path=path, start_time=start.isoformat(),
+                              stop_time=(start + timedelta(days=1)).isoformat())
+
+    def _concurrent_get(self, paths):
+        with speasy.core.proxy.batching(), ThreadPoolExecutor(max_workers=len(paths)) as executor:
+            futures = [executor.submit(copy_context().run, self._get, path) for path in paths]
+            return [future.result() for future in futures]
+
+    def _check(self, var: SpeasyVariable, fmt: str):
+        self.assertEqual(_ProxyStubHandler.formats, [fmt])
+        self.assertTrue(np.array_equal(var.values, _ProxyStubHandler.variable.values))
+        self.assertTrue(np.array_equal(var.time, _ProxyStubHandler.variable.time))
+        self.assertEqual(var.columns, _ProxyStubHandler.variable.columns)
+
+    def test_streams_columnar_products(self):
+        self._check(self._get(), "speasy_columnar")
+
+    def test_falls_back_to_pickle_answers(self):
+        _ProxyStubHandler.columnar_answers = False
+        self._check(self._get(), "speasy_columnar")
+
+    def test_older_proxies_get_pickle_requests(self):
+        _ProxyStubHandler.version = "0.11.0"
+        self._check(self._get(), "python_dict")
+
+    def test_batches_concurrent_requests(self):
+        _ProxyStubHandler.version = "0.13.0"
+        paths = [f"test/product_{i}" for i in range(8)] + ["test/missing"]
+        variables = self._concurrent_get(paths)
+        self.assertEqual(len(_ProxyStubHandler.batches), 1)
+        self.assertEqual(sorted(_ProxyStubHandler.batches[0]), sorted(paths))
+        self.assertEqual(_ProxyStubHandler.formats, [])
+        self.assertIsNone(variables[-1])
+        for var in variables[:-1]:
+            self.assertTrue(np.array_equal(var.values, _ProxyStubHandler.variable.values))
+
+    def test_splits_batches_larger_than_max_batch_size(self):
+        _ProxyStubHandler.version = "0.13.0"
+        os.environ[proxy_cfg.max_batch_size.env_var_name] = "4"
+        os.environ[proxy_cfg.batch_window.env_var_name] = "10"
+        try:
+            variables = self._concurrent_get([f"test/product_{i}" for i in range(8)])
+        finally:
+            os.environ.pop(proxy_cfg.max_batch_size.env_var_name)
+            os.environ.pop(proxy_cfg.batch_window.env_var_name)
+        self.assertEqual(list(map(len, _ProxyStubHandler.batches)), [4, 4])
+        self.assertTrue(all(var is not None for var in variables))
+
+    def test_falls_back_to_single_requests_when_batch_fails(self):
+        _ProxyStubHandler.version = "0.13.0"
+        _ProxyStubHandler.batch_answers = False
+        variables = self._concurrent_get([f"test/product_{i}" for i in range(4)])
+        self.assertEqual(_ProxyStubHandler.formats, ["speasy_columnar"] * 4)
+        self.assertTrue(all(var is not None for var in variables))
+
+    def test_does_not_batch_outside_batching_context(self):
+        _ProxyStubHandler.version = "0.13.0"
+        self._check(self._get(), "speasy_columnar")
+        self.assertEqual(_ProxyStubHandler.batches, [])
+
+    def test_older_proxies_do_not_get_batches(self):
+        variables = self._concurrent_get([f"test/product_{i}" for i in range(4)])
+        self.assertEqual(_ProxyStubHandler.batches, [])
+        self.assertEqual(_ProxyStubHandler.formats, ["speasy_columnar"] * 4)
+        self.assertTrue(all(var is not None for var in variables))
+        self.assertFalse(speasy.core.proxy.batching_available())
+
+    def test_error_answers_are_failures(self):
+        _ProxyStubHandler.get_data_status = 500
+        direct_calls = []
+
+        @Proxyfiable(GetProduct, lambda **kwargs: kwargs)
+        def get(path, start_time, stop_time):
+            direct_calls.append(path)
+            return None
+
+        os.environ[proxy_cfg.enabled.env_var_name] = "True"
+        try:
+            get(path="test/product", start_time="2020-01-01", stop_time="2020-01-02")
+        finally:
+            os.environ.pop(proxy_cfg.enabled.env_var_name)
+        self.assertEqual(direct_calls, ["test/product"])
+        self.assertEqual(speasy.core.proxy.proxy_health()["consecutive_failures"], 1)
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.recovery_timeout = 60.
+        self.opened = 0
+
+        def on_open():
+            self.opened += 1
+
+        self.breaker = CircuitBreaker("test server", failure_threshold=lambda: 3,
+                                      recovery_timeout=lambda: self.recovery_timeout, on_open=on_open)
+
+    def test_opens_after_consecutive_failures(self):
+        for _ in range(2):
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_failure(ValueError("boom"))
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.breaker.record_failure(ValueError("boom"))
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.opened, 1)
+        status = self.breaker.status()
+        self.assertEqual(status["consecutive_failures"], 3)
+        self.assertIn("boom", status["last_error"])
+        self.assertGreater(status["retry_in"], 0)
+
+    def test_successes_reset_failures_count(self):
+        for _ in range(5):
+            self.breaker.record_failure()
+            self.breaker.record_failure()
+            self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_trip_opens_right_away(self):
+        self.breaker.record_failure(ConnectionError(), trip=True)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.breaker.record_failure(trip=True)
+        self.recovery_timeout = 0.
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_opens_again(self):
+        self.breaker.record_failure(trip=True)
+        self.recovery_timeout = 0.
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertEqual(self.opened, 2)
+
+    def test_cancelled_probe_does_not_change_state(self):
+        self.breaker.record_failure(trip=True)
+        self.recovery_timeout = 0.
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_cancellation()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow_request())
+
+
+class _UnreachableProxy:
+    calls = 0
+
+    @staticmethod
+    def get(**kwargs):
+        _UnreachableProxy.calls += 1
+        raise requests.exceptions.ConnectionError("connection refused")
+
+
+class _CancelledProxy:
+    @staticmethod
+    def get(**kwargs):
+        raise http.RequestCancelled("cancelled")
+
+
+class _InterruptedProxy:
+    @staticmethod
+    def get(**kwargs):
+        raise KeyboardInterrupt()
+
+
+class ProxyFallback(unittest.TestCase):
+    def setUp(self):
+        circuit_breaker.reset()
+        speasy.core.proxy._CURRENT_PROXY_SERVER_VERSION = speasy.core.proxy.MINIMUM_REQUIRED_PROXY_VERSION
+        _UnreachableProxy.calls = 0
+        os.environ[proxy_cfg.enabled.env_var_name] = "True"
+        self.direct_calls = 0
+
+    def tearDown(self):
+        os.environ.pop(proxy_cfg.enabled.env_var_name)
+        speasy.core.proxy._CURRENT_PROXY_SERVER_VERSION = None
+        circuit_breaker.reset()
+
+    @Proxyfiable(_UnreachableProxy, lambda **kwargs: kwargs)
+    def _get(self, fragment):
+        self.direct_calls += 1
+        return fragment
+
+    @Proxyfiable(_CancelledProxy, lambda **kwargs: kwargs)
+    def _get_cancelled(self, fragment):
+        return fragment
+
+    def test_unreachable_proxy_is_tried_once(self):
+        self.assertEqual([self._get(fragment=i) for i in range(10)], list(range(10)))
+        self.assertEqual(self.direct_calls, 10)
+        self.assertEqual(_UnreachableProxy.calls, 1)
+        self.assertEqual(speasy.core.proxy.proxy_health()["state"], OPEN)
+        self.assertIsNone(speasy.core.proxy._CURRENT_PROXY_SERVER_VERSION)
+        self.assertFalse(speasy.core.proxy.batching_available())
+
+    @Proxyfiable(_InterruptedProxy, lambda **kwargs: kwargs)
+    def _get_interrupted(self, fragment):
+        return fragment
+
+    def test_interrupted_probe_is_released(self):
+        self._get(fragment=0)
+        self.assertEqual(circuit_breaker.state, OPEN)
+        speasy.core.proxy._CURRENT_PROXY_SERVER_VERSION = speasy.core.proxy.MINIMUM_REQUIRED_PROXY_VERSION
+        os.environ[proxy_cfg.recovery_timeout.env_var_name] = "0"
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                self._get_interrupted(fragment=0)
+            self.assertEqual(circuit_breaker.state, HALF_OPEN)
+            self.assertTrue(circuit_breaker.allow_request())
+        finally:
+            os.environ.pop(proxy_cfg.recovery_timeout.env_var_name)
+
+    def test_cancellations_are_not_failures(self):
+        for _ in range(5):
+            with self.assertRaises(http.RequestCancelled):
+                self._get_cancelled(fragment=0)
+        self.assertEqual(circuit_breaker.state, CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from threading import Event, Lock
+
+import numpy as np
+
+from speasy.config import concurrency as concurrency_cfg
+from speasy.core.requests_scheduling import SplitLargeRequests, provider_request
+from speasy.core.requests_scheduling.concurrency import BackgroundWorker, bounded_map
+from speasy.products.variable import DataContainer, SpeasyVariable, VariableTimeAxis
+
+
+class _InFlightCounter:
+    def __init__(self):
+        self._lock = Lock()
+        self.current = 0
+        self.max = 0
+        self.total = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.total += 1
+            self.max = max(self.max, self.current)
+
+    def __exit__(self, *args):
+        with self._lock:
+            self.current -= 1
+
+
+class ProviderRequestsLimit(unittest.TestCase):
+    def setUp(self):
+        os.environ[concurrency_cfg.max_requests_per_provider.env_var_name] = "test_nested_pools:2"
+
+    def tearDown(self):
+        os.environ.pop(concurrency_cfg.max_requests_per_provider.env_var_name)
+
+    def test_nested_pools_share_provider_limit(self):
+        in_flight = _InFlightCounter()
+
+        @provider_request("test_nested_pools")
+        def request(index):
+            with in_flight:
+                time.sleep(0.01)
+            return index
+
+        results = bounded_map(
+            lambda i: bounded_map(lambda j: request(i * 4 + j), range(4), max_workers=4),
+            range(4), max_workers=4)
+        self.assertEqual([index for chunk in results for index in chunk], list(range(16)))
+        self.assertEqual(in_flight.max, 2)
+
+
+class _SplitProvider:
+    provider_name = "test_split"
+
+    def __init__(self):
+        self.in_flight = _InFlightCounter()
+
+    @SplitLargeRequests(threshold=lambda: timedelta(hours=1))
+    def get_data(self, product, start_time, stop_time):
+        with self.in_flight:
+            # later fragments answer first so results land out of order
+            time.sleep(0.05 / (1 + start_time.hour))
+            time_axis = np.arange(np.datetime64(start_time.replace(tzinfo=None), 'ns'),
+                                  np.datetime64(stop_time.replace(tzinfo=None), 'ns'), np.timedelta64(1, 'm'))
+            return SpeasyVariable(axes=[VariableTimeAxis(values=time_axis)],
+                                  values=DataContainer(values=np.arange(len(time_axis), dtype=np.float64)))
+
+
+class SplitLargeRequestsTest(unittest.TestCase):
+    def setUp(self):
+        os.environ[concurrency_cfg.split_requests_max_in_flight.env_var_name] = "test_split:3"
+
+    def tearDown(self):
+        os.environ.pop(concurrency_cfg.split_requests_max_in_flight.env_var_name)
+
+    def test_merges_sub_requests_in_order(self):
+        provider = _SplitProvider()
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        var = provider.get_data("test", start, start + timedelta(hours=10))
+        self.assertEqual(provider.in_flight.total, 10)
+        self.assertEqual(len(var), 600)
+        self.assertTrue(np.all(np.diff(var.time) == np.timedelta64(1, 'm')))
+        self.assertEqual(var.time[0], np.datetime64("2020-01-01T00:00", 'ns'))
+
+    def test_in_flight_sub_requests_never_exceed_limit(self):
+        provider = _SplitProvider()
+        start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        # concurrent callers share the same per provider limit
+        bounded_map(lambda day: provider.get_data("test", start + timedelta(days=day),
+                                                  start + timedelta(days=day, hours=8)),
+                    range(4), max_workers=4)
+        self.assertEqual(provider.in_flight.total, 32)
+        self.assertEqual(provider.in_flight.max, 3)
+
+
+class BackgroundWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.worker = BackgroundWorker(max_workers=lambda: 1, name="test_background")
+        self.release = Event()
+
+    def tearDown(self):
+        self.release.set()
+
+    def test_drops_tasks_with_pending_key(self):
+        first = self.worker.submit("key", self.release.wait)
+        self.assertIsNone(self.worker.submit("key", self.release.wait))
+        self.release.set()
+        self.worker.join(timeout=10)
+        self.assertTrue(first.done())
+        self.assertIsNotNone(self.worker.submit("key", lambda: None))
+
+    def test_close_cancels_queued_tasks(self):
+        calls = []
+        self.worker.submit("running", self.release.wait)
+        queued = self.worker.submit("queued", calls.append, 1)
+        self.worker.close()
+        self.assertTrue(queued.cancelled())
+        self.assertIsNone(self.worker.submit("other", calls.append, 2))
+        self.release.set()
+        self.worker.join(timeout=10)
+        self.assertEqual(calls, [])
+
+    def test_running_tasks_do_not_delay_exit(self):
+        worker = BackgroundWorker(max_workers=lambda: 1, name="test_daemon_background")
+        worker.submit("key", self.release.wait)
+        threads = [thread for thread in threading.enumerate() if thread.name.startswith("test_daemon_background")]
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].daemon)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -108,6 +108,26 @@ class SpeasyGetData(unittest.TestCase):
         self.assertEqual(len(result[0]), 2)
         self.assertEqual(len(result[1]), 2)
 
+    def test_get_several_product_on_several_ranges_concurrently(self):
+        products = [spz.inventories.data_tree.ssc.Trajectories.ace, "cda/THA_L2_FGM/tha_fgl_gsm"]
+        ranges = [['2018-06-01', '2018-06-01T01'], ['2018-06-03', '2018-06-03T01']]
+        expected = spz.get_data(products, ranges, concurrent=False)
+        result = spz.get_data(products, ranges, concurrent=True)
+        self.assertEqual(len(result), 2)
+        for expected_per_product, result_per_product in zip(expected, result):
+            self.assertEqual(len(result_per_product), 2)
+            for expected_var, result_var in zip(expected_per_product, result_per_product):
+                self.assertEqual(expected_var, result_var)
+
+    def test_concurrent_get_data_reports_failures_without_aborting(self):
+        result = spz.get_data([spz.inventories.data_tree.ssc.Trajectories.ace, 'wrong/path'],
+                              '2018-06-01', '2018-06-01T01', concurrent=True)
+        self.assertIsNotNone(result[0])
+        self.assertIsNone(result[1])
+        result = spz.get_data([spz.inventories.data_tree.ssc.Trajectories.ace, 'wrong/path'],
+                              '2018-06-01', '2018-06-01T01', concurrent=True, return_exceptions=True)
+        self.assertIsInstance(result[1], ValueError)
+
     def test_get_data_wrong_path(self):
         with self.assertRaises(ValueError):
             spz.get_data('wrong/path', datetime.now(), datetime.now())
@@ -12,6 +12,7 @@ import pandas as pds
 from ddt import data, ddt, unpack
 
 from speasy.core import epoch_to_datetime64
+from speasy.products import LazyVariable
 from speasy.products.variable import (DataContainer, SpeasyVariable,
                                       VariableAxis, VariableTimeAxis,
                                       from_dataframe, from_dictionary, merge,
@@ -194,6 +195,59 @@ class SpeasyVariableMerge(unittest.TestCase):
         self.assertListEqual(
             var.time.tolist(), var1.time.tolist() + var2.time.tolist())
 
+    @data(
+        make_simple_var,
+        make_2d_var,
+        make_2d_var_1d_y
+    )
+    def test_many_unsorted_and_overlapping(self, ctor):
+        ref = ctor(0., 100., 1., 10.)
+        fragments = [ctor(start, start + 10., 1., 10.) for start in range(0, 100, 10)]
+        fragments += [ctor(25., 47., 1., 10.), ctor(30., 31., 1., 10.), ctor(0., 5., 1., 10.),
+                      ctor(90., 100., 1., 10.), ctor(61., 75., 1., 10.)]
+        np.random.default_rng(42).shuffle(fragments)
+        var = merge(fragments)
+        self.assertEqual(var, ref)
+
+    def test_merges_time_dependent_axes(self):
+        var = merge([make_2d_var(10., 20., 1., 10.), make_2d_var(0., 15., 1., 10.)])
+        ref = make_2d_var(0., 20., 1., 10.)
+        self.assertEqual(var, ref)
+        self.assertTrue(np.array_equal(var.axes[1].values, ref.axes[1].values))
+
+
+class ALazyVariable(unittest.TestCase):
+    def setUp(self):
+        self.fragments = [make_simple_var_2cols(start, start + 10., 1., 10.) for start in range(0, 100, 10)]
+        self.reference = merge(self.fragments)
+
+    def test_materializes_once_on_access(self):
+        var = LazyVariable(self.fragments, 0., 100.)
+        self.assertFalse(var.is_materialized)
+        self.assertEqual(var.values.shape, (100, 2))
+        self.assertTrue(var.is_materialized)
+        self.assertIs(var.values, var.values)
+        self.assertEqual(var, self.reference)
+
+    def test_slices_and_filters_columns_without_materializing(self):
+        var = LazyVariable(self.fragments, 0., 100.)
+        sliced = var[15.:42.]["y"][20.:80.]
+        self.assertFalse(var.is_materialized)
+        self.assertFalse(sliced.is_materialized)
+        self.assertEqual(sliced, self.reference[20.:42.].filter_columns(["y"]))
+        self.assertFalse(var.is_materialized)
+
+    def test_filters_out_all_columns(self):
+        var = LazyVariable(self.fragments, 0., 100.)["y"]
+        self.assertEqual(var.filter_columns([]), self.reference.filter_columns([]))
+        self.assertEqual(var.filter_columns([]).values.shape, (100, 0))
+
+    def test_restricted_to_its_range(self):
+        var = LazyVariable(self.fragments, 25., 55.)
+        self.assertEqual(var, self.reference[25.:55.])
+        self.assertEqual(len(var[60.:70.]), 0)
+        self.assertEqual(var[0:5], self.reference[25.:55.][0:5])
+
 
 @ddt
 class ASpeasyVariable(unittest.TestCase):
@@ -230,6 +284,27 @@ class ASpeasyVariable(unittest.TestCase):
         self.assertEqual(var1, var2)
         self.assertEqual(var1, var3)
 
+    @data(np.float32, np.int16, np.uint64, np.float64)
+    def test_from_dict_preserves_dtype(self, dtype):
+        var1 = make_simple_var(1., 10., 1., 10.)
+        var1 = SpeasyVariable(axes=var1.axes, values=DataContainer(values=var1.values.astype(dtype)),
+                              columns=var1.columns)
+        for d in (to_dictionary(var1), to_dictionary(var1, array_to_list=True)):
+            var2 = from_dictionary(d)
+            self.assertEqual(var2.values.dtype, np.dtype(dtype))
+            self.assertEqual(var1, var2)
+
+    def test_as_float32(self):
+        var = make_2d_var(1., 10., 1., 10.)
+        var32 = var.as_float32()
+        self.assertEqual(var32.values.dtype, np.float32)
+        self.assertEqual(var32.axes[1].values.dtype, np.float32)
+        self.assertEqual(var32.time.dtype, np.dtype('datetime64[ns]'))
+        self.assertTrue(np.allclose(var32.values, var.values))
+        int_var = SpeasyVariable(axes=var.axes, values=DataContainer(values=var.values.astype(np.int32)),
+                                 columns=var.columns)
+        self.assertIs(int_var.as_float32().values, int_var.values)
+
     def test_from_dataframe(self):
         var1 = make_simple_var(1., 10., 1., 10.)
         var2 = from_dataframe(to_dataframe(var1))